@@ -1,6 +1,4 @@
 import os
-import io
-import csv
 import json
 import uuid
 import time
@@ -8,19 +6,41 @@ from datetime import datetime
 from functools import wraps
 from typing import Optional
 
+import click
 from flask import (
     Flask, render_template, request, redirect, url_for, jsonify,
-    send_file, flash, session
+    send_file, flash, session, Response, stream_with_context, abort
 )
+from sqlalchemy import select
 from werkzeug.utils import secure_filename
 from werkzeug.security import check_password_hash, generate_password_hash
 
-from models import db, Passage, Session, WordEvent, seed_initial_data, User, Profile
-from services.asr_whisper import transcribe_blob_or_501
-from services.asr_vosk import transcribe_blob_vosk_or_none, _load_model
-from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from models import db, Passage, Session, seed_initial_data, ensure_schema, User, Profile
+from services.asr_whisper import preload_whisper, get_whisper_pool
+from services.asr_vosk import _load_model
+from services.asr_engine import transcribe_pcm, asr_mode
+from services.audio_decode import decode_pcm16
+from services.asr_jobs import jobs as asr_jobs, JobQueueFull, LONG_POLL_SEC as ASR_LONG_POLL_SEC
+from services.long_poll import wait as long_poll_wait, POLL_INTERVAL_SEC
+from services.asr_cache import transcripts, transcript_key
+from services.asr_batch import collect_inputs, run_batch
+from services.asr_stream import registry as asr_streams
+from services.asr_grammar import grammar_cache
+from services.asr_sidecar import transcribe_via_sidecar, sidecar_client
+from services.alignment import align as align_words, align_opts, IncrementalAligner
+from services.text import (tokenize_for_display, simple_tokens as _simple_tokens,
+                           sentences as _sentences, content_hash, derive_passage)
+from services.accent_rules import expand as expand_accent_variants
+from services.rescoring import rescore_sessions, summarize_sessions
+from services.scoring import summarize
+from services.session_rows import parse_filters, results_page, session_row, filtered_query, LEVELS
+from services.analytics import class_stats, parse_group_by, invalidate as invalidate_analytics
+from services.word_events import (parse_word_events, insert_word_events, delete_word_events, pack_sessions,
+                                  unpack_sessions, WordEventError)
+from services.exports import KINDS, FORMATS, export_chunks, export_filename, event_rows, csv_chunks
+from services.reports import (render_report, batches as report_batches, BatchBusy, FORMATS as REPORT_FORMATS,
+                              STATUS_WAIT_SEC as REPORT_STATUS_WAIT_SEC)
+from services.report_cache import reports as report_cache, report_etag
 
 # ---------------------------------------------------------------------
 # Optional: load .env (GOOGLE_API_KEY/GEMINI_API_KEY, SECRET_KEY, etc.)
@@ -74,35 +94,37 @@ def current_user():
     return User.query.get(uid)
 
 
-def count_words_no_punct(text: str) -> int:
-    tokens = tokenize_for_display(text or "")
-    import re as _re
-    return sum(1 for t in tokens if _re.fullmatch(r"[A-Za-z']+|[0-9]+", t))
+def still_running(payload):
+    """202 for a job status poll that isn't finished; Retry-After is the poll interval."""
+    resp = jsonify({'ok': True, **payload})
+    resp.headers['Retry-After'] = str(POLL_INTERVAL_SEC)
+    return resp, 202
 
 
-def fmt_mmss(sec: float) -> str:
-    sec = max(0, int(round(sec or 0)))
-    m, s = divmod(sec, 60)
-    return f"{m:d}:{s:02d}"
+def index_passage(p):
+    """(Re)compute the passage's derived columns; call whenever p.text changes."""
+    for column, value in derive_passage(p.text).items():
+        setattr(p, column, value)
 
 
-def tokenize_for_display(text):
-    """Split words and punctuation; UI ignores punctuation for scoring."""
-    import re
-    tokens = re.findall(r"""[A-Za-z']+|[0-9]+|\S""", text or "")
-    return tokens
+def summarize_session(s):
+    """
+    (Re)write the session's summary columns and bump updated_at; call whenever
+    its errors, passage or comprehension change.
+    """
+    p = db.session.get(Passage, s.passage_id) if s.passage_id else None
+    try:
+        errs = json.loads(s.errors_json or '{}')
+    except ValueError:
+        errs = {}
+    summary = summarize(errs if isinstance(errs, dict) else {}, p.word_count if p else 0,
+                        s.comprehension_correct, s.comprehension_total)
+    for column, value in summary.items():
+        setattr(s, column, value)
+    s.updated_at = datetime.utcnow()
 
 
 # ----------------- Comprehension helpers -----------------
-def _simple_tokens(text):
-    import re
-    return re.findall(r"[A-Za-z']+|[0-9]+", text or "")
-
-
-def _sentences(text):
-    import re
-    parts = re.split(r'(?<=[.!?])\s+', (text or "").strip())
-    return [p.strip() for p in parts if p.strip()]
 
 
 def _key_terms(text, k=20):
@@ -159,51 +181,38 @@ def _accent_mode_from_request(req):
 
 
 def _expand_filipino_variants(words):
-    if not words:
-        return words
-    import re
-
-    out = set()
+    """Passage words plus Filipino-accent variants (rules in services/accent_rules.py)."""
+    return expand_accent_variants(words, "fil")
+
+
+def _passage_grammar_enabled() -> bool:
+    return os.getenv("ASR_PASSAGE_GRAMMAR", "false").lower() in {"1", "true", "yes", "y"}
+
+
+def _grammar_entry_for(grammar_words=None, passage=None, accent_mode=None, sr=16000):
+    """
+    Cached Vosk grammar for an explicit word list, or for a passage when
+    ASR_PASSAGE_GRAMMAR is on. Returns None when there is no grammar to apply.
+    """
+    if grammar_words:
+        source, pid = [str(w) for w in grammar_words], None
+        base = lambda: list(source)
+    elif passage is not None and _passage_grammar_enabled():
+        source, pid = passage.text or "", passage.id
+        base = lambda: [t.lower() for t in _simple_tokens(source)]
+    else:
+        return None
 
-    def add(s):
-        s = (s or "").strip()
-        if s:
-            out.add(s)
+    def build():
+        words = base()
+        if accent_mode == "fil":
+            try:
+                words = _expand_filipino_variants(words)
+            except Exception as e:
+                print("[ASR] grammar expand error:", e)
+        return words
 
-    for w in words:
-        if not w:
-            continue
-        add(w)  # original
-        lw = w.lower()
-
-        cand = set()
-        cand.add(re.sub(r'th', 't', lw))
-        cand.add(re.sub(r'th', 'd', lw))
-        cand.add(re.sub(r'ph', 'p', lw))
-        cand.add(re.sub(r'ph', 'f', lw))
-        cand.add(re.sub(r'sh', 's', lw))
-        cand.add(re.sub(r'ch', 's', lw))
-        cand.add(re.sub(r'qu', 'k', lw))
-        cand.add(re.sub(r'x', 'ks', lw))
-        cand.add(re.sub(r'c(?=[eiy])', 's', lw))
-        cand.add(re.sub(r'c', 'k', lw))
-        cand.add(re.sub(r'v', 'b', lw))
-        cand.add(re.sub(r'f', 'p', lw))
-        cand.add(re.sub(r'z', 's', lw))
-
-        if 'i' in lw and len(lw) >= 4 and lw.isalpha():
-            cand.add(lw.replace('i', 'e', 1))
-        if 'e' in lw and len(lw) >= 4 and lw.isalpha():
-            cand.add(lw.replace('e', 'i', 1))
-
-        for v in cand:
-            if v and v != lw:
-                add(v)
-
-    MAX = 1500
-    if len(out) > MAX:
-        out = set(list(out)[:MAX])
-    return list(out)
+    return grammar_cache.get(source, accent_mode, sr, build_words=build, passage_id=pid)
 
 
 # ----------------- JSON cleaning for model outputs -----------------
@@ -364,7 +373,27 @@ def create_app():
 
     with app.app_context():
         db.create_all()
+        ensure_schema()
         seed_initial_data()
+        # passages saved before the derived columns existed, or whose text changed outside the app
+        stale = [p for p in Passage.query.all()
+                 if p.tokens_json is None or p.word_count is None or p.phonetic_json is None
+                 or p.content_hash != content_hash(p.text)]
+        for p in stale:
+            index_passage(p)
+        if stale:
+            db.session.commit()
+            print(f"[passages] rebuilt derived data for {len(stale)} passage(s)")
+        # sessions saved before the summary columns existed
+        filled = summarize_sessions(Session.total_miscues.is_(None))
+        if filled:
+            print(f"[schema] summarized {filled} session(s)")
+
+    # Load Whisper at worker boot so the first student doesn't pay for it
+    # (not needed when a sidecar process owns the models)
+    if (os.getenv("ASR_WHISPER_PRELOAD", "true").lower() in {"1", "true", "yes", "y"}
+            and sidecar_client() is None):
+        preload_whisper(background=True)
 
     # ------- utilities -------
     def save_avatar(file_storage, user_id) -> Optional[str]:
@@ -543,6 +572,7 @@ def create_app():
                 _ = secure_filename(f.filename)
                 text = f.read().decode('utf-8', errors='ignore')
             p = Passage(title=title, text=text, grade_level=grade_level)
+            index_passage(p)
             db.session.add(p)
             db.session.commit()
             flash('Passage created.', 'success')
@@ -555,8 +585,7 @@ def create_app():
     @login_required
     def passage_view(pid):
         p = Passage.query.get_or_404(pid)
-        tokens = tokenize_for_display(p.text)
-        return render_template('read.html', passage=p, tokens=tokens)
+        return render_template('read.html', passage=p, tokens=p.tokens, phonetic=p.phonetic)
 
     @app.route('/read')
     @login_required
@@ -573,9 +602,15 @@ def create_app():
         if request.method == 'POST':
             p.title = request.form.get('title', p.title)
             p.grade_level = request.form.get('grade_level', p.grade_level)
+            words = p.word_count
             if request.form.get('text') is not None:
                 p.text = request.form.get('text')
+                index_passage(p)
             db.session.commit()
+            if p.word_count != words:
+                summarize_sessions(Session.passage_id == p.id)
+            invalidate_analytics()  # cached answers carry passage titles too
+            grammar_cache.invalidate_passage(p.id)
             flash('Passage updated.', 'success')
             return redirect(url_for('passages'))
         return render_template('passage_edit.html', passage=p)
@@ -586,6 +621,8 @@ def create_app():
         p = Passage.query.get_or_404(pid)
         db.session.delete(p)
         db.session.commit()
+        grammar_cache.invalidate_passage(pid)
+        invalidate_analytics()
         if request.headers.get('X-Requested-With') == 'fetch':
             return jsonify({'ok': True})
         flash('Passage deleted.', 'info')
@@ -595,153 +632,75 @@ def create_app():
     @login_required
     def api_passage(pid):
         p = Passage.query.get_or_404(pid)
-        return jsonify({'id': p.id, 'title': p.title, 'grade_level': p.grade_level, 'text': p.text})
+        return jsonify({'id': p.id, 'title': p.title, 'grade_level': p.grade_level, 'text': p.text,
+                        'tokens': p.tokens, 'word_count': p.word_count, 'phonetic': p.phonetic})
 
-    # -----------------------------
-    # RESULTS + derived metrics
-    # -----------------------------
-    def _comp_details_for_session(s: Session):
-        """Return (pct, correct, total) using answered-only denominator."""
-        correct = total = None
-        if hasattr(Session, 'comprehension_correct') and hasattr(Session, 'comprehension_total'):
-            correct, total = s.comprehension_correct, s.comprehension_total
-        else:
-            try:
-                e = json.loads(s.errors_json or '{}')
-                comp = e.get('comprehension') or {}
-                correct, total = comp.get('correct'), comp.get('total')
-            except Exception:
-                correct = total = None
-        try:
-            correct = int(correct)
-            total = int(total)
-            if total > 0:
-                pct = round(correct / total * 100.0, 1)
+    @app.route('/api/align', methods=['POST'])
+    @login_required
+    def api_align():
+        """
+        Server-side miscue alignment (same output as aligner.align in alignment.js).
+        JSON body: tokens[], plus ref_words[] or passage_id or text; optional opts
+        {minConfidence, finalOnly, maxEd, maxInsertionsShown}.
+        """
+        data = request.get_json(silent=True) or {}
+        ref_words = data.get('ref_words')
+        phonetic = None
+        if not ref_words:
+            if data.get('passage_id'):
+                try:
+                    pid = int(data['passage_id'])
+                except (TypeError, ValueError):
+                    return jsonify({'ok': False, 'error': 'passage_id must be an integer'}), 400
+                p = Passage.query.get_or_404(pid)
+                ref_words, phonetic = p.tokens, p.phonetic
             else:
-                pct = None
-        except Exception:
-            pct = None
-        return pct, correct, total
-
-    def _comp_level_from_pct(pct: Optional[float]) -> Optional[str]:
-        if pct is None:
-            return None
-        if pct <= 59:
-            return "FRUSTRATION"
-        if pct <= 79:
-            return "INSTRUCTIONAL"
-        return "INDEPENDENT"
-
-    def _word_reading_score(words_total: int, total_miscues: int) -> Optional[int]:
-        """Score = (correct words / total words)*100 rounded, clamped 0..100."""
-        if not words_total:
-            return None
-        correct_words = max(0, words_total - total_miscues)
-        pct = round((correct_words / float(words_total)) * 100.0)
-        return max(0, min(100, int(pct)))
+                ref_words = tokenize_for_display(data.get('text') or '')
+        tokens = data.get('tokens') or []
+        if not isinstance(ref_words, list) or not isinstance(tokens, list):
+            return jsonify({'ok': False, 'error': 'ref_words and tokens must be lists'}), 400
+        try:
+            opts = align_opts(data.get('opts'))
+        except (TypeError, ValueError):
+            return jsonify({'ok': False, 'error': 'Invalid opts'}), 400
+        if phonetic and not opts['phonetic']:
+            opts['phonetic'] = phonetic
 
-    def _word_level_from_score(score: Optional[int]) -> Optional[str]:
-        if score is None:
-            return None
-        if score >= 97:
-            return "INDEPENDENT"
-        if score >= 90:
-            return "INSTRUCTIONAL"
-        return "FRUSTRATION"
-
-    def _reading_profile(comp_level: Optional[str], wr_level: Optional[str]) -> Optional[str]:
-        if not comp_level and not wr_level:
-            return None
-        if comp_level == "FRUSTRATION" or wr_level == "FRUSTRATION":
-            return "FRUSTRATION"
-        if comp_level == "INDEPENDENT" and wr_level == "INDEPENDENT":
-            return "INDEPENDENT"
-        return "INSTRUCTIONAL"
+        t0 = time.perf_counter()
+        out = align_words([str(w) for w in ref_words], [t for t in tokens if isinstance(t, dict)], **opts)
+        out['align_ms'] = round((time.perf_counter() - t0) * 1000.0, 2)
+        return jsonify({'ok': True, **out})
 
+    # -----------------------------
+    # RESULTS + derived metrics
+    # -----------------------------
     @app.route('/results')
     @login_required
     def results():
-        sessions = Session.query.order_by(Session.started_at.desc()).all()
-        rows = []
-        for s in sessions:
-            p = Passage.query.get(s.passage_id) if s.passage_id else None
-            words_total = count_words_no_punct(p.text) if p else 0
-
-            # miscues
-            try:
-                errs = json.loads(s.errors_json or '{}')
-            except Exception:
-                errs = {}
-            mispron = int(errs.get("mispronunciations", 0))
-            omiss   = int(errs.get("omissions", 0))
-            subst   = int(errs.get("substitutions", 0))
-            insert  = int(errs.get("insertions", 0))
-            repeat  = int(errs.get("repetitions", 0))
-            transpo = int(errs.get("transpositions", 0))
-            rev     = int(errs.get("reversals", 0))
-            total_miscues = mispron + omiss + subst + insert + repeat + transpo + rev
-
-            # comprehension
-            comp_pct, comp_correct, comp_total = _comp_details_for_session(s)
-            comp_level = _comp_level_from_pct(comp_pct)
-
-            # word reading metrics
-            wr_score = _word_reading_score(words_total, total_miscues)
-            wr_level = _word_level_from_score(wr_score)
-
-            # combined profile
-            profile = _reading_profile(comp_level, wr_level)
-
-            # display name using new fields, fallback to legacy
-            try:
-                display_name = s.student_display_name  # property from models.py
-            except Exception:
-                mi = (getattr(s, "middle_initial", "") or "").strip().rstrip(".")
-                mi_part = f" {mi}." if mi else ""
-                if getattr(s, "surname", None) or getattr(s, "first_name", None):
-                    display_name = f"{(s.surname or '').strip()}, {(s.first_name or '').strip()}{mi_part}".strip(", ")
-                else:
-                    display_name = s.student_name or "—"
-
-            rows.append({
-                "id": s.id,
-                "student_name": display_name,            # keep key name for existing templates
-                "surname": getattr(s, "surname", None),
-                "first_name": getattr(s, "first_name", None),
-                "middle_initial": getattr(s, "middle_initial", None),
-                "grade_level": getattr(s, "grade_level", None),
-
-                "words": words_total,
-                "time_sec": round(float(s.duration_sec or 0), 1),
-                "wpm": round(float(s.wcpm or 0), 1),
-                "accuracy": round(float(s.accuracy or 0), 1),
-
-                # comprehension
-                "comp_pct": comp_pct,
-                "comp_correct": comp_correct,
-                "comp_total": comp_total,
-                "comp_level": comp_level,
-
-                # miscues
-                "mispronunciations": mispron,
-                "omissions": omiss,
-                "substitutions": subst,
-                "insertions": insert,
-                "repetitions": repeat,
-                "transpositions": transpo,
-                "reversals": rev,
-
-                # derived
-                "word_score": wr_score,
-                "word_level": wr_level,
-                "reading_profile": profile,
-
-                # links
-                "csv_url": url_for('export_csv', sid=s.id),
-                "pdf_url": url_for('report_pdf', sid=s.id),
-                "del_url": url_for('session_delete', sid=s.id),
-            })
-        return render_template('results.html', rows=rows)
+        filters = parse_filters(request.args)
+        rows, next_cursor = results_page(filters, cursor=request.args.get('after'),
+                                         per_page=request.args.get('per_page', type=int))
+        for r in rows:
+            r.update(csv_url=url_for('export_csv', sid=r['id']), pdf_url=url_for('report_pdf', sid=r['id']),
+                     del_url=url_for('session_delete', sid=r['id']))
+        args = request.args.to_dict()
+        paged = args.pop('after', None)
+        passages = db.session.execute(select(Passage.id, Passage.title).order_by(Passage.title)).all()
+        grades = db.session.execute(select(Session.grade_level).distinct().order_by(Session.grade_level)).scalars().all()
+        sections = db.session.execute(select(Session.section).where(Session.section.isnot(None))
+                                      .distinct().order_by(Session.section)).scalars().all()
+        return render_template('results.html', rows=rows, filters=filters,
+                               next_url=url_for('results', **args, after=next_cursor) if next_cursor else None,
+                               first_url=url_for('results', **args) if paged else None,
+                               passages=passages, grades=grades, sections=sections, levels=LEVELS)
+
+    @app.route('/api/analytics')
+    @login_required
+    def api_analytics():
+        """Per-group session counts, mean WCPM/accuracy/comprehension and reading-profile distribution."""
+        group_by = parse_group_by(request.args.get('group_by'))
+        stats = class_stats(group_by, parse_filters(request.args))
+        return jsonify({'ok': True, **stats})
 
     # -----------------------------
     # Save a session  (REQUIRES learner fields)
@@ -756,6 +715,10 @@ def create_app():
         missing = [k for k in required if not str(data.get(k, "")).strip()]
         if missing:
             return jsonify({"ok": False, "error": f"Missing: {', '.join(missing)}"}), 400
+        try:
+            events = parse_word_events(data.get('word_events'))
+        except WordEventError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
 
         # Build display for legacy column (optional)
         mi = str(data.get("middle_initial", "")).strip().rstrip(".")
@@ -769,6 +732,7 @@ def create_app():
             first_name=str(data.get('first_name', '')).strip(),
             middle_initial=str(data.get('middle_initial', '')).strip(),
             grade_level=str(data.get('grade_level', '')).strip(),
+            section=str(data.get('section') or '').strip()[:64] or None,
 
             # Legacy fill (kept for older templates/exports)
             student_name=legacy_name or None,
@@ -779,28 +743,23 @@ def create_app():
             accuracy=float(data.get('accuracy', 0)),
             errors_json=json.dumps(data.get('errors', {}) or {})
         )
+        summarize_session(s)
         db.session.add(s)
         db.session.flush()
-        for we in data.get('word_events', []):
-            db.session.add(WordEvent(
-                session_id=s.id,
-                word_index=we.get('word_index', 0),
-                status=we.get('status', 'unknown'),
-                start_ms=we.get('start_ms'),
-                end_ms=we.get('end_ms'),
-                asr_text=we.get('asr_text', ''),
-                confidence=we.get('confidence', 0.0),
-            ))
+        insert_word_events(s.id, events)
         db.session.commit()
+        invalidate_analytics()
         return jsonify({'ok': True, 'id': s.id})
 
     @app.route('/api/sessions/<int:sid>/delete', methods=['POST'])
     @login_required
     def session_delete(sid):
         s = Session.query.get_or_404(sid)
-        WordEvent.query.filter_by(session_id=sid).delete()
+        delete_word_events(sid)
         db.session.delete(s)
         db.session.commit()
+        invalidate_analytics()
+        report_cache.discard(sid)
         return jsonify({'ok': True})
 
     # -----------------------------
@@ -810,82 +769,102 @@ def create_app():
     @login_required
     def export_csv(sid):
         _ = Session.query.get_or_404(sid)
-        we = WordEvent.query.filter_by(session_id=sid).order_by(WordEvent.word_index.asc()).all()
-        sio = io.StringIO(newline="")
-        writer = csv.writer(sio)
-        writer.writerow(["word_index", "status", "start_ms", "end_ms", "asr_text", "confidence"])
-        for e in we:
-            writer.writerow([
-                e.word_index,
-                e.status,
-                e.start_ms or "",
-                e.end_ms or "",
-                (e.asr_text or ""),
-                e.confidence or 0
-            ])
-        data = sio.getvalue().encode("utf-8")
-        return send_file(BytesIO(data), mimetype="text/csv", as_attachment=True,
-                         download_name=f"session_{sid}.csv")
+        rows = ((e[1], e[2], e[3] or "", e[4] or "", e[5] or "", e[6] or 0) for e in event_rows(None, session_id=sid))
+        chunks = csv_chunks(["word_index", "status", "start_ms", "end_ms", "asr_text", "confidence"], rows)
+        return Response(stream_with_context(c.encode("utf-8") for c in chunks), mimetype="text/csv",
+                        headers={"Content-Disposition": f"attachment; filename=session_{sid}.csv"})
+
+    @app.route('/api/export')
+    @login_required
+    def export_bulk():
+        """Stream every matching session (kind=sessions) or word event (kind=events) as CSV or NDJSON."""
+        kind = request.args.get('kind', 'sessions')
+        fmt = request.args.get('format', 'csv')
+        if kind not in KINDS or fmt not in FORMATS:
+            return jsonify({"ok": False, "error": f"kind must be one of {KINDS}, format one of {FORMATS}"}), 400
+        gz = request.args.get('gzip', '1').lower() in {'1', 'true', 'yes', 'y'}
+        with_events = request.args.get('events', '').lower() in {'1', 'true', 'yes', 'y'}
+        chunks = export_chunks(kind, fmt, parse_filters(request.args), with_events=with_events, gzip=gz)
+        mimetype = "application/gzip" if gz else ("text/csv" if fmt == "csv" else "application/x-ndjson")
+        return Response(stream_with_context(chunks), mimetype=mimetype, headers={
+            "Content-Disposition": f"attachment; filename={export_filename(kind, fmt, gz)}"})
 
     @app.route('/api/sessions/<int:sid>/report.pdf')
     @login_required
     def report_pdf(sid):
-        s = Session.query.get_or_404(sid)
-        p = Passage.query.get(s.passage_id) if s.passage_id else None
-        words_total = count_words_no_punct(p.text) if p else 0
-        try:
-            errors = json.loads(s.errors_json or '{}')
-        except Exception:
-            errors = {}
+        updated_at = db.session.execute(select(Session.updated_at).where(Session.id == sid)).first()
+        if updated_at is None:
+            abort(404)
+        etag = report_etag(sid, updated_at[0])
+        if request.if_none_match.contains(etag):
+            resp = app.response_class(status=304)
+        else:
+            path = report_cache.get(sid, etag)
+            try:
+                fh = open(path, 'rb') if path else None
+            except OSError:  # evicted since the lookup
+                fh = None
+            if fh is None:
+                s = db.session.get(Session, sid)
+                path = report_cache.put(sid, etag, render_report(session_row(s)))
+                fh = open(path, 'rb')
+            resp = send_file(fh, mimetype='application/pdf', as_attachment=True,
+                             download_name=f'session_{sid}.pdf')
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = 'private, no-cache'
+        return resp
 
-        # display name using new fields, fallback
+    # -----------------------------
+    # Batch class reports (submit + poll + download)
+    # -----------------------------
+    @app.route('/api/reports/batch', methods=['POST'])
+    @login_required
+    def api_report_batch_submit():
+        """Render every session matching the /results filters as a ZIP of PDFs (or one merged PDF)."""
+        data = request.get_json(silent=True) or request.form.to_dict() or {}
+        fmt = (data.get('format') or 'zip').lower()
+        if fmt not in REPORT_FORMATS:
+            return jsonify({'ok': False, 'error': f"format must be one of {REPORT_FORMATS}"}), 400
+        filters = parse_filters({k: str(v) for k, v in data.items() if v is not None})
+        sessions = db.session.execute(filtered_query(filters).limit(report_batches.max_sessions + 1)).scalars().all()
+        if not sessions:
+            return jsonify({'ok': False, 'error': 'No sessions match these filters'}), 400
+        if len(sessions) > report_batches.max_sessions:
+            return jsonify({'ok': False, 'error': f"More than {report_batches.max_sessions} sessions; "
+                                                  "narrow the filters"}), 400
         try:
-            display_name = s.student_display_name
-        except Exception:
-            mi = (getattr(s, "middle_initial", "") or "").strip().rstrip(".")
-            mi_part = f" {mi}." if mi else ""
-            if getattr(s, "surname", None) or getattr(s, "first_name", None):
-                display_name = f"{(s.surname or '').strip()}, {(s.first_name or '').strip()}{mi_part}".strip(", ")
-            else:
-                display_name = s.student_name or "—"
-
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-
-        y = height - 50
-        c.setFont("Helvetica-Bold", 18)
-        c.drawString(50, y, "Reading Session Report"); y -= 28
-
-        c.setFont("Helvetica", 12)
-        c.drawString(50, y, f"Student: {display_name}"); y -= 18
-        c.drawString(50, y, f"Grade Level: {getattr(s, 'grade_level', '') or '—'}"); y -= 18
-        c.drawString(50, y, f"Words: {words_total}"); y -= 18
-        c.drawString(50, y, f"Time: {fmt_mmss(s.duration_sec)}"); y -= 28
-
-        c.setFont("Helvetica-Bold", 13)
-        c.drawString(50, y, "Miscues (Frequency)"); y -= 20
-
-        c.setFont("Helvetica", 12)
-        line_gap = 16
-        fields = [
-            ("Mispronunciations", int(errors.get("mispronunciations", 0))),
-            ("Omissions", int(errors.get("omissions", 0))),
-            ("Substitutions", int(errors.get("substitutions", 0))),
-            ("Insertions", int(errors.get("insertions", 0))),
-            ("Repetitions", int(errors.get("repetitions", 0))),
-            ("Transpositions", int(errors.get("transpositions", 0))),
-            ("Reversals", int(errors.get("reversals", 0))),
-        ]
-        for label, val in fields:
-            c.drawString(60, y, f"{label}: {val}")
-            y -= line_gap
-
-        c.showPage()
-        c.save()
-        buffer.seek(0)
-        return send_file(buffer, mimetype='application/pdf', as_attachment=True,
-                         download_name=f'session_{sid}.pdf')
+            job = report_batches.submit([session_row(s) for s in sessions], fmt, owner=session.get('user_id'))
+        except BatchBusy as e:
+            resp = jsonify({'ok': False, 'error': str(e)})
+            resp.headers['Retry-After'] = '10'
+            return resp, 429
+        resp = jsonify({'ok': True, **job.to_dict(),
+                        'status_url': url_for('api_report_batch_status', job_id=job.id)})
+        resp.headers['Location'] = url_for('api_report_batch_status', job_id=job.id)
+        return resp, 202
+
+    @app.route('/api/reports/batch/<job_id>')
+    @login_required
+    def api_report_batch_status(job_id):
+        job = report_batches.get(job_id, owner=session.get('user_id'))
+        if job is None:
+            return jsonify({'ok': False, 'error': 'Unknown or expired job'}), 404
+        wait = min(max(request.args.get('wait', 0, type=float), 0.0), REPORT_STATUS_WAIT_SEC)
+        if not long_poll_wait(job.done, wait):
+            return still_running(job.to_dict())
+        if job.state != 'done':
+            return jsonify({'ok': False, **job.to_dict()}), 500
+        return jsonify({'ok': True, **job.to_dict(),
+                        'download_url': url_for('api_report_batch_download', job_id=job.id)}), 200
+
+    @app.route('/api/reports/batch/<job_id>/download')
+    @login_required
+    def api_report_batch_download(job_id):
+        job = report_batches.get(job_id, owner=session.get('user_id'))
+        if job is None or job.state != 'done' or not job.path or not os.path.exists(job.path):
+            return jsonify({'ok': False, 'error': 'Report batch not ready'}), 404
+        mimetype = 'application/zip' if job.fmt == 'zip' else 'application/pdf'
+        return send_file(job.path, mimetype=mimetype, as_attachment=True, download_name=job.filename)
 
     # -----------------------------
     # ASR status + API
@@ -893,26 +872,32 @@ def create_app():
     @app.route('/api/asr/status')
     @login_required
     def asr_status():
-        m = _load_model()
+        sidecar = sidecar_client()
+        sidecar_status = sidecar.status() if sidecar else None
+        # with a sidecar configured, don't load Vosk into this worker just to report on it
+        vosk_loaded = sidecar_status.get('vosk_loaded') if sidecar else bool(_load_model())
         return jsonify({
             "vosk_model_path": os.getenv("VOSK_MODEL"),
-            "vosk_loaded": bool(m),
+            "vosk_loaded": vosk_loaded,
             "default_lang": (os.getenv("ASR_LANG") or "en"),
             "default_accent": (os.getenv("ASR_ACCENT") or ""),
             "prefer_whisper_first": (os.getenv("ASR_PREFER_WHISPER_FIRST", "true").lower() in {"1","true","yes","y"}),
+            "whisper": get_whisper_pool().status(),
+            "stream_sessions": len(asr_streams),
+            "grammar_cache": grammar_cache.stats(),
+            "passage_grammar": _passage_grammar_enabled(),
+            "mode": asr_mode(),
+            "jobs": asr_jobs.stats(),
+            "transcript_cache": transcripts.stats(),
+            "sidecar": sidecar_status,
         })
 
-    @app.route('/api/asr', methods=['POST'])
-    @login_required
-    def api_asr():
-        audio = request.files.get('audio')
-        if not audio:
-            return jsonify({'ok': False, 'error': 'No audio uploaded'}), 400
-
-        lang = (request.form.get('lang') or os.getenv("ASR_LANG") or 'en').strip().lower()
-        accent_mode = _accent_mode_from_request(request)
+    def _asr_params(req):
+        """Everything an ASR run needs from the request, so the run itself can happen off-request."""
+        lang = (req.form.get('lang') or os.getenv("ASR_LANG") or 'en').strip().lower()
+        accent_mode = _accent_mode_from_request(req)
 
-        grammar_json = request.form.get('grammar')
+        grammar_json = req.form.get('grammar')
         grammar_words = None
         if grammar_json:
             try:
@@ -920,50 +905,191 @@ def create_app():
             except Exception:
                 grammar_words = None
 
-        if grammar_words and accent_mode == "fil":
-            try:
-                grammar_words = _expand_filipino_variants(grammar_words)
-            except Exception as e:
-                print("[ASR] grammar expand error:", e)
+        passage = None
+        pid = req.form.get('passage_id', type=int)
+        if pid and not grammar_words:
+            passage = Passage.query.get(pid)
+
+        return {
+            'lang': lang,
+            'accent_mode': accent_mode,
+            'grammar_entry': _grammar_entry_for(grammar_words, passage, accent_mode),
+            'mode': req.form.get('mode'),
+            'prefer_whisper': (os.getenv("ASR_PREFER_WHISPER_FIRST", "true").lower() in {"1", "true", "yes", "y"}),
+        }
 
-        prefer_whisper = (os.getenv("ASR_PREFER_WHISPER_FIRST", "true").lower() in {"1", "true", "yes", "y"})
+    def _run_asr(audio_bytes, params):
+        # Decode once; every engine works on the same in-memory PCM
+        t0 = time.perf_counter()
+        pcm = decode_pcm16(audio_bytes, 16000)
+        decode_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+        if pcm is None:
+            return {'ok': False, 'error': 'Could not decode uploaded audio'}, 415
+
+        lang, accent_mode = params['lang'], params['accent_mode']
+        run_args = dict(lang=lang, grammar_entry=params['grammar_entry'],
+                        mode=params['mode'], prefer_whisper=params['prefer_whisper'])
+        res = transcribe_via_sidecar(pcm, **run_args)
+        out, code = res if res is not None else transcribe_pcm(pcm, **run_args)
+        out.setdefault('timings_ms', {})['decode'] = decode_ms
+        if code == 200:
+            out.setdefault('lang', lang)
+            out.setdefault('accent', accent_mode or '')
+            print(f"[ASR] Using {out.get('engine')} ({out['mode']}) tokens={len(out.get('tokens', []))} "
+                  f"timings={out['timings_ms']}")
+            if params.get('cache_key'):
+                transcripts.put(params['cache_key'], dict(out))
+        out['cache'] = 'miss'
+        return out, code
+
+    def _asr_cache_key(audio_bytes, params):
+        entry = params['grammar_entry']
+        engine = "|".join([
+            asr_mode(params['mode']),
+            'whisper>vosk' if params['prefer_whisper'] else 'vosk>whisper',
+            get_whisper_pool().config['model'],
+            os.getenv("VOSK_MODEL") or '',
+        ])
+        return transcript_key(audio_bytes, engine, params['lang'], params['accent_mode'],
+                              entry.key if entry else '')
+
+    def _submit_asr(req):
+        """
+        Queue an ASR run for this upload.
+        Returns (job, cached_payload, error_response); exactly one is set.
+        """
+        audio = req.files.get('audio')
+        if not audio:
+            return None, None, (jsonify({'ok': False, 'error': 'No audio uploaded'}), 400)
+        params = _asr_params(req)
+        audio_bytes = audio.read()
+        params['cache_key'] = _asr_cache_key(audio_bytes, params)
+        hit = transcripts.get(params['cache_key'])
+        if hit is not None:
+            return None, dict(hit, cache='hit', state='done'), None
+        try:
+            job = asr_jobs.submit(_run_asr, audio_bytes, params, owner=session.get('user_id'))
+        except JobQueueFull as e:
+            resp = jsonify({'ok': False, 'error': 'ASR is busy, retry shortly', 'retry_after': e.retry_after})
+            resp.headers['Retry-After'] = str(e.retry_after)
+            return None, None, (resp, 429)
+        return job, None, None
+
+    def _job_accepted(job):
+        url = url_for('api_asr_job_status', job_id=job.id)
+        resp = jsonify({'ok': True, **job.to_dict(), 'status_url': url})
+        resp.headers['Location'] = url
+        resp.headers['Retry-After'] = str(POLL_INTERVAL_SEC)
+        return resp, 202
+
+    @app.route('/api/asr', methods=['POST'])
+    @login_required
+    def api_asr():
+        job, cached, err = _submit_asr(request)
+        if err:
+            return err
+        if cached:
+            return jsonify(cached), 200
+        # no request thread waits out a decode: like /api/asr/jobs, answer 202 with the job to poll
+        return _job_accepted(job)
 
-        def _try_whisper():
-            out = transcribe_blob_or_501(audio, lang=lang)
-            if out.get('ok'):
-                out.setdefault('engine', 'whisper')
-                out.setdefault('lang', lang)
-                out.setdefault('accent', accent_mode or '')
-                print(f"[ASR] Using Whisper tokens={len(out.get('tokens', []))}")
-                return out, 200
-            return out, out.get('status', 500)
+    # -----------------------------
+    # ASR jobs (submit + long-poll)
+    # -----------------------------
+    @app.route('/api/asr/jobs', methods=['POST'])
+    @login_required
+    def api_asr_job_submit():
+        job, cached, err = _submit_asr(request)
+        if err:
+            return err
+        if cached:
+            return jsonify(cached), 200
+        return _job_accepted(job)
+
+    @app.route('/api/asr/jobs/<job_id>')
+    @login_required
+    def api_asr_job_status(job_id):
+        job = asr_jobs.get(job_id, owner=session.get('user_id'))
+        if job is None:
+            return jsonify({'ok': False, 'error': 'Unknown or expired job'}), 404
+        wait = min(max(request.args.get('wait', 0, type=float), 0.0), ASR_LONG_POLL_SEC)
+        if not long_poll_wait(job.done, wait):
+            return still_running(job.to_dict())
+        return jsonify({**job.result, **job.to_dict()}), job.code
 
-        def _try_vosk():
+    # -----------------------------
+    # Streaming ASR (live Vosk recognizer per reading)
+    # -----------------------------
+    @app.route('/api/asr/stream', methods=['POST'])
+    @login_required
+    def api_asr_stream_start():
+        data = request.get_json(silent=True) or {}
+        try:
+            sr = int(data.get('sr') or 16000)
+        except Exception:
+            sr = 16000
+        grammar_words = data.get('grammar') if isinstance(data.get('grammar'), list) else None
+        accent = (data.get('accent') or os.getenv("ASR_ACCENT") or "").strip().lower()
+        accent_mode = "fil" if accent in {"fil", "filipino", "ph", "tl"} else None
+        passage = None
+        if data.get('passage_id'):
             try:
-                vosk_out = transcribe_blob_vosk_or_none(audio, grammar_words=grammar_words)
-            except Exception as e:
-                print(f"[ASR] VOSK error: {e}")
-                vosk_out = None
-            if vosk_out and vosk_out.get('ok'):
-                vosk_out.setdefault('engine', 'vosk')
-                vosk_out.setdefault('lang', lang)
-                vosk_out.setdefault('accent', accent_mode or '')
-                print(f"[ASR] Using VOSK ({os.getenv('VOSK_MODEL')}) tokens={len(vosk_out.get('tokens', []))}")
-                return vosk_out, 200
-            return {'ok': False, 'error': 'Vosk failed'}, 500
-
-        if prefer_whisper:
-            out, code = _try_whisper()
-            if code == 200:
-                return jsonify(out), 200
-            out, code = _try_vosk()
-            return jsonify(out), code
-        else:
-            out, code = _try_vosk()
-            if code == 200:
-                return jsonify(out), 200
-            out, code = _try_whisper()
-            return jsonify(out), code
+                passage = Passage.query.get(int(data.get('passage_id')))
+            except Exception:
+                passage = None
+        entry = _grammar_entry_for(grammar_words, None if grammar_words else passage, accent_mode, sr=sr)
+
+        sid = asr_streams.start(grammar=entry.grammar if entry else None, sr=sr, owner=session.get('user_id'))
+        if not sid:
+            return jsonify({'ok': False, 'error': 'Streaming ASR not available'}), 501
+        # optional live alignment against the passage, returned with every chunk
+        if data.get('align') and passage is not None:
+            try:
+                opts = align_opts(data.get('align_opts'))
+                opts['phonetic'] = passage.phonetic
+                asr_streams.get(sid).aligner = IncrementalAligner(passage.tokens, **opts)
+            except (TypeError, ValueError):
+                pass
+        return jsonify({'ok': True, 'stream_id': sid, 'sr': sr, 'engine': 'vosk'})
+
+    @app.route('/api/asr/stream/<sid>', methods=['POST'])
+    @login_required
+    def api_asr_stream_chunk(sid):
+        st = asr_streams.get(sid, owner=session.get('user_id'))
+        if st is None:
+            return jsonify({'ok': False, 'error': 'Unknown or expired stream'}), 404
+        pcm = request.get_data(cache=False)
+        words, partial = st.feed(pcm)
+        out = {
+            'ok': True,
+            'tokens': [{'text': w, 'confidence': 0.9, 'final': True} for w in words],
+            'partial': partial,
+        }
+        if st.aligner is not None:
+            with st.lock:  # one aligner per stream; concurrent chunk requests must not interleave
+                out['align'] = st.aligner.update(st.tokens())
+        return jsonify(out)
+
+    @app.route('/api/asr/stream/<sid>/finish', methods=['POST'])
+    @login_required
+    def api_asr_stream_finish(sid):
+        st = asr_streams.get(sid, owner=session.get('user_id'))
+        if st is None:
+            return jsonify({'ok': False, 'error': 'Unknown or expired stream'}), 404
+        pcm = request.get_data(cache=False)
+        words = st.feed(pcm)[0] if pcm else []
+        words += st.finish()
+        asr_streams.close(sid)
+        out = {
+            'ok': True,
+            'engine': 'vosk',
+            'tokens': [{'text': w, 'confidence': 0.9, 'final': True} for w in words],
+            'transcript': st.tokens(),
+        }
+        if st.aligner is not None:
+            with st.lock:
+                out['align'] = st.aligner.finalize(out['transcript'])
+        return jsonify(out)
 
     # -----------------------------
     # Comprehension page + APIs
@@ -1054,7 +1180,9 @@ def create_app():
                                 e = {}
                             e['comprehension'] = {'correct': correct, 'total': total}
                             s.errors_json = json.dumps(e)
+                        summarize_session(s)
                         db.session.commit()
+                        invalidate_analytics()
                 except Exception as se:
                     print("[/api/submit_comprehension] session update error:", se)
 
@@ -1092,7 +1220,9 @@ def create_app():
             e['comprehension'] = {'correct': correct, 'total': total}
             s.errors_json = json.dumps(e)
 
+        summarize_session(s)
         db.session.commit()
+        invalidate_analytics()
 
         pct = (correct / total * 100.0) if total else 0.0
         return jsonify({
@@ -1151,6 +1281,118 @@ def create_app():
                 "error": f"{type(e).__name__}: {e}"
             }), 502
 
+    # -----------------------------
+    # CLI commands
+    # -----------------------------
+    @app.cli.command('asr-batch')
+    @click.argument('source', required=False, type=click.Path(exists=True, file_okay=False))
+    @click.option('--manifest', type=click.Path(exists=True, dir_okay=False),
+                  help='File with one audio path per line, or NDJSON {"path", "lang", "passage_id"}.')
+    @click.option('--out', default='-', show_default=True, help='NDJSON output (appended; reruns skip finished files).')
+    @click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+    @click.option('--lang', default=None, help='Language (default: ASR_LANG or en).')
+    @click.option('--mode', default=None, help='sequential | race | fuse (default: ASR_MODE).')
+    @click.option('--passage-id', type=int, default=None, help='Passage whose grammar applies to every file.')
+    @click.option('--accent', default=None, help='Set to "fil" for Filipino-accent grammar variants.')
+    def asr_batch_cmd(source, manifest, out, workers, lang, mode, passage_id, accent):
+        """Transcribe a directory or manifest of recordings offline."""
+        if not source and not manifest:
+            raise click.UsageError('Give a SOURCE directory and/or --manifest.')
+        items = collect_inputs(source, manifest)
+        if passage_id:
+            for it in items:
+                it.setdefault('passage_id', passage_id)
+
+        accent_mode = 'fil' if (accent or os.getenv("ASR_ACCENT") or '').strip().lower() in {"fil", "filipino", "ph", "tl"} else None
+        grammars = {}
+        for pid in {it.get('passage_id') for it in items if it.get('passage_id')}:
+            entry = _grammar_entry_for(None, Passage.query.get(int(pid)), accent_mode)
+            if entry:
+                grammars[str(pid)] = entry.words
+
+        summary = run_batch(items, out_path=out, workers=workers, settings={
+            'lang': (lang or os.getenv("ASR_LANG") or 'en').strip().lower(),
+            'mode': mode,
+            'prefer_whisper': os.getenv("ASR_PREFER_WHISPER_FIRST", "true").lower() in {"1", "true", "yes", "y"},
+            'grammars': grammars,
+        })
+        click.echo(f"[asr-batch] {json.dumps(summary)}", err=True)
+        if summary.get('aborted'):
+            raise click.ClickException('batch stopped early; rerun with the same --out to resume')
+
+    @app.cli.command('export-sessions')
+    @click.option('--kind', type=click.Choice(KINDS), default='sessions', show_default=True)
+    @click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv', show_default=True)
+    @click.option('--out', default='-', show_default=True, help='Output file ("-" for stdout).')
+    @click.option('--gzip', 'gz', is_flag=True, help='Gzip the output (implied by an --out ending in .gz).')
+    @click.option('--events', 'with_events', is_flag=True, help='NDJSON sessions: include their word events.')
+    @click.option('--grade', default=None)
+    @click.option('--section', default=None)
+    @click.option('--passage-id', type=int, default=None)
+    @click.option('--date-from', default=None, help='YYYY-MM-DD, inclusive.')
+    @click.option('--date-to', default=None, help='YYYY-MM-DD, inclusive.')
+    @click.option('--level', default=None, help='Reading profile.')
+    def export_sessions_cmd(kind, fmt, out, gz, with_events, **filters):
+        """Stream saved sessions or word events to CSV/NDJSON without loading them into memory."""
+        filters = parse_filters({k: v for k, v in filters.items() if v is not None})
+        gz = gz or out.endswith('.gz')
+        stream = click.get_binary_stream('stdout') if out == '-' else open(out, 'wb')
+        size = 0
+        try:
+            for chunk in export_chunks(kind, fmt, filters, with_events=with_events, gzip=gz):
+                stream.write(chunk)
+                size += len(chunk)
+        finally:
+            if out != '-':
+                stream.close()
+        click.echo(f"[export] {kind} {fmt}{' gzip' if gz else ''}: {size} bytes", err=True)
+
+    @app.cli.command('pack-word-events')
+    @click.option('--batch-size', type=int, default=500, show_default=True, help='Sessions per commit.')
+    @click.option('--keep-rows', is_flag=True, help='Write the packs but leave the WordEvent rows in place (unused while the pack exists).')
+    @click.option('--unpack', is_flag=True, help='Convert packs back into WordEvent rows instead.')
+    @click.option('--vacuum', is_flag=True, help='VACUUM the database afterwards to give the space back.')
+    def pack_word_events_cmd(batch_size, keep_rows, unpack, vacuum):
+        """Move saved word events into one packed blob per session (see WORD_EVENTS_STORAGE)."""
+        if unpack:
+            click.echo(f"[pack] unpacked {unpack_sessions(max(1, batch_size))} session(s)", err=True)
+        else:
+            def progress(total, elapsed):
+                click.echo(f"[pack] {total['sessions']} sessions, {total['events']} events, "
+                           f"{total['bytes']} bytes", err=True)
+
+            summary = pack_sessions(max(1, batch_size), keep_rows=keep_rows, progress=progress)
+            click.echo(f"[pack] {json.dumps(summary)}", err=True)
+        if vacuum:
+            db.session.remove()
+            with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.exec_driver_sql("VACUUM")
+            click.echo("[pack] vacuumed", err=True)
+
+    @app.cli.command('rescore-sessions')
+    @click.option('--batch-size', type=int, default=2000, show_default=True, help='Sessions per query/commit.')
+    @click.option('--limit', type=int, default=None, help='Stop after this many sessions.')
+    @click.option('--dry-run', is_flag=True, help='Compute and report, but write nothing.')
+    def rescore_sessions_cmd(batch_size, limit, dry_run):
+        """Recompute miscue counts, accuracy, WCPM, levels and summary columns of saved sessions from their word events."""
+        passages = {}
+
+        def passage_words(pid):
+            if pid not in passages:
+                p = db.session.get(Passage, pid) if pid else None
+                passages[pid] = (p.tokens, p.word_count or 0) if p else None
+            return passages[pid]
+
+        def progress(total, elapsed):
+            rate = total['sessions'] / elapsed if elapsed > 0 else 0.0
+            click.echo(f"[rescore] {total['sessions']} sessions, {total['changed']} changed, "
+                       f"{rate:.0f} sessions/s", err=True)
+
+        summary = rescore_sessions(passage_words, batch_size=max(1, batch_size), dry_run=dry_run,
+                                   limit=limit, progress=progress)
+        invalidate_analytics()
+        click.echo(f"[rescore] {json.dumps(summary)}", err=True)
+
     return app
 
 
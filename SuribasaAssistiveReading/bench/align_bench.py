@@ -0,0 +1,285 @@
+# bench/align_bench.py
+"""
+Parity and speed check for services/alignment.py against static/js/alignment.js.
+
+    python bench/align_bench.py            # parity vs. stored fixtures + timings (JS timings need node)
+    python bench/align_bench.py --regen    # rebuild bench/fixtures/align_cases.json with node
+    python bench/align_bench.py --live     # also replay readings token by token (incremental vs. full)
+    python bench/align_bench.py --phonetic # also time alignment with the stored per-passage phonetic index
+
+Fixture cases are simulated readings of passages built from the seed word
+banks (skips, substitutions, sound-alike misreads, reversals, swaps,
+repetitions, insertions, low-confidence words, punctuation), from a few
+words up to 1500. Their `expected` output comes from running the real
+browser code in node, so a parity failure means the port drifted. Every
+case is also aligned with its passage's phonetic index (opts.phonetic), in
+Python and in node, and must give the same output as without it.
+"""
+import os, sys, json, time, random, shutil, argparse, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+FIXTURES = os.path.join(ROOT, "bench", "fixtures", "align_cases.json")
+
+# Loads phonetics.js + alignment.js into a fake `window` and runs every case.
+# argv: mode ("run" | "time" | "live"), repeats. Cases on stdin; JSON on stdout.
+NODE_RUNNER = r"""
+const fs = require('fs'), vm = require('vm'), path = require('path');
+const [root, mode, repArg] = process.argv.slice(-3), reps = +repArg || 1;
+const ctx = { window: {} }; vm.createContext(ctx);
+for (const f of ['phonetics.js', 'alignment.js'])
+  vm.runInContext(fs.readFileSync(path.join(root, 'static', 'js', f), 'utf8'), ctx);
+const aligner = ctx.window.aligner;
+const cases = JSON.parse(fs.readFileSync(0, 'utf8'));
+const ms = t0 => Number(process.hrtime.bigint() - t0) / 1e6;
+const out = cases.map(c => {
+  if (mode === 'run') return JSON.parse(JSON.stringify(aligner.align(c.ref_words, c.tokens, c.opts)));
+  if (mode === 'live') {
+    // one update per arriving token, like handleTokens during a reading
+    const inc = aligner.incremental(c.ref_words, c.opts), t = [];
+    let last = null;
+    for (let k = 1; k <= c.tokens.length; k++) {
+      const t0 = process.hrtime.bigint();
+      last = inc.update(c.tokens.slice(0, k));
+      t.push(ms(t0));
+    }
+    const t0 = process.hrtime.bigint();
+    aligner.align(c.ref_words, c.tokens, c.opts);
+    return { update_ms: t, full_ms: ms(t0), last: JSON.parse(JSON.stringify(last)) };
+  }
+  aligner.align(c.ref_words, c.tokens, c.opts);  // warm-up / JIT
+  const t = [];
+  for (let k = 0; k < reps; k++) {
+    const t0 = process.hrtime.bigint();
+    aligner.align(c.ref_words, c.tokens, c.opts);
+    t.push(ms(t0));
+  }
+  return t;
+});
+process.stdout.write(JSON.stringify(out));
+"""
+
+
+def _node():
+    return shutil.which("node") or shutil.which("nodejs")
+
+
+def run_node(cases, mode="run", reps=1):
+    node = _node()
+    if not node:
+        return None
+    proc = subprocess.run([node, "-e", NODE_RUNNER, ROOT, mode, str(reps)],
+                          input=json.dumps(cases), capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout)
+
+
+# ----------------- fixture generation -----------------
+def _word_bank():
+    words = []
+    bank_dir = os.path.join(ROOT, "seeds", "wordbanks")
+    for f in sorted(os.listdir(bank_dir)):
+        if f.endswith(".json"):
+            with open(os.path.join(bank_dir, f), encoding="utf-8") as fh:
+                words.extend(json.load(fh))
+    return words + ["was", "saw", "on", "no", "top", "pot", "cat", "kat", "the", "a", "and",
+                    "don't", "Café", "rain", "light", "sky"]
+
+
+def _passage(rng, bank, n):
+    out = []
+    for k in range(n):
+        w = rng.choice(bank)
+        out.append(w.capitalize() if (k == 0 or out[-1] == ".") else w)
+        r = rng.random()
+        if r < 0.08:
+            out.append(".")
+        elif r < 0.12:
+            out.append(",")
+    return out + ["."]
+
+
+def _misread(rng, w):
+    kind = rng.random()
+    if kind < 0.4 and len(w) > 3:
+        k = rng.randrange(1, len(w))
+        return w[:k] + w[k + 1:]            # dropped letter: sound-alike
+    if kind < 0.6 and len(w) > 2:
+        return w[::-1]                       # reversal (saw/was)
+    return rng.choice(["dog", "big", "ran", "house", "went", "blue", "little"])
+
+
+def _reading(rng, ref_words, p_err):
+    words = [w for w in ref_words if any(ch.isalnum() for ch in w)]
+    toks, k = [], 0
+
+    def tok(text, conf=None, final=True):
+        toks.append({"text": text, "confidence": round(conf if conf is not None else rng.uniform(0.7, 1.0), 3),
+                     "final": final})
+
+    while k < len(words):
+        w, r = words[k], rng.random()
+        if r > p_err:
+            tok(w.lower())
+        elif r > p_err * 0.8:
+            pass                                               # skipped
+        elif r > p_err * 0.6:
+            tok(_misread(rng, w.lower()))
+        elif r > p_err * 0.45 and k + 1 < len(words):
+            tok(words[k + 1].lower()); tok(w.lower()); k += 1  # transposition
+        elif r > p_err * 0.3:
+            tok(w.lower()); tok(w.lower())                     # repetition
+        elif r > p_err * 0.15:
+            tok(rng.choice(["um", "uh", "the"])); tok(w.lower())
+        else:
+            tok(w.lower(), conf=rng.uniform(0.3, 0.6))          # low confidence
+        k += 1
+    if toks and rng.random() < 0.5:
+        toks[-1]["final"] = False
+    return toks
+
+
+def make_cases(seed=12):
+    rng = random.Random(seed)
+    bank = _word_bank()
+    cases = [
+        {"name": "empty", "ref_words": [], "tokens": [], "opts": {}},
+        {"name": "no_hyp", "ref_words": ["The", "cat", "sat", "."], "tokens": [], "opts": {}},
+        {"name": "no_ref", "ref_words": [".", ","], "tokens": [{"text": "hello"}, {"text": "hello"}], "opts": {}},
+        {"name": "saw_was", "ref_words": ["I", "saw", "the", "top", "."],
+         "tokens": [{"text": "I"}, {"text": "was"}, {"text": "the"}, {"text": "pot"}], "opts": {}},
+        {"name": "swap", "ref_words": ["big", "red", "dog"],
+         "tokens": [{"text": "red", "confidence": 0.9}, {"text": "big", "confidence": 0.9}, {"text": "dog"}], "opts": {}},
+        {"name": "fuzz", "ref_words": ["Café", "don't", "coooool", "—", "naïve"],
+         "tokens": [{"text": "cafe"}, {"text": "dont", "conf": 0.7}, {"text": "cool"}, {"text": ""},
+                    {"text": "naive", "confidence": 0}], "opts": {"maxEd": 1}},
+        {"name": "final_only", "ref_words": ["a", "b", "c"],
+         "tokens": [{"text": "a", "final": True}, {"text": "b", "final": False}, {"text": "c", "final": True}],
+         "opts": {"finalOnly": True}},
+    ]
+    for n, p_err, opts in [(12, 0.3, {}), (40, 0.2, {"maxEd": 1}), (120, 0.15, {"finalOnly": True}),
+                           (250, 0.1, {"minConfidence": 0.8}), (500, 0.1, {"finalOnly": True, "maxEd": 1}),
+                           (800, 0.08, {}), (1000, 0.12, {"finalOnly": True}),
+                           (1500, 0.05, {"finalOnly": True, "maxEd": 1})]:
+        ref = _passage(rng, bank, n)
+        cases.append({"name": f"read_{n}", "ref_words": ref, "tokens": _reading(rng, ref, p_err), "opts": opts})
+    return cases
+
+
+# ----------------- checks -----------------
+def py_align(case):
+    from services.alignment import align, align_opts
+    return align(case["ref_words"], case["tokens"], **align_opts(case["opts"]))
+
+
+def with_index(case):
+    """The case with its passage's phonetic index passed in opts, as the app does."""
+    from services.phonetics import phonetic_index
+    return dict(case, opts=dict(case["opts"], phonetic=phonetic_index(case["ref_words"])))
+
+
+def _words(case):
+    return sum(1 for w in case["ref_words"] if any(ch.isalnum() for ch in w))
+
+
+def _update_stats(t):
+    tenth = max(1, len(t) // 10)
+    return {"first_10pct_ms": round(sum(t[:tenth]) / tenth, 3),
+            "last_10pct_ms": round(sum(t[-tenth:]) / tenth, 3), "max_ms": round(max(t), 3)}
+
+
+def live_report(cases):
+    """Replay each reading token by token through the incremental aligners (Python and JS)."""
+    from services.alignment import IncrementalAligner, align_opts
+    cases = [c for c in cases if c["name"].startswith("read_")]
+    js = run_node([{k: c[k] for k in ("ref_words", "tokens", "opts")} for c in cases], "live")
+    rows = []
+    for k, c in enumerate(cases):
+        inc = IncrementalAligner(c["ref_words"], **align_opts(c["opts"]))
+        t, last = [], None
+        for n in range(1, len(c["tokens"]) + 1):
+            t0 = time.perf_counter()
+            last = inc.update(c["tokens"][:n])
+            t.append((time.perf_counter() - t0) * 1000.0)
+        t0 = time.perf_counter()
+        full = py_align(c)
+        row = {"case": c["name"], "words": _words(c), "py_update": _update_stats(t),
+               "py_full_ms": round((time.perf_counter() - t0) * 1000.0, 3),
+               # words whose final status differs from a one-shot alignment (unread tail excluded)
+               "py_vs_full": sum(1 for a, b in zip(last["status"], full["status"]) if a != b and a != "pending")}
+        if js:
+            row["js_update"] = _update_stats(js[k]["update_ms"])
+            row["js_full_ms"] = round(js[k]["full_ms"], 3)
+            row["js_py_parity"] = json.loads(json.dumps(last)) == js[k]["last"]
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Python vs. JS aligner parity and timing.")
+    ap.add_argument("--regen", action="store_true", help="rebuild fixtures (needs node)")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--live", action="store_true", help="also time incremental updates")
+    ap.add_argument("--phonetic", action="store_true", help="also time alignment with the phonetic index")
+    args = ap.parse_args(argv)
+
+    if args.regen:
+        cases = make_cases()
+        expected = run_node(cases)
+        if expected is None:
+            print("node not found; cannot regenerate fixtures", file=sys.stderr)
+            return 1
+        for c, e in zip(cases, expected):
+            c["expected"] = e
+        os.makedirs(os.path.dirname(FIXTURES), exist_ok=True)
+        with open(FIXTURES, "w", encoding="utf-8") as fh:
+            json.dump(cases, fh, ensure_ascii=False, separators=(",", ":"))
+            fh.write("\n")
+        print(f"wrote {len(cases)} cases to {FIXTURES}", file=sys.stderr)
+
+    with open(FIXTURES, encoding="utf-8") as fh:
+        cases = json.load(fh)
+
+    indexed = [with_index(c) for c in cases]
+    mismatches = [c["name"] for c in cases if json.loads(json.dumps(py_align(c))) != c["expected"]]
+    mismatches += [f"indexed:{c['name']}" for c in indexed if json.loads(json.dumps(py_align(c))) != c["expected"]]
+    # the browser code itself must still produce the stored outputs
+    js_out = run_node([{k: c[k] for k in ("ref_words", "tokens", "opts")} for c in cases + indexed])
+    if js_out is not None:
+        mismatches += [f"js:{c['name']}" for c, o in zip(cases, js_out) if o != c["expected"]]
+        mismatches += [f"js_indexed:{c['name']}" for c, o in zip(cases, js_out[len(cases):]) if o != c["expected"]]
+    js_times = run_node([{k: c[k] for k in ("ref_words", "tokens", "opts")} for c in cases], "time", args.repeat)
+
+    rows = []
+    for k, c in enumerate(cases):
+        t = []
+        py_align(c)  # warm-up
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            py_align(c)
+            t.append((time.perf_counter() - t0) * 1000.0)
+        row = {"case": c["name"], "words": _words(c), "tokens": len(c["tokens"]), "py_ms": round(min(t), 3)}
+        if args.phonetic:
+            t = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                py_align(indexed[k])
+                t.append((time.perf_counter() - t0) * 1000.0)
+            row["py_indexed_ms"] = round(min(t), 3)
+        if js_times:
+            row["js_ms"] = round(min(js_times[k]), 3)
+            row["speedup"] = round(row["js_ms"] / row["py_ms"], 2) if row["py_ms"] else None
+        rows.append(row)
+
+    report = {"cases": len(cases), "parity_mismatches": mismatches, "timings": rows}
+    if args.live:
+        report["live"] = live_report(cases)
+        if any(r.get("js_py_parity") is False for r in report["live"]):
+            mismatches.append("live")
+    print(json.dumps(report, indent=2))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
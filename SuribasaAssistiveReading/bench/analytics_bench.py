@@ -0,0 +1,100 @@
+# bench/analytics_bench.py
+"""
+Timing of services/analytics.py class_stats() on a synthetic database.
+
+    python bench/analytics_bench.py                 # 100k sessions
+    python bench/analytics_bench.py --sessions 300000 --repeat 5
+
+Builds a throwaway SQLite file with the app's schema, fills it with
+sessions spread over grades 7-10, a few sections and passages, with summary
+columns written by scoring.summarize(), then times each grouping cold
+(cache invalidated) and warm (served from the cache).
+"""
+import os, sys, json, time, random, argparse, tempfile, statistics
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from flask import Flask
+from sqlalchemy import insert
+
+from models import db, Session, Passage, ensure_schema
+from services.scoring import MISCUE_KEYS, summarize
+from services.analytics import class_stats, invalidate
+
+CASES = [
+    (("grade",), {}),
+    (("grade", "section"), {}),
+    (("passage",), {}),
+    (("section",), {"grade": "8"}),
+    (("grade",), {"date_from": "2024-09-01", "date_to": "2024-10-31"}),
+    (("grade",), {"level": "FRUSTRATION"}),
+]
+
+
+def fill(n, passages=12, seed=7):
+    rnd = random.Random(seed)
+    db.session.execute(insert(Passage), [
+        {"title": f"Passage {k}", "text": "x", "grade_level": str(7 + k % 4), "word_count": rnd.randint(80, 400)}
+        for k in range(passages)])
+    words = dict(db.session.execute(db.select(Passage.id, Passage.word_count)).all())
+    pids = list(words)
+    t0 = datetime(2024, 6, 1)
+    rows = []
+    for k in range(n):
+        pid = rnd.choice(pids)
+        miscues = {m: (rnd.randint(0, 6) if rnd.random() < 0.4 else 0) for m in MISCUE_KEYS}
+        total = rnd.randint(3, 10)
+        correct = rnd.randint(0, total)
+        rows.append({
+            "passage_id": pid, "surname": "S", "first_name": "F", "middle_initial": "M",
+            "grade_level": str(rnd.randint(7, 10)), "section": rnd.choice("ABCDEF"),
+            "started_at": t0 + timedelta(minutes=k * 3), "duration_sec": 60.0,
+            "wcpm": rnd.uniform(40, 180), "accuracy": rnd.uniform(70, 100), "errors_json": json.dumps(miscues),
+            "comprehension_correct": correct, "comprehension_total": total,
+            **summarize(miscues, words[pid], correct, total),
+        })
+        if len(rows) == 10000:
+            db.session.execute(insert(Session), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(Session), rows)
+    db.session.commit()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=100000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="analytics_bench_")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        ensure_schema()
+        t = time.perf_counter()
+        fill(args.sessions)
+        print(f"filled {args.sessions} sessions in {time.perf_counter() - t:.1f}s")
+
+        for group_by, filters in CASES:
+            cold, warm = [], []
+            for _ in range(args.repeat):
+                invalidate()
+                t = time.perf_counter()
+                out = class_stats(group_by, filters)
+                cold.append((time.perf_counter() - t) * 1000)
+                t = time.perf_counter()
+                assert class_stats(group_by, filters)["cached"]
+                warm.append((time.perf_counter() - t) * 1000)
+            print(f"{','.join(group_by):14s} {json.dumps(filters):52s} groups={len(out['groups']):3d} "
+                  f"n={out['overall']['sessions']:7d}  cold {statistics.median(cold):8.1f} ms"
+                  f"  cached {statistics.median(warm):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
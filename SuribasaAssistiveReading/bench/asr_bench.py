@@ -0,0 +1,311 @@
+# bench/asr_bench.py
+"""
+ASR benchmark harness.
+
+Runs every recording in a fixture directory through the server ASR paths
+and prints one JSON document (RTF, latency percentiles, peak RSS,
+tokens/sec per path) that can be saved and compared across commits:
+
+    python bench/asr_bench.py bench/fixtures/audio --repeat 5 --out before.json
+    ... change things ...
+    python bench/asr_bench.py bench/fixtures/audio --repeat 5 --baseline before.json
+
+Paths:
+  whisper   services.asr_whisper.transcribe_blob_or_501
+  vosk      services.asr_vosk.transcribe_blob_vosk_or_none (open vocabulary)
+  vosk_fil  Vosk restricted to the passage grammar expanded by
+            services.accent_rules.expand (text from <recording>.txt or --grammar-text)
+  api       POST /api/asr + job polling through the Flask test client (decode, queue, engines);
+            the only path that imports app, with ASR_WHISPER_PRELOAD=false
+
+Each path runs in its own Python process so model loads and peak RSS don't
+bleed into each other. The first run of every file is a warm-up (model load,
+grammar compile) and is reported as `first_run_ms`, not in the percentiles.
+Model size / threads come from the usual env vars (ASR_WHISPER_MODEL,
+ASR_WHISPER_THREADS, VOSK_MODEL, ASR_MODE, ASR_VAD, ...), which are echoed
+back under "config".
+
+--synth DIR writes tone-and-silence WAVs of several lengths, enough to
+exercise decode/VAD/queue plumbing when no real recordings are at hand.
+"""
+import os, sys, io, json, time, argparse, platform, resource, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+PATHS = ["whisper", "vosk", "vosk_fil", "api"]
+CONFIG_ENV = ["ASR_DEVICE", "ASR_WHISPER_MODEL", "ASR_WHISPER_COMPUTE", "ASR_WHISPER_THREADS",
+              "ASR_WHISPER_POOL", "ASR_WHISPER_FAST", "VOSK_MODEL", "ASR_MODE", "ASR_VAD",
+              "ASR_VAD_THREADS", "ASR_PREFER_WHISPER_FIRST", "ASR_LANG"]
+
+
+def peak_rss_mb():
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(kb / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def load_fixtures(fixture_dir, grammar_text=None):
+    from services.asr_batch import collect_inputs
+    items = []
+    for it in collect_inputs(fixture_dir):
+        txt = os.path.splitext(it["path"])[0] + ".txt"
+        if os.path.exists(txt):
+            with open(txt, encoding="utf-8") as fh:
+                it["text"] = fh.read()
+        elif grammar_text:
+            it["text"] = grammar_text
+        items.append(it)
+    return items
+
+
+# ----------------- one path, in-process -----------------
+def _fil_grammar(text):
+    # same grammar as the app's Filipino-accent path, without importing app (its module-level
+    # create_app() would start the Whisper preload and open app.db inside this "isolated" process)
+    from services.text import simple_tokens
+    from services.accent_rules import expand
+    return expand([t.lower() for t in simple_tokens(text)], "fil")
+
+
+def _make_runner(path, lang):
+    """Return run(audio_bytes, item) -> (ok, n_tokens, error)."""
+    from werkzeug.datastructures import FileStorage
+
+    def upload(data, name):
+        return FileStorage(stream=io.BytesIO(data), filename=os.path.basename(name))
+
+    if path == "whisper":
+        from services.asr_whisper import transcribe_blob_or_501
+
+        def run(data, item):
+            out = transcribe_blob_or_501(upload(data, item["path"]), lang=lang)
+            return out.get("ok"), len(out.get("tokens", [])), out.get("error")
+        return run
+
+    if path in ("vosk", "vosk_fil"):
+        from services.asr_vosk import transcribe_blob_vosk_or_none
+
+        def run(data, item):
+            words = None
+            if path == "vosk_fil":
+                if not item.get("text"):
+                    return None, 0, "no passage text for grammar"
+                words = _fil_grammar(item["text"])  # timed on purpose: it runs per request
+            out = transcribe_blob_vosk_or_none(upload(data, item["path"]), grammar_words=words)
+            if out is None:
+                return False, 0, "Vosk not available"
+            return out.get("ok"), len(out.get("tokens", [])), out.get("error")
+        return run
+
+    if path == "api":
+        os.environ["ASR_CACHE_SIZE"] = "0"   # every repeat must really transcribe
+        os.environ.pop("ASR_CACHE_DB", None)
+        os.environ["ASR_WHISPER_PRELOAD"] = "false"  # load cost shows up in first_run_ms
+        from app import create_app
+        from services.text import simple_tokens
+        from models import User
+        app = create_app()
+        with app.app_context():
+            user = User.query.first()
+            uid = user.id if user else None
+        client = app.test_client()
+        if uid is None:
+            return None
+        with client.session_transaction() as s:
+            s["user_id"] = uid
+
+        def run(data, item):
+            form = {"audio": (io.BytesIO(data), os.path.basename(item["path"])), "lang": lang}
+            if item.get("text"):
+                form["grammar"] = json.dumps([t.lower() for t in simple_tokens(item["text"])])
+                form["accent"] = "fil"
+            resp = client.post("/api/asr", data=form, content_type="multipart/form-data")
+            out = resp.get_json(silent=True) or {}
+            while resp.status_code == 202 and out.get("status_url"):  # queued job: poll it like the browser
+                resp = client.get(out["status_url"] + "?wait=5")
+                out = dict(resp.get_json(silent=True) or {}, status_url=out["status_url"])
+            return resp.status_code == 200 and out.get("ok"), len(out.get("tokens", [])), out.get("error")
+        return run
+
+    raise ValueError(f"unknown path {path!r}")
+
+
+def _summarize(runs, first_runs, errors):
+    import numpy as np
+    ok = [r for r in runs if r["ok"]]
+    out = {"runs": len(runs), "ok": len(ok), "errors": errors[:5],
+           "first_run_ms": [round(f * 1000.0, 1) for f in first_runs]}
+    if not ok:
+        return out
+    lat = np.array([r["elapsed"] for r in ok]) * 1000.0
+    audio = sum(r["audio_sec"] for r in ok)
+    elapsed = sum(r["elapsed"] for r in ok)
+    rtfs = np.array([r["elapsed"] / r["audio_sec"] for r in ok if r["audio_sec"]])
+    out.update({
+        "audio_sec": round(audio, 2),
+        "latency_ms": {f"p{q}": round(float(np.percentile(lat, q)), 1) for q in (50, 95, 99)},
+        "latency_ms_mean": round(float(lat.mean()), 1),
+        "rtf": round(elapsed / audio, 4) if audio else None,
+        "rtf_p95": round(float(np.percentile(rtfs, 95)), 4) if len(rtfs) else None,
+        "tokens_per_sec": round(sum(r["tokens"] for r in ok) / elapsed, 1) if elapsed else None,
+    })
+    return out
+
+
+def bench_path(path, items, repeat=3, lang="en"):
+    from services.audio_decode import decode_pcm16, pcm_duration_sec
+
+    rss_before = peak_rss_mb()
+    run = _make_runner(path, lang)
+    if run is None:
+        return {"skipped": "no user in the database for the API path"}
+    runs, first_runs, errors = [], [], []
+    for item in items:
+        with open(item["path"], "rb") as fh:
+            data = fh.read()
+        pcm = decode_pcm16(data, 16000)
+        if pcm is None:
+            errors.append(f"{item['path']}: could not decode")
+            continue
+        audio_sec = pcm_duration_sec(pcm, 16000)
+        for k in range(repeat + 1):
+            t0 = time.perf_counter()
+            ok, n_tokens, err = run(data, item)
+            elapsed = time.perf_counter() - t0
+            if ok is None:  # path not applicable to this file
+                errors.append(f"{item['path']}: {err}")
+                break
+            if not ok:
+                errors.append(f"{item['path']}: {err}")
+            if k == 0:
+                first_runs.append(elapsed)
+                if not ok:
+                    break  # engine missing; repeating won't help
+                continue
+            runs.append({"ok": bool(ok), "elapsed": elapsed, "audio_sec": audio_sec, "tokens": n_tokens})
+    out = _summarize(runs, first_runs, errors)
+    out["peak_rss_mb"] = peak_rss_mb()
+    out["rss_before_mb"] = rss_before
+    return out
+
+
+# ----------------- driver -----------------
+def _run_isolated(path, args):
+    cmd = [sys.executable, os.path.abspath(__file__), args.fixtures, "--paths", path, "--inline",
+           "--repeat", str(args.repeat), "--lang", args.lang]
+    if args.grammar_text:
+        cmd += ["--grammar-text", args.grammar_text]
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    try:
+        return json.loads(proc.stdout)["paths"][path]
+    except Exception:
+        return {"skipped": f"benchmark process failed (exit {proc.returncode})",
+                "stderr": proc.stderr.strip().splitlines()[-5:]}
+
+
+def _compare(report, baseline):
+    """Percent change vs. a previous report for the headline numbers (negative = faster)."""
+    def pct(new, old):
+        return round((new - old) * 100.0 / old, 1) if new is not None and old else None
+
+    for name, cur in report["paths"].items():
+        old = (baseline.get("paths") or {}).get(name) or {}
+        if "latency_ms" not in cur or "latency_ms" not in old:
+            continue
+        cur["vs_baseline"] = {
+            "rtf_pct": pct(cur.get("rtf"), old.get("rtf")),
+            "p50_pct": pct(cur["latency_ms"]["p50"], old["latency_ms"]["p50"]),
+            "p95_pct": pct(cur["latency_ms"]["p95"], old["latency_ms"]["p95"]),
+            "peak_rss_pct": pct(cur.get("peak_rss_mb"), old.get("peak_rss_mb")),
+            "baseline_commit": baseline.get("commit"),
+        }
+
+
+def write_synth(out_dir, lengths=(5, 15, 30, 60), sr=16000):
+    """Tone bursts separated by pauses, as 16 kHz mono WAV files."""
+    import wave
+    import numpy as np
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(0)
+    for sec in lengths:
+        x = rng.normal(0, 40, sec * sr)
+        t, on = 0.0, True
+        while t < sec:
+            span = rng.uniform(0.4, 2.5) if on else rng.uniform(0.3, 1.5)
+            if on:
+                s, e = int(t * sr), min(int((t + span) * sr), len(x))
+                x[s:e] += 6000 * np.sin(2 * np.pi * rng.uniform(150, 300) * np.arange(e - s) / sr)
+            t, on = t + span, not on
+        path = os.path.join(out_dir, f"synth_{sec:03d}s.wav")
+        with wave.open(path, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(sr)
+            w.writeframes(x.clip(-32768, 32767).astype("<i2").tobytes())
+        print(path, file=sys.stderr)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the server ASR paths.")
+    ap.add_argument("fixtures", nargs="?", default=os.path.join(ROOT, "bench", "fixtures", "audio"))
+    ap.add_argument("--paths", default=",".join(PATHS), help="comma-separated subset of " + ",".join(PATHS))
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per file (after one warm-up)")
+    ap.add_argument("--lang", default=os.getenv("ASR_LANG") or "en")
+    ap.add_argument("--grammar-text", help="passage text for files without a .txt next to them")
+    ap.add_argument("--inline", action="store_true", help="run all paths in this process")
+    ap.add_argument("--out", help="write the JSON report here as well")
+    ap.add_argument("--baseline", help="previous report to compare against")
+    ap.add_argument("--synth", metavar="DIR", help="write synthetic WAV fixtures to DIR and exit")
+    args = ap.parse_args(argv)
+    report_out, sys.stdout = sys.stdout, sys.stderr  # app/engine logging must not mix into the JSON
+
+    if args.synth:
+        write_synth(args.synth)
+        return 0
+
+    grammar_text = None
+    if args.grammar_text:
+        grammar_text = open(args.grammar_text, encoding="utf-8").read() if os.path.exists(args.grammar_text) \
+            else args.grammar_text
+    items = load_fixtures(args.fixtures, grammar_text)
+    if not items:
+        print(f"no audio files under {args.fixtures}", file=sys.stderr)
+        return 1
+
+    paths = [p.strip() for p in args.paths.split(",") if p.strip()]
+    report = {
+        "commit": _git_rev(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"python": platform.python_version(), "cpus": os.cpu_count(), "repeat": args.repeat,
+                   "files": len(items), **{k: os.getenv(k) for k in CONFIG_ENV if os.getenv(k)}},
+        "paths": {},
+    }
+    for path in paths:
+        if args.inline:
+            report["paths"][path] = bench_path(path, items, args.repeat, args.lang)
+        else:
+            print(f"[bench] {path} ...", file=sys.stderr)
+            report["paths"][path] = _run_isolated(path, args)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            _compare(report, json.load(fh))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    print(text, file=report_out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
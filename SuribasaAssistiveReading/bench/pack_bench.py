@@ -0,0 +1,117 @@
+# bench/pack_bench.py
+"""
+Database size and export time with word events stored as rows vs. packed
+blobs (services/event_pack.py).
+
+    python bench/pack_bench.py                          # 1000 sessions x 300 words
+    python bench/pack_bench.py --sessions 5000 --words 500
+
+Fills a throwaway SQLite file with sessions and WordEvent rows, measures the
+file size (after VACUUM), a full events CSV export and per-session reads,
+then runs the pack-word-events migration and measures again. The two
+exports are compared row by row (timings to float32, confidence to float16
+precision).
+"""
+import os, sys, csv, time, random, argparse, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from flask import Flask
+from sqlalchemy import insert
+
+from models import db, Session, WordEvent, ensure_schema
+from services.exports import export_chunks, event_rows
+from services.word_events import pack_sessions
+
+WORDS = ["the", "sun", "and", "wind", "cat", "ran", "over", "hill", "bright", "cold"]
+
+
+def fill(n_sessions, n_words, seed=5):
+    rnd = random.Random(seed)
+    db.session.execute(insert(Session), [
+        {"surname": "S", "first_name": "F", "middle_initial": "M", "grade_level": "8", "errors_json": "{}"}
+        for _ in range(n_sessions)])
+    ids = db.session.execute(db.select(Session.id).order_by(Session.id)).scalars().all()
+    conn = db.session.connection()
+    for sid in ids:
+        rows, t = [], 0.0
+        for w in range(n_words):
+            st = rnd.choices(("correct", "misread", "skipped", "pending"), (85, 8, 5, 2))[0]
+            t += rnd.uniform(250, 600)
+            heard = st in ("correct", "misread")
+            rows.append({"session_id": sid, "word_index": w, "status": st,
+                         "start_ms": round(t, 1) if heard else None, "end_ms": round(t + 280, 1) if heard else None,
+                         "asr_text": rnd.choice(WORDS) if heard else "",
+                         "confidence": round(rnd.uniform(0.4, 1.0), 3) if heard else 0.0})
+        conn.execute(insert(WordEvent.__table__), rows)
+    db.session.commit()
+    return ids
+
+
+def db_size(path):
+    db.session.remove()
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+    return os.path.getsize(path)
+
+
+def measure(ids, sample):
+    t = time.perf_counter()
+    size = sum(len(c) for c in export_chunks("events", "csv"))
+    export_s = time.perf_counter() - t
+    t = time.perf_counter()
+    for sid in sample:
+        list(event_rows(None, session_id=sid))
+    read_ms = (time.perf_counter() - t) * 1000 / len(sample)
+    rows = list(csv.reader(b"".join(export_chunks("events", "csv")).decode().splitlines()))
+    return export_s, read_ms, size, rows
+
+
+def same(a, b):
+    if a[:3] != b[:3] or a[5] != b[5]:
+        return False
+    for x, y, tol in ((a[3], b[3], 0.01), (a[4], b[4], 0.01), (a[6], b[6], 5e-4)):
+        if (x == "") != (y == "") or (x and abs(float(x) - float(y)) > tol * max(1.0, abs(float(x)) / 1000)):
+            return False
+    return True
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=1000)
+    ap.add_argument("--words", type=int, default=300)
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="pack_bench_"), "bench.db")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + path
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        ensure_schema()
+        ids = fill(args.sessions, args.words)
+        sample = random.Random(1).sample(ids, min(200, len(ids)))
+
+        size_rows = db_size(path)
+        export_rows, read_rows, csv_rows, before = measure(ids, sample)
+
+        t = time.perf_counter()
+        summary = pack_sessions()
+        pack_s = time.perf_counter() - t
+        size_packed = db_size(path)
+        export_packed, read_packed, csv_packed, after = measure(ids, sample)
+
+        mismatches = (before[0] != after[0]) + sum(1 for a, b in zip(before[1:], after[1:]) if not same(a, b)) + abs(len(before) - len(after))
+        events = args.sessions * args.words
+        print(f"{args.sessions} sessions x {args.words} words = {events} events")
+        print(f"db size      rows {size_rows / 1e6:8.2f} MB   packed {size_packed / 1e6:8.2f} MB"
+              f"   ({size_rows / size_packed:.1f}x smaller, {summary['bytes'] / events:.2f} B/event in blobs)")
+        print(f"events csv   rows {export_rows:8.2f} s    packed {export_packed:8.2f} s    ({csv_rows} / {csv_packed} bytes)")
+        print(f"one session  rows {read_rows:8.2f} ms   packed {read_packed:8.2f} ms")
+        print(f"migration    {pack_s:.2f} s   export mismatches {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# bench/save_bench.py
+"""
+ms per session save (`POST /api/sessions` storage path) for passages of
+100-2000 words, the old way and the current one.
+
+    python bench/save_bench.py
+    python bench/save_bench.py --words 100 500 2000 --repeat 30
+
+"orm" replays the previous code (one WordEvent object per word, flushed
+with the session); "bulk" is services/word_events.py (one-pass validation
+plus one executemany INSERT). Both run against a throwaway SQLite file
+with the app's schema and include the session row and the commit.
+"""
+import os, sys, time, random, argparse, tempfile, statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from flask import Flask
+
+from models import db, Session, WordEvent, ensure_schema
+from services.word_events import parse_word_events, insert_word_events
+
+STATUSES = ("correct",) * 8 + ("misread", "skipped", "pending")
+
+
+def payload(n, rnd):
+    return [{"word_index": i, "status": rnd.choice(STATUSES), "start_ms": i * 420.0, "end_ms": i * 420.0 + 300,
+             "asr_text": "word", "confidence": round(rnd.random(), 3)} for i in range(n)]
+
+
+def new_session():
+    s = Session(passage_id=None, surname="S", first_name="F", middle_initial="M", grade_level="8",
+                duration_sec=60.0, wcpm=100.0, accuracy=95.0, errors_json="{}")
+    db.session.add(s)
+    db.session.flush()
+    return s
+
+
+def save_orm(events):
+    s = new_session()
+    for we in events:
+        db.session.add(WordEvent(
+            session_id=s.id,
+            word_index=we.get('word_index', 0),
+            status=we.get('status', 'unknown'),
+            start_ms=we.get('start_ms'),
+            end_ms=we.get('end_ms'),
+            asr_text=we.get('asr_text', ''),
+            confidence=we.get('confidence', 0.0),
+        ))
+    db.session.commit()
+
+
+def save_bulk(events):
+    rows = parse_word_events(events)
+    s = new_session()
+    insert_word_events(s.id, rows)
+    db.session.commit()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--words", type=int, nargs="+", default=[100, 300, 1000, 2000])
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="save_bench_"), "bench.db")
+    db.init_app(app)
+    rnd = random.Random(3)
+    with app.app_context():
+        db.create_all()
+        ensure_schema()
+        print(f"{'words':>6} {'orm ms':>9} {'bulk ms':>9} {'speedup':>8}")
+        for n in args.words:
+            events = payload(n, rnd)
+            res = {}
+            for name, fn in (("orm", save_orm), ("bulk", save_bulk)):
+                fn(events)  # warm-up
+                t = []
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    fn(events)
+                    t.append((time.perf_counter() - t0) * 1000)
+                    db.session.expunge_all()
+                res[name] = statistics.median(t)
+            print(f"{n:6d} {res['orm']:9.2f} {res['bulk']:9.2f} {res['orm'] / res['bulk']:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
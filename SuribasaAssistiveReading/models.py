@@ -1,3 +1,4 @@
+import json
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from werkzeug.security import generate_password_hash
@@ -13,8 +14,49 @@ class Passage(db.Model):
     grade_level = db.Column(db.String(50), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Derived from `text` whenever it is saved (services.text.derive_passage)
+    tokens_json = db.Column(db.Text, nullable=True)          # display tokens, JSON list
+    word_count = db.Column(db.Integer, nullable=True)        # tokens that are scored (no punctuation)
+    content_hash = db.Column(db.String(64), nullable=True)   # sha256 of text the columns were built from
+    # per-token norm / Soundex / metaphone codes (services.phonetics.phonetic_index)
+    phonetic_json = db.Column(db.Text, nullable=True)
+
+    def _parsed(self, column):
+        raw = getattr(self, column)
+        cache = self.__dict__.setdefault('_parsed_cache', {})
+        hit = cache.get(column)
+        if hit is None or hit[0] is not raw:
+            try:
+                hit = cache[column] = (raw, json.loads(raw) if raw else None)
+            except ValueError:
+                hit = cache[column] = (raw, None)
+        return hit[1]
+
+    @property
+    def tokens(self):
+        """Display tokens, as stored on save."""
+        toks = self._parsed('tokens_json')
+        if toks is None:
+            from services.text import tokenize_for_display
+            toks = tokenize_for_display(self.text)
+        return toks
+
+    @property
+    def phonetic(self):
+        """Phonetic index for the aligners, or None."""
+        return self._parsed('phonetic_json')
+
 
 class Session(db.Model):
+    # results listing: newest first with keyset paging on (started_at, id), optionally per reading profile
+    __table_args__ = (
+        db.Index('ix_session_started_id', 'started_at', 'id'),
+        db.Index('ix_session_profile_started_id', 'reading_profile', 'started_at', 'id'),
+        # covers the class analytics GROUP BY (services/analytics.py) without touching table rows
+        db.Index('ix_session_class_stats', 'grade_level', 'section', 'passage_id',
+                 'reading_profile', 'wcpm', 'accuracy', 'comp_pct'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     # Link to passage
@@ -25,7 +67,8 @@ class Session(db.Model):
     surname = db.Column(db.String(128), nullable=False)          # required
     first_name = db.Column(db.String(128), nullable=False)       # required
     middle_initial = db.Column(db.String(8), nullable=False)     # required (e.g., "A" or "A.")
-    grade_level = db.Column(db.String(16), nullable=False)       # required (e.g., "4", "5", "6")
+    grade_level = db.Column(db.String(16), nullable=False, index=True)  # required (e.g., "4", "5", "6")
+    section = db.Column(db.String(64), nullable=True, index=True)       # optional class section
 
     # Legacy (kept for backward compatibility; no longer used to save)
     student_name = db.Column(db.String(120), nullable=True)
@@ -41,6 +84,26 @@ class Session(db.Model):
     comprehension_correct = db.Column(db.Integer, default=0)
     comprehension_total = db.Column(db.Integer, default=0)
 
+    # Bumped by every write that changes the session's report (cache key / ETag of report.pdf)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Summary written with the session / its comprehension score (services.scoring.summarize).
+    # total_miscues IS NULL means "not summarized yet" (backfilled on startup).
+    mispronunciations = db.Column(db.Integer)
+    omissions = db.Column(db.Integer)
+    substitutions = db.Column(db.Integer)
+    insertions = db.Column(db.Integer)
+    repetitions = db.Column(db.Integer)
+    transpositions = db.Column(db.Integer)
+    reversals = db.Column(db.Integer)
+    total_miscues = db.Column(db.Integer)
+    words_total = db.Column(db.Integer)             # passage scored-word count used for word_score
+    word_score = db.Column(db.Integer)
+    word_level = db.Column(db.String(16), index=True)
+    comp_pct = db.Column(db.Float)
+    comp_level = db.Column(db.String(16), index=True)
+    reading_profile = db.Column(db.String(16), index=True)
+
     # Convenience: access word events via relationship
     word_events = db.relationship(
         'WordEvent',
@@ -59,6 +122,9 @@ class Session(db.Model):
 
 
 class WordEvent(db.Model):
+    # per-session reads and exports walk events in word order
+    __table_args__ = (db.Index('ix_word_event_session_word', 'session_id', 'word_index'),)
+
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(
         db.Integer,
@@ -73,6 +139,13 @@ class WordEvent(db.Model):
     asr_text = db.Column(db.String(255))
     confidence = db.Column(db.Float)
 
+
+class WordEventPack(db.Model):
+    """A session's word events packed into one blob (services/event_pack.py) instead of WordEvent rows."""
+    session_id = db.Column(db.Integer, db.ForeignKey('session.id', ondelete='CASCADE'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+
 # ----------------------------- Auth & Profile ---------------------------
 
 class User(db.Model):
@@ -109,6 +182,56 @@ class Profile(db.Model):
 
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+# ----------------------------- Schema upgrades --------------------------
+
+# Columns added after the first release: (table, column, DDL type).
+# db.create_all() only creates missing tables, so existing databases get these here.
+ADDED_COLUMNS = [
+    ('passage', 'phonetic_json', 'TEXT'),
+    ('passage', 'tokens_json', 'TEXT'),
+    ('passage', 'word_count', 'INTEGER'),
+    ('passage', 'content_hash', 'VARCHAR(64)'),
+    ('session', 'section', 'VARCHAR(64)'),
+    ('session', 'updated_at', 'DATETIME'),
+    ('session', 'mispronunciations', 'INTEGER'),
+    ('session', 'omissions', 'INTEGER'),
+    ('session', 'substitutions', 'INTEGER'),
+    ('session', 'insertions', 'INTEGER'),
+    ('session', 'repetitions', 'INTEGER'),
+    ('session', 'transpositions', 'INTEGER'),
+    ('session', 'reversals', 'INTEGER'),
+    ('session', 'total_miscues', 'INTEGER'),
+    ('session', 'words_total', 'INTEGER'),
+    ('session', 'word_score', 'INTEGER'),
+    ('session', 'word_level', 'VARCHAR(16)'),
+    ('session', 'comp_pct', 'FLOAT'),
+    ('session', 'comp_level', 'VARCHAR(16)'),
+    ('session', 'reading_profile', 'VARCHAR(16)'),
+]
+
+
+def ensure_schema():
+    """Add any ADDED_COLUMNS missing from an existing database, then any missing indexes."""
+    from sqlalchemy import inspect, text
+    insp = inspect(db.engine)
+    tables = set(insp.get_table_names())
+    with db.engine.begin() as conn:
+        for table, column, ddl in ADDED_COLUMNS:
+            if table not in tables:
+                continue
+            if column not in {c['name'] for c in insp.get_columns(table)}:
+                conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}'))
+                print(f'[schema] added {table}.{column}')
+        for t in db.metadata.sorted_tables:
+            if t.name not in tables:
+                continue
+            existing = {ix['name'] for ix in insp.get_indexes(t.name)}
+            for ix in t.indexes:
+                if ix.name not in existing:
+                    ix.create(bind=conn)
+                    print(f'[schema] created index {ix.name}')
+
+
 # ----------------------------- Seeding ----------------------------------
 
 def seed_initial_data():
@@ -0,0 +1,191 @@
+# services/accent_rules.py
+"""
+Accent variant expansion for Vosk grammars (ASR_ACCENT=fil).
+
+Each rule rewrites a lower-cased passage word into one likely accented
+pronunciation (th -> t, f -> p, v -> b, ...). All rules are compiled into a
+single regex of zero-width lookaheads, so one scan of a word finds every
+rule's matches; each rule's variant is then spliced together exactly as
+re.sub(pattern, replace, word, count) would produce it. Results are memoized
+per word.
+
+expand() keeps the input words first, then the variants ordered by rule
+priority (higher first) and first appearance, so truncating to max_words
+always drops the same, least likely, variants and the grammar (and its cache
+key downstream) is stable from run to run.
+
+Extra rules come from JSON, without code changes: ASR_ACCENT_RULES names one
+or more files (os.pathsep-separated), each either a list of rules or
+{"mode": "fil", "rules": [...]}. A rule is
+    {"pattern": "th", "replace": "t", "priority": 90,
+     "count": 0, "min_len": 0, "alpha_only": false, "disabled": false}
+`pattern` is a regex (lookarounds allowed), `replace` a literal string and
+count=1 rewrites only the first match. A file rule with the same pattern and
+replacement as a built-in one overrides it (e.g. to disable it).
+"""
+import os
+import re
+import json
+import threading
+from functools import lru_cache
+
+# (pattern, replace, priority, extra)
+FIL_RULES = [
+    (r"th", "t", 90, {}),
+    (r"th", "d", 80, {}),
+    (r"f", "p", 85, {}),
+    (r"v", "b", 85, {}),
+    (r"ph", "p", 70, {}),
+    (r"ph", "f", 60, {}),
+    (r"z", "s", 65, {}),
+    (r"sh", "s", 60, {}),
+    (r"c(?=[eiy])", "s", 55, {}),
+    (r"c", "k", 55, {}),
+    (r"qu", "k", 50, {}),
+    (r"ch", "s", 45, {}),
+    (r"x", "ks", 40, {}),
+    (r"i", "e", 30, {"count": 1, "min_len": 4, "alpha_only": True}),
+    (r"e", "i", 30, {"count": 1, "min_len": 4, "alpha_only": True}),
+]
+
+BUILTIN = {"fil": FIL_RULES}
+
+
+class Rule:
+    __slots__ = ("groups", "pattern", "replace", "priority", "count", "min_len", "alpha_only")
+
+    def __init__(self, pattern, replace, priority=0, count=0, min_len=0, alpha_only=False):
+        self.groups = re.compile(pattern).groups  # also fails early on a bad rule file
+        self.pattern = pattern
+        self.replace = str(replace)
+        self.priority = int(priority)
+        self.count = int(count)
+        self.min_len = int(min_len)
+        self.alpha_only = bool(alpha_only)
+
+    def applies(self, w):
+        return len(w) >= self.min_len and (not self.alpha_only or w.isalpha())
+
+
+class RuleSet:
+    """Compiled rules for one accent; variants(word) is memoized."""
+
+    def __init__(self, rules, memo_size=65536):
+        # stable sort: equal priorities keep table order
+        self.rules = sorted(rules, key=lambda r: -r.priority)
+        # one empty-or-lookahead alternative per rule, each wrapped in a capturing group
+        self._rx = re.compile("".join(f"(?:(?=({r.pattern}))|)" for r in self.rules))
+        self._group, g = [], 1
+        for r in self.rules:
+            self._group.append(g)
+            g += 1 + r.groups
+        self.variants = lru_cache(maxsize=memo_size)(self._variants)
+
+    def _variants(self, lw):
+        """((priority, variant), ...) for a lower-cased word, most likely first (word itself excluded)."""
+        hits = [[] for _ in self.rules]
+        for m in self._rx.finditer(lw):
+            regs = m.regs
+            for k, g in enumerate(self._group):
+                a, b = regs[g]
+                if b > a:
+                    hits[k].append((a, b))
+
+        out, seen = [], {lw}
+        for rule, spans in zip(self.rules, hits):
+            if not spans or not rule.applies(lw):
+                continue
+            # non-overlapping, left to right, as re.sub picks them
+            parts, pos, n = [], 0, 0
+            for a, b in spans:
+                if a < pos:
+                    continue
+                parts.append(lw[pos:a])
+                parts.append(rule.replace)
+                pos, n = b, n + 1
+                if rule.count and n >= rule.count:
+                    break
+            parts.append(lw[pos:])
+            v = "".join(parts)
+            if v and v not in seen:
+                seen.add(v)
+                out.append((rule.priority, v))
+        return tuple(out)
+
+    def expand(self, words, max_words=1500):
+        """Input words (stripped, de-duplicated) followed by their variants, capped at max_words."""
+        out, seen, ranked = [], set(), []
+        for w in words:
+            w = (w or "").strip()
+            if not w:
+                continue
+            if w not in seen:
+                seen.add(w)
+                out.append(w)
+            ranked.extend((-prio, len(ranked), v) for prio, v in self.variants(w.lower()))
+        ranked.sort()
+        for _, _, v in ranked:
+            if len(out) >= max_words:
+                break
+            if v not in seen:
+                seen.add(v)
+                out.append(v)
+        return out[:max_words]
+
+
+def _rule_from(d):
+    return Rule(d["pattern"], d.get("replace", ""), d.get("priority", 0), d.get("count", 0),
+                d.get("min_len", 0), d.get("alpha_only", False))
+
+
+def _load_rules(mode):
+    rules = {(p, r): Rule(p, r, prio, **extra) for p, r, prio, extra in BUILTIN.get(mode, [])}
+    for path in (os.getenv("ASR_ACCENT_RULES") or "").split(os.pathsep):
+        path = path.strip()
+        if not path:
+            continue
+        try:
+            with open(path, encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError) as e:
+            print(f"[ASR] accent rules {path} not loaded: {e}")
+            continue
+        if isinstance(data, dict):
+            if data.get("mode", mode) != mode:
+                continue
+            data = data.get("rules") or []
+        for d in data:
+            try:
+                key = (d["pattern"], d.get("replace", ""))
+                if d.get("disabled"):
+                    rules.pop(key, None)
+                else:
+                    rules[key] = _rule_from(d)
+            except (KeyError, TypeError, ValueError, re.error) as e:
+                print(f"[ASR] bad accent rule in {path}: {d!r} ({e})")
+    return list(rules.values())
+
+
+_sets = {}
+_sets_lock = threading.Lock()
+
+
+def rule_set(mode="fil"):
+    """Compiled RuleSet for an accent mode (rebuilt if ASR_ACCENT_RULES changes)."""
+    key = (mode, os.getenv("ASR_ACCENT_RULES") or "")
+    with _sets_lock:
+        rs = _sets.get(key)
+        if rs is None:
+            rs = _sets[key] = RuleSet(_load_rules(mode))
+        return rs
+
+
+def expand(words, mode="fil", max_words=None):
+    if not words:
+        return words
+    if max_words is None:
+        try:
+            max_words = int(os.getenv("ASR_ACCENT_MAX_WORDS") or 1500)
+        except ValueError:
+            max_words = 1500
+    return rule_set(mode).expand(words, max_words)
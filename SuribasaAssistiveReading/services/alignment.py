@@ -0,0 +1,350 @@
+# services/alignment.py
+"""
+Server-side port of static/js/alignment.js.
+
+align(ref_words, hyp_tokens, ...) returns the same
+{status[], insertions[], events[]} as aligner.align in the browser
+(status in pending/correct/misread/skipped; events typed omission,
+insertion, repetition, substitution, mispronunciation, reversal,
+transposition), so sessions can be scored or re-scored on the server.
+
+The edit-distance DP is vectorized row by row with NumPy: with
+base[j] = min(diag + cost, up + 1), the insertion chain
+dp[i][j] = min_k<=j(base[k] + j - k) is a running minimum of base - j,
+so each row is a handful of array ops instead of a Python loop over j.
+The backtrack applies the JS tie-break (substitution, then deletion,
+then insertion) to the stored table, so the op sequence is identical.
+
+IncrementalAligner is the live-reading variant (aligner.incremental in the
+browser): it freezes everything before a confirmed anchor and re-aligns only
+a window of upcoming passage words against the tokens after it, so an update
+costs the same at word 20 as at word 2000.
+
+Both accept a passage's stored phonetic index (Passage.phonetic_json) as
+`phonetic`; reference-side norm / Soundex / metaphone codes are then looked
+up instead of recomputed for every substitution.
+"""
+import re
+import numpy as np
+
+from services.phonetics import norm, levenshtein, is_phonetic_match, is_reversal, index_codes
+
+_PUNC = re.compile(r"[^\w']+", re.ASCII)
+
+
+def is_punc(w):
+    return bool(_PUNC.fullmatch(w))
+
+
+def near_equal(a, b, max_ed):
+    if a == b:
+        return True
+    if not max_ed:
+        return False
+    return levenshtein(a, b) <= max_ed
+
+
+def edit_table(ref_ids, hyp_ids):
+    """(n+1) x (m+1) word-level edit-distance table for integer-coded sequences."""
+    n, m = len(ref_ids), len(hyp_ids)
+    dtype = np.int16 if n + m < 32000 else np.int32
+    dp = np.empty((n + 1, m + 1), dtype=dtype)
+    ar = np.arange(m + 1, dtype=dtype)
+    dp[0] = ar
+    if not n:
+        return dp
+    hyp = np.asarray(hyp_ids, dtype=np.int64)
+    base = np.empty(m + 1, dtype=dtype)
+    for i in range(1, n + 1):
+        prev, row = dp[i - 1], dp[i]
+        np.add(prev[:-1], hyp != ref_ids[i - 1], out=base[1:], casting="unsafe")   # substitution
+        np.minimum(base[1:], prev[1:] + 1, out=base[1:])                           # deletion
+        base[0] = i
+        base -= ar
+        np.minimum.accumulate(base, out=row)                                        # insertion chain
+        row += ar
+    return dp
+
+
+def align_ops(ref_n, hyp_n, open_end=False):
+    """
+    Backtracked [(op, i, j)] for normalized word lists, as alignTokens() in alignment.js.
+    With open_end, passage words after the best end point are left unaligned
+    (not yet read) instead of becoming deletions.
+    """
+    ids = {}
+    ref_ids = [ids.setdefault(w, len(ids)) for w in ref_n]
+    hyp_ids = [ids.setdefault(w, len(ids)) for w in hyp_n]
+    dp = edit_table(ref_ids, hyp_ids)
+    at = dp.item  # the path touches n + m cells; don't convert the table
+
+    i, j = len(ref_ids), len(hyp_ids)
+    if open_end and i:
+        last = dp[:, j]
+        i = int(len(last) - 1 - np.argmin(last[::-1]))  # furthest passage position at the lowest cost
+    ops = []
+    while i > 0 or j > 0:
+        if i > 0 and j > 0:
+            best = at(i, j)
+            if best == at(i - 1, j - 1) + (ref_ids[i - 1] != hyp_ids[j - 1]):
+                op = "S"
+            elif best == at(i - 1, j) + 1:
+                op = "D"
+            else:
+                op = "I"
+        else:
+            op = "D" if i > 0 else "I"
+        if op == "S":
+            ops.append(("S", i - 1, j - 1)); i -= 1; j -= 1
+        elif op == "D":
+            ops.append(("D", i - 1, j)); i -= 1
+        else:
+            ops.append(("I", i, j - 1)); j -= 1
+    ops.reverse()
+    return ops
+
+
+def _conf(t):
+    for k in ("confidence", "conf"):
+        if t.get(k) is not None:
+            return t[k]
+    return 0.8
+
+
+def reduce_ref(ref_words, phonetic=None):
+    """
+    Non-punctuation reference words as dicts {raw, n, oIdx}; with a matching
+    phonetic index they also carry the precomputed codes (sx, mp).
+    """
+    cols = index_codes(phonetic, len(ref_words)) if phonetic else None
+    if cols is None:
+        return [{"raw": w, "n": norm(w), "oIdx": i} for i, w in enumerate(ref_words) if not is_punc(w)]
+    ns, sxs, mps = cols
+    return [{"raw": w, "n": ns[i], "sx": sxs[i], "mp": mps[i], "oIdx": i}
+            for i, w in enumerate(ref_words) if not is_punc(w)]
+
+
+def filter_hyp(hyp_tokens, final_only=False, start=0):
+    """ASR tokens that take part in alignment, as dicts {raw, n, conf, j}."""
+    out = []
+    for j, t in enumerate(hyp_tokens, start):
+        if not t or not t.get("text"):
+            continue
+        if final_only and not t.get("final"):
+            continue
+        raw = str(t["text"])
+        n = norm(raw)
+        if n:
+            out.append({"raw": raw, "n": n, "conf": _conf(t), "j": j})
+    return out
+
+
+def insertion_line(inserted, max_shown=8):
+    """Last few inserted words for the UI, without immediate repeats."""
+    line = []
+    for w in inserted[-50:]:
+        w = str(w or "").strip()
+        if not w:
+            continue
+        if line and line[-1].lower() == w.lower():
+            continue
+        line.append(w)
+    return line[-max(1, max_shown):]
+
+
+def refine_substitutions(events, coded=None):
+    """
+    Type the provisional "S?" events in place: transposition (adjacent pair
+    that swaps targets), reversal, mispronunciation or substitution.
+    coded maps a passage index to its entry with precomputed phonetic codes.
+    """
+    coded = coded or {}
+    for a, b in zip(events, events[1:]):
+        if a["type"] == "S?" and b["type"] == "S?":
+            if norm(a["hyp"]) == norm(b["target"]) and norm(b["hyp"]) == norm(a["target"]):
+                a["type"] = b["type"] = "transposition"
+
+    for e in events:
+        if e["type"] == "S?":
+            codes = coded.get(e["i"])
+            if is_reversal(e["target"], e["hyp"], codes):
+                e["type"] = "reversal"
+            elif is_phonetic_match(e["target"], e["hyp"], codes):
+                e["type"] = "mispronunciation"
+            else:
+                e["type"] = "substitution"
+
+
+def classify(ops, ref, hyp, min_conf=0.62, max_ed=0, max_insertions_shown=8, prev_hyp="", prev_ref=None):
+    """
+    Status per reduced ref word, insertion line and typed events.
+    prev_hyp / prev_ref give the context before ops[0] when `ref` is a window.
+    """
+    status = ["pending"] * len(ref)
+    events, inserted = [], []
+    coded = {}  # oIdx -> ref entry with precomputed phonetic codes
+
+    for op, i, j in ops:
+        if op == "S":
+            r, h = ref[i], hyp[j]
+            match = r["n"] == h["n"] or near_equal(r["n"], h["n"], max_ed)
+            if match and h["conf"] >= min_conf:
+                status[i] = "correct"
+            else:
+                status[i] = "misread"
+                if "sx" in r:
+                    coded[r["oIdx"]] = r
+                events.append({"type": "S?", "i": r["oIdx"], "target": r["raw"], "hyp": h["raw"],
+                               "confidence": h["conf"], "j": h["j"]})
+        elif op == "D":
+            r = ref[i]
+            status[i] = "skipped"
+            events.append({"type": "omission", "i": r["oIdx"], "target": r["raw"]})
+        else:
+            h = hyp[j]
+            inserted.append(h["raw"])
+            e = {"type": "insertion", "i": 0, "hyp": h["raw"], "confidence": h["conf"], "j": h["j"]}
+            anchor = ref[i - 1] if i > 0 else (prev_ref or (ref[0] if ref else None))
+            if anchor:
+                e["i"], e["target"] = anchor["oIdx"], anchor["raw"]
+            events.append(e)
+
+    refine_substitutions(events, coded)
+
+    # repetitions: inserted token equals the previous hyp or the current ref word
+    for k, e in enumerate(events):
+        if e["type"] == "insertion":
+            before = (events[k - 1].get("hyp") if k else prev_hyp) or ""
+            n = norm(e["hyp"])
+            if n == norm(before) or n == norm(e.get("target") or ""):
+                e["type"] = "repetition"
+
+    if max_insertions_shown is None:
+        return status, inserted, events
+    return status, insertion_line(inserted, max_insertions_shown), events
+
+
+def align(ref_words, hyp_tokens, min_confidence=0.62, final_only=False, max_ed=0, max_insertions_shown=8,
+          phonetic=None):
+    """Align ASR tokens to the passage words. Mirrors aligner.align(refWords, hypTokens, opts)."""
+    ref = reduce_ref(ref_words, phonetic)
+    hyp = filter_hyp(hyp_tokens, final_only)
+    ops = align_ops([r["n"] for r in ref], [h["n"] for h in hyp])
+    reduced, insertions, events = classify(ops, ref, hyp, min_confidence, max_ed, max_insertions_shown)
+
+    status = ["pending"] * len(ref_words)
+    for r, st in zip(ref, reduced):
+        status[r["oIdx"]] = st
+    return {"status": status, "insertions": insertions, "events": events}
+
+
+def align_opts(opts):
+    """Keyword arguments for align() from the JS-style options object."""
+    opts = opts or {}
+
+    def opt(name, default):
+        v = opts.get(name)
+        return default if v is None else v
+
+    return {
+        "min_confidence": float(opt("minConfidence", 0.62)),
+        "final_only": bool(opt("finalOnly", False)),
+        "max_ed": int(opt("maxEd", 0)),
+        "max_insertions_shown": int(opt("maxInsertionsShown", 8)),
+        "phonetic": opts.get("phonetic"),
+    }
+
+
+class IncrementalAligner:
+    """
+    Anchored alignment for a reading in progress.
+
+    update(tokens) takes the full token list so far (tokens before the anchor
+    must not change, which holds for final ASR tokens) and returns the same
+    {status, insertions, events} as align(), except that passage words not
+    reached yet stay "pending". Once `lag` tokens have followed a correctly
+    read word, everything up to that word is frozen. Per-update work is one
+    window x tail DP, both bounded by `window`. finalize(tokens) runs the full
+    align() once, so saved results match a one-shot alignment.
+    """
+
+    def __init__(self, ref_words, min_confidence=0.62, final_only=False, max_ed=0,
+                 max_insertions_shown=8, window=48, lag=4, phonetic=None):
+        self.ref_words = [str(w) for w in ref_words]
+        self.ref = reduce_ref(self.ref_words, phonetic)
+        self.opts = {"min_confidence": min_confidence, "final_only": final_only,
+                     "max_ed": max_ed, "max_insertions_shown": max_insertions_shown, "phonetic": phonetic}
+        self.window = max(8, int(window))
+        self.lag = max(1, int(lag))
+        self.anchor_r = 0          # reduced passage words frozen
+        self.anchor_j = 0          # raw token index where the unfrozen hypothesis starts
+        self.status = ["pending"] * len(self.ref_words)
+        self.events = []
+        self.inserted = []
+        self._prev_hyp = ""
+
+    def _classify(self, ops, ref_win, hyp):
+        o = self.opts
+        prev_ref = self.ref[self.anchor_r - 1] if self.anchor_r else None
+        return classify(ops, ref_win, hyp, o["min_confidence"], o["max_ed"], None, self._prev_hyp, prev_ref)
+
+    def _freeze(self, ops, ref_win, hyp, upto):
+        """Freeze ops[:upto] (ops are window-relative)."""
+        ops = ops[:upto]
+        status, inserted, events = self._classify(ops, ref_win, hyp)
+        r_used = sum(1 for op in ops if op[0] != "I")
+        h_used = sum(1 for op in ops if op[0] != "D")
+        for r, st in zip(ref_win[:r_used], status):
+            self.status[r["oIdx"]] = st
+        self.events.extend(events)
+        self.inserted = (self.inserted + inserted)[-50:]
+        if events:
+            self._prev_hyp = events[-1].get("hyp") or ""
+        self.anchor_r += r_used
+        if h_used:
+            self.anchor_j = hyp[h_used - 1]["j"] + 1
+
+    def _window(self, hyp):
+        ref_win = self.ref[self.anchor_r:self.anchor_r + max(self.window, len(hyp) + self.lag)]
+        ops = align_ops([r["n"] for r in ref_win], [h["n"] for h in hyp], open_end=True)
+        return ref_win, ops
+
+    def _anchor(self, ops, ref_win, hyp, force):
+        """Number of leading ops safe to freeze (0 = none)."""
+        best, h_used = 0, 0
+        for k, (op, i, j) in enumerate(ops):
+            if op == "D":
+                continue
+            h_used += 1
+            if len(hyp) - h_used < self.lag:
+                break
+            if force or (op == "S" and ref_win[i]["n"] == hyp[j]["n"]
+                         and hyp[j]["conf"] >= self.opts["min_confidence"]):
+                best = k + 1
+        return best
+
+    def update(self, tokens):
+        tokens = tokens or []
+        while True:
+            hyp = filter_hyp(tokens[self.anchor_j:], self.opts["final_only"], start=self.anchor_j)
+            ref_win, ops = self._window(hyp)
+            upto = self._anchor(ops, ref_win, hyp, force=False)
+            if not upto and len(hyp) > self.window:
+                # a long stretch with no confirmed word (or one big batch): freeze the oldest part anyway
+                hyp = hyp[:self.window]
+                ref_win, ops = self._window(hyp)
+                upto = self._anchor(ops, ref_win, hyp, force=True)
+            if not upto:
+                break
+            self._freeze(ops, ref_win, hyp, upto)
+
+        status = list(self.status)
+        w_status, w_inserted, w_events = self._classify(ops, ref_win, hyp)
+        for r, st in zip(ref_win, w_status):
+            status[r["oIdx"]] = st
+        return {"status": status,
+                "insertions": insertion_line(self.inserted + w_inserted, self.opts["max_insertions_shown"]),
+                "events": self.events + w_events}
+
+    def finalize(self, tokens):
+        return align(self.ref_words, tokens or [], **self.opts)
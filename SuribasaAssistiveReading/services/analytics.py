@@ -0,0 +1,149 @@
+# services/analytics.py
+"""
+Class-level numbers for teachers and school heads (`GET /api/analytics`).
+
+class_stats() groups sessions by grade, section and/or passage in one SQL
+GROUP BY over the stored summary columns (services.scoring.summarize), so
+nothing is parsed or scored in Python: session count, mean WCPM, accuracy
+and comprehension, and the reading-profile distribution per group.
+
+Results are kept in a small in-process TTL cache. Every write that changes
+what the numbers are made of calls invalidate(), which bumps a version that
+is part of the key, so a cached answer is never older than the last write in
+this worker (and never older than ANALYTICS_CACHE_TTL seconds across workers).
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import select, func, case
+
+from models import db, Session, Passage
+from services.session_rows import LEVELS, filter_conditions
+
+GROUPS = {"grade": Session.grade_level, "section": Session.section, "passage": Session.passage_id}
+
+
+class AnalyticsCache:
+    def __init__(self, maxsize=128, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._mem = OrderedDict()  # key -> (expires_at, payload)
+        self._lock = threading.Lock()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, *parts):
+        with self._lock:
+            return (self.version,) + parts
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None and item[0] > now:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            self._mem.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, key, payload):
+        with self._lock:
+            if key[0] != self.version:  # a write landed while this was computed
+                return
+            self._mem[key] = (time.time() + self.ttl, payload)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.maxsize:
+                self._mem.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._mem.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._mem), "version": self.version, "hits": self.hits,
+                    "misses": self.misses, "ttl": self.ttl}
+
+
+def _int_env(name, default):
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+cache = AnalyticsCache(maxsize=_int_env("ANALYTICS_CACHE_SIZE", 128), ttl=_int_env("ANALYTICS_CACHE_TTL", 60))
+
+
+def invalidate():
+    cache.invalidate()
+
+
+def parse_group_by(value):
+    """'grade,section' -> ('grade', 'section'); unknown names are dropped, default ('grade',)."""
+    names = [g.strip().lower() for g in (value or "").split(",")]
+    out = tuple(dict.fromkeys(g for g in names if g in GROUPS))
+    return out or ("grade",)
+
+
+# sums rather than averages, so the overall row is just the column totals of the groups
+_AGGREGATES = (
+    func.count(Session.id),
+    func.coalesce(func.sum(Session.wcpm), 0.0),
+    func.coalesce(func.sum(Session.accuracy), 0.0),
+    func.coalesce(func.sum(Session.comp_pct), 0.0),
+    func.count(Session.comp_pct),
+    *(func.sum(case((Session.reading_profile == lvl, 1), else_=0)) for lvl in LEVELS),
+)
+
+
+def _mean(total, n):
+    return round(float(total) / n, 1) if n else None
+
+
+def _stats(sums):
+    n, wcpm, acc, comp, comp_n = sums[:5]
+    return {
+        "sessions": int(n),
+        "mean_wcpm": _mean(wcpm, n),
+        "mean_accuracy": _mean(acc, n),
+        "mean_comp_pct": _mean(comp, comp_n),
+        "with_comprehension": int(comp_n),
+        "levels": {lvl: int(c or 0) for lvl, c in zip(LEVELS, sums[5:])},
+    }
+
+
+def _compute(group_by, filters):
+    cols = [GROUPS[g] for g in group_by]
+    q = select(*cols, *_AGGREGATES).where(*filter_conditions(filters)).group_by(*cols).order_by(*cols)
+    groups, overall = [], [0] * len(_AGGREGATES)
+    for row in db.session.execute(q):
+        sums = row[len(cols):]
+        overall = [a + (b or 0) for a, b in zip(overall, sums)]
+        g = {name: value for name, value in zip(group_by, row)}
+        g.update(_stats(sums))
+        groups.append(g)
+    if "passage" in group_by:
+        ids = {g["passage"] for g in groups if g["passage"] is not None}
+        titles = dict(db.session.execute(select(Passage.id, Passage.title).where(Passage.id.in_(ids))).all()) if ids else {}
+        for g in groups:
+            g["passage_title"] = titles.get(g["passage"])
+    return {"group_by": list(group_by), "filters": filters, "groups": groups, "overall": _stats(overall)}
+
+
+def class_stats(group_by=("grade",), filters=None):
+    """Grouped stats as a dict (cached); 'cached' tells whether it came from the cache."""
+    filters = dict(filters or {})
+    key = cache.key(tuple(group_by), tuple(sorted(filters.items())))
+    payload = cache.get(key)
+    if payload is not None:
+        return {**payload, "cached": True}
+    payload = _compute(tuple(group_by), filters)
+    cache.put(key, payload)
+    return {**payload, "cached": False}
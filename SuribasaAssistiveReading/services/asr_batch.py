@@ -0,0 +1,173 @@
+# services/asr_batch.py
+"""
+Offline batch transcription (used by `flask asr-batch`).
+
+Recordings from a directory or a manifest are spread across a process
+pool; each worker process loads its own models once. Results stream out as
+NDJSON, one line per file with its real-time factor (RTF = decode time /
+audio duration). Files already written with "ok": true are skipped, so an
+interrupted run can be resumed with the same --out file. That includes a
+run stopped because a worker process died (OOM, a crash in native model
+code): the summary says "aborted" and the finished files are kept.
+
+Each worker's Whisper model gets cpu_count // workers threads (or fewer, if
+ASR_WHISPER_THREADS says so) so the processes don't oversubscribe the CPU.
+"""
+import os, sys, json, time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+AUDIO_EXTS = {".webm", ".wav", ".mp3", ".m4a", ".ogg", ".oga", ".flac", ".mp4", ".aac"}
+
+
+def collect_inputs(source=None, manifest=None):
+    """
+    Items to transcribe: every audio file under `source` (recursively) and/or
+    the entries of `manifest`, which is either one path per line or NDJSON
+    objects with "path" and optional "lang" / "passage_id".
+    """
+    items = []
+    if source:
+        for root, _, files in os.walk(source):
+            for f in sorted(files):
+                if os.path.splitext(f)[1].lower() in AUDIO_EXTS:
+                    items.append({"path": os.path.join(root, f)})
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                item = json.loads(line) if line.startswith("{") else {"path": line}
+                if not os.path.isabs(item["path"]):
+                    item["path"] = os.path.join(base, item["path"])
+                items.append(item)
+    items.sort(key=lambda it: it["path"])
+    return items
+
+
+def load_done(out_path):
+    """Paths already transcribed successfully in an existing NDJSON output."""
+    done = set()
+    if not out_path or out_path == "-" or not os.path.exists(out_path):
+        return done
+    with open(out_path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                rec = json.loads(line)
+            except Exception:
+                continue  # a line cut off by the interruption
+            if rec.get("ok"):
+                done.add(rec.get("path"))
+    return done
+
+
+# ----------------- worker process -----------------
+_settings = {}
+
+
+def _worker_init(settings):
+    """Runs once per worker process: one model per process."""
+    os.environ["ASR_WHISPER_POOL"] = "1"
+    threads = settings.get("threads")
+    if threads:
+        try:
+            configured = int(os.getenv("ASR_WHISPER_THREADS") or 0)
+        except ValueError:
+            configured = 0
+        os.environ["ASR_WHISPER_THREADS"] = str(min(configured, threads) if configured > 0 else threads)
+    _settings.update(settings)
+    from services.asr_whisper import preload_whisper
+    from services.asr_vosk import _load_model
+    preload_whisper(background=False)
+    _load_model()
+
+
+def _transcribe_file(item):
+    from services.audio_decode import decode_pcm16, pcm_duration_sec
+    from services.asr_engine import transcribe_pcm
+    from services.asr_grammar import grammar_cache
+
+    rec = {"path": item["path"], "ok": False}
+    t0 = time.perf_counter()
+    try:
+        with open(item["path"], "rb") as fh:
+            pcm = decode_pcm16(fh, 16000)
+        if pcm is None:
+            rec["error"] = "could not decode audio"
+            return rec
+        duration = pcm_duration_sec(pcm, 16000)
+
+        words = item.get("grammar") or _settings.get("grammars", {}).get(str(item.get("passage_id")))
+        entry = grammar_cache.get(words, None, 16000) if words else None
+        out, code = transcribe_pcm(
+            pcm,
+            lang=item.get("lang") or _settings.get("lang", "en"),
+            grammar_entry=entry,
+            mode=_settings.get("mode"),
+            prefer_whisper=_settings.get("prefer_whisper", True),
+        )
+        elapsed = time.perf_counter() - t0
+        rec.update({
+            "ok": bool(out.get("ok")),
+            "engine": out.get("engine"),
+            "tokens": out.get("tokens", []),
+            "text": " ".join(t.get("text", "") for t in out.get("tokens", [])),
+            "duration_sec": round(duration, 3),
+            "elapsed_sec": round(elapsed, 3),
+            "rtf": round(elapsed / duration, 4) if duration else None,
+            "timings_ms": out.get("timings_ms"),
+        })
+        if not out.get("ok"):
+            rec["error"] = out.get("error") or f"status {code}"
+    except Exception as e:
+        rec["error"] = f"{type(e).__name__}: {e}"
+    if "passage_id" in item:
+        rec["passage_id"] = item["passage_id"]
+    return rec
+
+
+# ----------------- driver -----------------
+def run_batch(items, out_path="-", workers=None, settings=None, log=None):
+    """Transcribe `items`, appending NDJSON records to out_path ("-" = stdout). Returns a summary dict."""
+    log = log or (lambda msg: print(msg, file=sys.stderr))
+    done = load_done(out_path)
+    todo = [it for it in items if it["path"] not in done]
+    log(f"[asr-batch] {len(items)} files, {len(done)} already done, {len(todo)} to go")
+    summary = {"files": 0, "ok": 0, "failed": 0, "audio_sec": 0.0, "elapsed_sec": 0.0}
+    if not todo:
+        return summary
+
+    out = sys.stdout if out_path == "-" else open(out_path, "a", encoding="utf-8")
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo)))
+    settings = dict(settings or {}, threads=max(1, (os.cpu_count() or 1) // workers))
+    t0 = time.perf_counter()
+    try:
+        # spawn, not fork: the parent may already hold model threads/locks
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                 initializer=_worker_init, initargs=(settings,)) as pool:
+            futures = [pool.submit(_transcribe_file, it) for it in todo]
+            try:
+                for f in as_completed(futures):
+                    rec = f.result()
+                    out.write(json.dumps(rec) + "\n")
+                    out.flush()  # every finished file survives an interruption
+                    summary["files"] += 1
+                    summary["ok" if rec.get("ok") else "failed"] += 1
+                    summary["audio_sec"] += rec.get("duration_sec") or 0.0
+            except BrokenProcessPool as e:
+                # the rest of the pool's futures fail the same way; what's written stays resumable
+                summary["aborted"] = f"worker process died: {str(e).rstrip('.')}"
+                log(f"[asr-batch] {summary['aborted']}; stopping after {summary['files']} files, "
+                    f"rerun with the same --out to resume")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    summary["elapsed_sec"] = round(time.perf_counter() - t0, 3)
+    summary["audio_sec"] = round(summary["audio_sec"], 3)
+    summary["rtf"] = round(summary["elapsed_sec"] / summary["audio_sec"], 4) if summary["audio_sec"] else None
+    summary["workers"] = workers
+    summary["threads_per_worker"] = settings["threads"]
+    return summary
@@ -0,0 +1,113 @@
+# services/asr_cache.py
+"""
+Content-addressed transcript cache.
+
+Key = sha256(audio bytes) + engine settings + lang + accent + grammar, so a
+re-uploaded recording (flaky Wi-Fi, teacher re-running the fallback) is
+answered without decoding again. Memory tier is an LRU with TTL; an optional
+SQLite file (ASR_CACHE_DB) keeps entries across restarts and workers.
+"""
+import os, json, time, sqlite3, hashlib, threading
+from collections import OrderedDict
+
+
+def transcript_key(audio_bytes, engine="", lang="", accent="", grammar=""):
+    h = hashlib.sha256()
+    h.update(audio_bytes)
+    h.update(f"\0{engine}\0{lang}\0{accent or ''}\0{grammar or ''}".encode("utf-8"))
+    return h.hexdigest()
+
+
+class TranscriptCache:
+    def __init__(self, maxsize=256, ttl=24 * 3600, db_path=None, db_max_rows=20000):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.db_path = db_path
+        self.db_max_rows = db_max_rows
+        self._mem = OrderedDict()  # key -> (expires_at, payload)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if db_path:
+            try:
+                with self._db() as con:
+                    con.execute("CREATE TABLE IF NOT EXISTS transcript ("
+                                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, created REAL NOT NULL)")
+                    con.execute("CREATE INDEX IF NOT EXISTS ix_transcript_created ON transcript (created)")
+            except Exception as e:
+                print(f"[ASR] transcript cache DB disabled: {e}")
+                self.db_path = None
+
+    def _db(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _remember(self, key, payload, expires):
+        with self._lock:
+            self._mem[key] = (expires, payload)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.maxsize:
+                self._mem.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                if item[0] > now:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return item[1]
+                self._mem.pop(key, None)
+        if self.db_path:
+            try:
+                with self._db() as con:
+                    row = con.execute("SELECT payload, created FROM transcript WHERE key = ?", (key,)).fetchone()
+                if row and row[1] + self.ttl > now:
+                    payload = json.loads(row[0])
+                    self._remember(key, payload, row[1] + self.ttl)
+                    with self._lock:
+                        self.hits += 1
+                    return payload
+            except Exception as e:
+                print(f"[ASR] transcript cache read error: {e}")
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, payload):
+        now = time.time()
+        self._remember(key, payload, now + self.ttl)
+        if not self.db_path:
+            return
+        try:
+            with self._db() as con:
+                con.execute("INSERT OR REPLACE INTO transcript (key, payload, created) VALUES (?, ?, ?)",
+                            (key, json.dumps(payload), now))
+                con.execute("DELETE FROM transcript WHERE created < ?", (now - self.ttl,))
+                n = con.execute("SELECT COUNT(*) FROM transcript").fetchone()[0]
+                if n > self.db_max_rows:
+                    con.execute("DELETE FROM transcript WHERE key IN "
+                                "(SELECT key FROM transcript ORDER BY created ASC LIMIT ?)",
+                                (n - self.db_max_rows,))
+        except Exception as e:
+            print(f"[ASR] transcript cache write error: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._mem), "hits": self.hits, "misses": self.misses,
+                    "disk": bool(self.db_path)}
+
+
+def _int_env(name, default):
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+transcripts = TranscriptCache(
+    maxsize=_int_env("ASR_CACHE_SIZE", 256),
+    ttl=_int_env("ASR_CACHE_TTL", 24 * 3600),
+    db_path=(os.getenv("ASR_CACHE_DB") or "").strip() or None,
+    db_max_rows=_int_env("ASR_CACHE_DB_ROWS", 20000),
+)
@@ -0,0 +1,246 @@
+# services/asr_engine.py
+"""
+Engine orchestration for server-side ASR, on already-decoded PCM.
+
+Modes (ASR_MODE or the request's `mode` field):
+  sequential  preferred engine first, the other only if it fails (default)
+  race        both engines on a thread pool; the preferred engine wins if it
+              succeeds within ASR_RACE_BUDGET_MS, otherwise the first success
+  fuse        both engines; token streams merged by confidence
+Every result carries per-engine wall-clock timings in `timings_ms`.
+
+With ASR_VAD on (default), silence is trimmed first and the remaining speech
+chunks are decoded on up to ASR_VAD_THREADS threads; token start_ms/end_ms
+refer to the original recording. Whisper chunks run at most ASR_WHISPER_POOL
+at a time (one per model instance), so with the default pool of 1 they are
+decoded one after another in the calling thread.
+"""
+import os, time, difflib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from services.asr_whisper import transcribe_pcm_or_501, get_whisper_pool
+from services.asr_vosk import transcribe_pcm_vosk_or_none
+from services.asr_vad import vad_enabled, speech_chunks
+
+MODES = {"sequential", "race", "fuse"}
+
+
+def _int_env(name, default):
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+_executor = ThreadPoolExecutor(max_workers=_int_env("ASR_ENGINE_THREADS", 4),
+                               thread_name_prefix="asr-engine")
+# separate pool: engine tasks wait on their segments, so they must not share threads
+_SEGMENT_THREADS = max(1, _int_env("ASR_VAD_THREADS", 4))
+_segment_executor = ThreadPoolExecutor(max_workers=_SEGMENT_THREADS, thread_name_prefix="asr-segment")
+
+
+def asr_mode(requested=None):
+    m = (requested or os.getenv("ASR_MODE") or "sequential").strip().lower()
+    return m if m in MODES else "sequential"
+
+
+# ----------------- single engines -----------------
+def _decode_chunks(decode, chunks, engine, width=None):
+    """
+    Decode speech chunks on up to `width` lanes (default ASR_VAD_THREADS) and
+    stitch the tokens back in recording order.
+    """
+    width = max(1, min(width or _SEGMENT_THREADS, _SEGMENT_THREADS, len(chunks)))
+    if width == 1:
+        results = [decode(ch.pcm) for ch in chunks]
+    else:
+        # one task per lane, each decoding its chunks in turn: never more tasks than decoders
+        def lane(k):
+            return [(i, decode(chunks[i].pcm)) for i in range(k, len(chunks), width)]
+        results = [None] * len(chunks)
+        for done in _segment_executor.map(lane, range(width)):
+            for i, r in done:
+                results[i] = r
+    tokens = []
+    for ch, (out, code) in zip(chunks, results):
+        if code != 200:
+            return out, code
+        for t in out.get("tokens", []):
+            t = dict(t)
+            if "start_ms" in t:
+                t["start_ms"] = ch.to_original_ms(t["start_ms"])
+                t["end_ms"] = ch.to_original_ms(t.get("end_ms", 0.0))
+            tokens.append(t)
+    return {"ok": True, "engine": engine, "tokens": tokens}, 200
+
+
+def _whisper_once(pcm, lang="en", vad_filter=True):
+    out = transcribe_pcm_or_501(pcm, lang=lang, vad_filter=vad_filter)
+    if out.get("ok"):
+        out.setdefault("engine", "whisper")
+        return out, 200
+    return out, out.get("status", 500)
+
+
+def _vosk_once(pcm, grammar_entry=None):
+    try:
+        out = transcribe_pcm_vosk_or_none(pcm, grammar_entry=grammar_entry)
+    except Exception as e:
+        print(f"[ASR] VOSK error: {e}")
+        out = None
+    if out and out.get("ok"):
+        out.setdefault("engine", "vosk")
+        return out, 200
+    return {"ok": False, "error": "Vosk failed"}, 500
+
+
+def run_whisper(pcm, lang="en", chunks=None, **_):
+    if chunks:
+        # already trimmed to speech, so skip Whisper's own VAD pass
+        return _decode_chunks(lambda p: _whisper_once(p, lang, vad_filter=False), chunks, "whisper",
+                              width=get_whisper_pool().config["pool_size"])
+    return _whisper_once(pcm, lang)
+
+
+def run_vosk(pcm, grammar_entry=None, chunks=None, **_):
+    if chunks:
+        return _decode_chunks(lambda p: _vosk_once(p, grammar_entry), chunks, "vosk")
+    return _vosk_once(pcm, grammar_entry)
+
+
+ENGINES = {"whisper": run_whisper, "vosk": run_vosk}
+
+
+def _timed(name, pcm, kwargs):
+    t0 = time.perf_counter()
+    try:
+        out, code = ENGINES[name](pcm, **kwargs)
+    except Exception as e:
+        out, code = {"ok": False, "error": f"{type(e).__name__}: {e}"}, 500
+    return name, out, code, round((time.perf_counter() - t0) * 1000.0, 1)
+
+
+# ----------------- token fusion -----------------
+def _norm(t):
+    return "".join(ch for ch in str(t.get("text", "")).lower() if ch.isalnum() or ch == "'")
+
+
+def _mean_conf(toks):
+    return sum(float(t.get("confidence", 0.0)) for t in toks) / len(toks) if toks else 0.0
+
+
+def merge_tokens(primary, secondary):
+    """
+    Merge two token streams. Agreeing spans keep the higher per-token
+    confidence; disagreeing spans take whichever side has the higher mean
+    confidence (ties go to `primary`).
+    """
+    a = [_norm(t) for t in primary]
+    b = [_norm(t) for t in secondary]
+    out = []
+    sm = difflib.SequenceMatcher(a=a, b=b, autojunk=False)
+    for op, i1, i2, j1, j2 in sm.get_opcodes():
+        pa, pb = primary[i1:i2], secondary[j1:j2]
+        if op == "equal":
+            for ta, tb in zip(pa, pb):
+                best = ta if float(ta.get("confidence", 0)) >= float(tb.get("confidence", 0)) else tb
+                out.append(dict(best, final=True))
+        else:
+            pick = pa if _mean_conf(pa) >= _mean_conf(pb) else pb
+            out.extend(dict(t, final=True) for t in pick)
+    return out
+
+
+# ----------------- modes -----------------
+def _order(prefer_whisper):
+    return ["whisper", "vosk"] if prefer_whisper else ["vosk", "whisper"]
+
+
+def _sequential(pcm, order, kwargs, timings):
+    out, code = None, 500
+    for name in order:
+        _, out, code, ms = _timed(name, pcm, kwargs)
+        timings[name] = ms
+        if code == 200:
+            break
+    return out, code
+
+
+def _race(pcm, order, kwargs, timings, budget_ms):
+    t0 = time.perf_counter()
+    futs = {_executor.submit(_timed, name, pcm, kwargs): name for name in order}
+    pending, winner, fallback = set(futs), None, None
+    last = (None, 500)
+    while pending and winner is None:
+        elapsed = (time.perf_counter() - t0) * 1000.0
+        # wait for the preferred engine up to the budget once we have a fallback
+        timeout = max(0.0, (budget_ms - elapsed) / 1000.0) if fallback else None
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for f in done:
+            name, out, code, ms = f.result()
+            timings[name] = ms
+            last = (out, code)
+            if code == 200:
+                if name == order[0]:
+                    winner = (out, code)
+                elif fallback is None:
+                    fallback = (out, code)
+        if not done and fallback:
+            winner = fallback  # budget spent; take what we have
+    for f, name in futs.items():
+        if f in pending:
+            timings.setdefault(name, None)  # still running; result discarded
+    return winner or fallback or last
+
+
+def _fuse(pcm, order, kwargs, timings, timeout_ms):
+    futs = [_executor.submit(_timed, name, pcm, kwargs) for name in order]
+    done, _ = wait(futs, timeout=timeout_ms / 1000.0)
+    results = {}
+    for f in futs:
+        if f in done:
+            name, out, code, ms = f.result()
+            timings[name] = ms
+            results[name] = (out, code)
+    for name in order:
+        timings.setdefault(name, None)
+    ok = [n for n in order if results.get(n, (None, 0))[1] == 200]
+    if len(ok) == 2:
+        merged = merge_tokens(results[ok[0]][0].get("tokens", []), results[ok[1]][0].get("tokens", []))
+        return {"ok": True, "engine": "fusion", "engines": ok, "tokens": merged}, 200
+    if ok:
+        return results[ok[0]]
+    return results.get(order[0]) or results.get(order[-1]) or ({"ok": False, "error": "ASR timed out"}, 504)
+
+
+def transcribe_pcm(pcm, lang="en", grammar_entry=None, mode=None, prefer_whisper=True):
+    """Run the configured engine mode on decoded PCM. Returns (payload, http_status)."""
+    mode = asr_mode(mode)
+    order = _order(prefer_whisper)
+    kwargs = {"lang": lang, "grammar_entry": grammar_entry}
+    timings = {}
+    vad = None
+    if vad_enabled():
+        t0 = time.perf_counter()
+        chunks = speech_chunks(pcm)
+        timings["vad"] = round((time.perf_counter() - t0) * 1000.0, 1)
+        if chunks:
+            kwargs["chunks"] = chunks
+            vad = {
+                "chunks": len(chunks),
+                "segments": sum(len(ch.pieces) for ch in chunks),
+                "speech_sec": round(sum(ch.duration_sec for ch in chunks), 2),
+                "audio_sec": round(len(pcm) / 2 / 16000.0, 2),
+            }
+    if mode == "race":
+        out, code = _race(pcm, order, kwargs, timings, _int_env("ASR_RACE_BUDGET_MS", 1500))
+    elif mode == "fuse":
+        out, code = _fuse(pcm, order, kwargs, timings, _int_env("ASR_FUSE_TIMEOUT_MS", 60000))
+    else:
+        out, code = _sequential(pcm, order, kwargs, timings)
+    out = dict(out or {"ok": False, "error": "ASR failed"})
+    out["mode"] = mode
+    out["timings_ms"] = timings
+    if vad:
+        out["vad"] = vad
+    return out, code
@@ -0,0 +1,109 @@
+# services/asr_grammar.py
+"""
+Bounded LRU cache of compiled Vosk grammars.
+
+Every student reads the same passage, so the grammar word list (and its
+Filipino-accent expansion) is built once per (passage text, accent, sample
+rate) and shared. Each entry also keeps a few idle KaldiRecognizers built
+with that grammar so requests don't pay for recognizer construction.
+"""
+import os, hashlib, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from services.asr_vosk import grammar_json
+
+
+def grammar_key(source, accent=None, sr=16000):
+    """Hash of the grammar source (passage text or word list), accent mode and sample rate."""
+    if isinstance(source, (list, tuple)):
+        source = "\n".join(str(w) for w in source)
+    h = hashlib.sha1()
+    h.update(f"{accent or ''}|{int(sr)}|".encode("utf-8"))
+    h.update((source or "").encode("utf-8"))
+    return h.hexdigest()
+
+
+class GrammarEntry:
+    def __init__(self, key, words, sr, passage_id=None, max_idle=2):
+        self.key = key
+        self.words = words
+        self.grammar = grammar_json(words)
+        self.sr = sr
+        self.passage_id = passage_id
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def recognizer(self, model):
+        """Borrow a recognizer for this grammar; it is reset and returned afterwards."""
+        from vosk import KaldiRecognizer
+        with self._lock:
+            rec = self._idle.pop() if self._idle else None
+        if rec is None:
+            rec = KaldiRecognizer(model, self.sr, self.grammar) if self.grammar else KaldiRecognizer(model, self.sr)
+        ok = False
+        try:
+            yield rec
+            ok = True
+        finally:
+            if ok and hasattr(rec, "Reset"):
+                try:
+                    rec.Reset()
+                except Exception:
+                    ok = False
+                if ok:
+                    with self._lock:
+                        if len(self._idle) < self.max_idle:
+                            self._idle.append(rec)
+
+
+class GrammarCache:
+    def __init__(self, maxsize=32, max_idle=2):
+        self.maxsize = maxsize
+        self.max_idle = max_idle
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source, accent=None, sr=16000, build_words=None, passage_id=None):
+        """
+        Return the GrammarEntry for `source`, building it with build_words()
+        (which should return the final, expanded word list) on a miss.
+        """
+        key = grammar_key(source, accent, sr)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        words = build_words() if build_words else list(source or [])
+        entry = GrammarEntry(key, words, sr, passage_id=passage_id, max_idle=self.max_idle)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate_passage(self, passage_id):
+        """Drop every entry built from this passage (call after its text changes)."""
+        with self._lock:
+            for k in [k for k, e in self._entries.items() if e.passage_id == passage_id]:
+                self._entries.pop(k, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+try:
+    _maxsize = int(os.getenv("ASR_GRAMMAR_CACHE") or 32)
+except ValueError:
+    _maxsize = 32
+
+grammar_cache = GrammarCache(maxsize=_maxsize)
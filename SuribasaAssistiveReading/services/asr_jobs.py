@@ -0,0 +1,120 @@
+# services/asr_jobs.py
+"""
+Bounded ASR job queue.
+
+At most `max_in_flight` transcriptions run at once and at most
+`queue_depth` more wait behind them; anything beyond that is refused
+(the HTTP layer turns it into 429 + Retry-After) so ASR load can't tie up
+every worker thread and starve the rest of the app.
+"""
+import os, math, time, uuid, threading
+from concurrent.futures import ThreadPoolExecutor
+
+LONG_POLL_SEC = 5.0  # longest one status poll waits (see services/long_poll.py for how many may)
+
+
+class JobQueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__("ASR queue is full")
+        self.retry_after = retry_after
+
+
+class AsrJob:
+    def __init__(self, owner=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.state = "queued"        # queued | running | done | error
+        self.result = None
+        self.code = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        d = {"job_id": self.id, "state": self.state}
+        if self.started:
+            d["queued_ms"] = round((self.started - self.created) * 1000.0, 1)
+        if self.finished and self.started:
+            d["run_ms"] = round((self.finished - self.started) * 1000.0, 1)
+        return d
+
+
+class AsrJobQueue:
+    def __init__(self, max_in_flight=2, queue_depth=8, ttl=600):
+        self.max_in_flight = max(1, max_in_flight)
+        self.queue_depth = max(0, queue_depth)
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="asr-job")
+        self._slots = threading.BoundedSemaphore(self.max_in_flight + self.queue_depth)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._avg_run = 3.0  # seconds; running estimate for Retry-After
+
+    def _sweep(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for k in [k for k, j in self._jobs.items() if j.finished and j.finished < cutoff]:
+                self._jobs.pop(k, None)
+
+    def retry_after(self):
+        """Seconds until a slot is likely free (at least 1)."""
+        return max(1, int(math.ceil(self._avg_run * (1 + self.queue_depth / float(self.max_in_flight)))))
+
+    def submit(self, fn, *args, owner=None, **kwargs):
+        """Queue fn(*args, **kwargs) -> (payload, status). Raises JobQueueFull."""
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull(self.retry_after())
+        self._sweep()
+        job = AsrJob(owner)
+        with self._lock:
+            self._jobs[job.id] = job
+
+        def run():
+            job.state, job.started = "running", time.time()
+            try:
+                job.result, job.code = fn(*args, **kwargs)
+                job.state = "done" if job.code == 200 else "error"
+            except Exception as e:
+                job.result, job.code = {"ok": False, "error": f"{type(e).__name__}: {e}"}, 500
+                job.state = "error"
+            finally:
+                job.finished = time.time()
+                self._avg_run = 0.8 * self._avg_run + 0.2 * (job.finished - job.started)
+                self._slots.release()
+                job.done.set()
+
+        self._executor.submit(run)
+        return job
+
+    def get(self, job_id, owner=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def stats(self):
+        with self._lock:
+            states = [j.state for j in self._jobs.values()]
+        return {
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queue_depth,
+            "running": states.count("running"),
+            "queued": states.count("queued"),
+            "avg_run_sec": round(self._avg_run, 2),
+        }
+
+
+def _int_env(name, default):
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+jobs = AsrJobQueue(
+    max_in_flight=_int_env("ASR_MAX_IN_FLIGHT", 2),
+    queue_depth=_int_env("ASR_QUEUE_DEPTH", 8),
+    ttl=_int_env("ASR_JOB_TTL", 600),
+)
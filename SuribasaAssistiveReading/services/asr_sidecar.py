@@ -0,0 +1,257 @@
+# services/asr_sidecar.py
+"""
+Optional ASR sidecar: one process owns the Whisper pool and the Vosk model
+and serves transcription to every gunicorn worker over a Unix socket, so
+model memory no longer scales with the worker count.
+
+    ASR_SIDECAR_SOCKET=/tmp/suribasa-asr.sock python -m services.asr_sidecar
+
+Workers with ASR_SIDECAR_SOCKET set send decoded PCM to the sidecar and
+fall back to their in-process engines whenever it isn't reachable.
+
+Wire format (both directions): 4-byte big-endian header length, a JSON
+header, then `pcm_bytes` bytes of raw 16 kHz int16 PCM (requests only).
+Connections are persistent; a client sends any number of requests on one.
+"""
+import os, sys, json, time, struct, socket, threading, socketserver
+
+_HDR = struct.Struct(">I")
+_MAX_HEADER = 8 * 1024 * 1024
+
+
+def socket_path():
+    return (os.getenv("ASR_SIDECAR_SOCKET") or "").strip() or None
+
+
+def _float_env(name, default):
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view, got = memoryview(buf), 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if not k:
+            raise ConnectionError("sidecar connection closed")
+        got += k
+    return buf
+
+
+def send_msg(sock, header, payload=None):
+    if payload is not None:
+        header = dict(header, pcm_bytes=len(payload))
+    raw = json.dumps(header).encode("utf-8")
+    sock.sendall(_HDR.pack(len(raw)) + raw)
+    if payload is not None and len(payload):
+        sock.sendall(payload)
+
+
+def recv_msg(sock):
+    """Return (header, payload_or_None)."""
+    (n,) = _HDR.unpack(_recv_exact(sock, _HDR.size))
+    if n > _MAX_HEADER:
+        raise ConnectionError("sidecar header too large")
+    header = json.loads(bytes(_recv_exact(sock, n)).decode("utf-8"))
+    size = int(header.get("pcm_bytes") or 0)
+    return header, (_recv_exact(sock, size) if size else None)
+
+
+# ----------------- client (gunicorn workers) -----------------
+class SidecarUnavailable(Exception):
+    pass
+
+
+class SidecarClient:
+    """
+    Thin client with one persistent connection per thread. After a failed
+    connect it stays "down" for retry_sec so requests don't each pay for it.
+    """
+
+    def __init__(self, path, timeout=120.0, retry_sec=5.0):
+        self.path = path
+        self.timeout = timeout
+        self.retry_sec = retry_sec
+        self._local = threading.local()
+        self._down_until = 0.0
+
+    def _conn(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            return sock
+        if time.time() < self._down_until:
+            raise SidecarUnavailable("sidecar marked down")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            self._down_until = time.time() + self.retry_sec
+            raise SidecarUnavailable(str(e))
+        self._local.sock = sock
+        return sock
+
+    def _drop(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def request(self, header, payload=None):
+        # a reused connection may have been closed by a sidecar restart: retry once on a fresh one
+        for attempt in (0, 1):
+            reused = getattr(self._local, "sock", None) is not None
+            sock = self._conn()
+            try:
+                send_msg(sock, header, payload)
+                resp, _ = recv_msg(sock)
+                return resp
+            except socket.timeout:
+                self._drop()
+                raise
+            except (OSError, ConnectionError, ValueError) as e:
+                self._drop()
+                if attempt or not reused:
+                    self._down_until = time.time() + self.retry_sec
+                    raise SidecarUnavailable(str(e))
+
+    def transcribe(self, pcm, lang="en", grammar_entry=None, mode=None, prefer_whisper=True):
+        header = {"op": "transcribe", "lang": lang, "mode": mode, "prefer_whisper": prefer_whisper}
+        if grammar_entry is not None:
+            header["grammar"] = {"key": grammar_entry.key, "words": grammar_entry.words}
+        try:
+            resp = self.request(header, pcm)
+        except socket.timeout:
+            # don't fall back: loading models in-process is exactly what the sidecar avoids
+            return {"ok": False, "error": "ASR sidecar timed out"}, 504
+        return resp.get("payload") or {"ok": False, "error": "bad sidecar reply"}, int(resp.get("status") or 500)
+
+    def status(self):
+        try:
+            return self.request({"op": "status"}).get("payload")
+        except (SidecarUnavailable, socket.timeout) as e:
+            return {"ok": False, "error": str(e)}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def sidecar_client():
+    """The process-wide client, or None when ASR_SIDECAR_SOCKET isn't set."""
+    global _client
+    path = socket_path()
+    if not path:
+        return None
+    with _client_lock:
+        if _client is None or _client.path != path:
+            _client = SidecarClient(path, timeout=_float_env("ASR_SIDECAR_TIMEOUT", 120.0),
+                                    retry_sec=_float_env("ASR_SIDECAR_RETRY_SEC", 5.0))
+        return _client
+
+
+def transcribe_via_sidecar(pcm, lang="en", grammar_entry=None, mode=None, prefer_whisper=True):
+    """(payload, status) from the sidecar, or None if there is no sidecar to use."""
+    client = sidecar_client()
+    if client is None:
+        return None
+    try:
+        out, code = client.transcribe(pcm, lang, grammar_entry, mode, prefer_whisper)
+    except SidecarUnavailable as e:
+        print(f"[ASR] sidecar unavailable ({e}); using in-process engines")
+        return None
+    out["sidecar"] = True
+    return out, code
+
+
+# ----------------- server (the sidecar process) -----------------
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                header, payload = recv_msg(self.request)
+            except (ConnectionError, OSError, ValueError):
+                return
+            try:
+                status, body = self.server.dispatch(header, payload)
+            except Exception as e:
+                status, body = 500, {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            try:
+                send_msg(self.request, {"status": status, "payload": body})
+            except OSError:
+                return
+
+
+class SidecarServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, max_in_flight=None):
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket from a previous run
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o660)
+        self._slots = threading.BoundedSemaphore(max_in_flight or os.cpu_count() or 2)
+        self.served = 0
+
+    def dispatch(self, header, payload):
+        from services.asr_engine import transcribe_pcm, asr_mode
+        op = header.get("op")
+        if op == "status":
+            from services.asr_whisper import get_whisper_pool
+            from services.asr_vosk import _load_model
+            from services.asr_grammar import grammar_cache
+            return 200, {"ok": True, "pid": os.getpid(), "served": self.served, "mode": asr_mode(),
+                         "whisper": get_whisper_pool().status(), "vosk_loaded": bool(_load_model()),
+                         "grammar_cache": grammar_cache.stats()}
+        if op != "transcribe":
+            return 400, {"ok": False, "error": f"unknown op {op!r}"}
+
+        entry = None
+        g = header.get("grammar")
+        if g and g.get("words"):
+            from services.asr_grammar import grammar_cache
+            words = list(g["words"])
+            # the worker's key already covers passage text, accent and sample rate
+            entry = grammar_cache.get(g.get("key") or words, None, 16000, build_words=lambda: words)
+        with self._slots:
+            out, code = transcribe_pcm(payload or b"", lang=header.get("lang") or "en", grammar_entry=entry,
+                                       mode=header.get("mode"), prefer_whisper=header.get("prefer_whisper", True))
+        self.served += 1
+        return code, out
+
+
+def serve(path=None):
+    from services.asr_whisper import preload_whisper
+    from services.asr_vosk import _load_model
+
+    path = path or socket_path() or "/tmp/suribasa-asr.sock"
+    t0 = time.perf_counter()
+    preload_whisper(background=False)
+    vosk_ok = _load_model() is not None
+    print(f"[ASR] sidecar models ready in {time.perf_counter() - t0:.1f}s (vosk={'yes' if vosk_ok else 'no'})")
+    try:
+        max_in_flight = int(os.getenv("ASR_SIDECAR_MAX_IN_FLIGHT") or 0) or None
+    except ValueError:
+        max_in_flight = None
+    with SidecarServer(path, max_in_flight=max_in_flight) as server:
+        print(f"[ASR] sidecar listening on {path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,125 @@
+# services/asr_stream.py
+"""
+Live (chunked) Vosk recognition: one KaldiRecognizer per reading session,
+fed 16-bit mono PCM while the student reads, so the transcript is ready
+the moment they press Stop.
+"""
+import os, json, time, uuid, threading
+
+from services.asr_vosk import _load_model, new_recognizer
+
+
+def _words(text):
+    return [w for w in (text or "").strip().split() if w]
+
+
+class StreamSession:
+    def __init__(self, rec, sr, owner=None):
+        self.rec = rec
+        self.sr = sr
+        self.owner = owner
+        self.lock = threading.Lock()
+        self.last_seen = time.time()
+        self.final_words = []
+        self.bytes_in = 0
+        self.aligner = None  # optional services.alignment.IncrementalAligner for the passage
+
+    def tokens(self):
+        """Final words so far as ASR tokens."""
+        return [{"text": w, "confidence": 0.9, "final": True} for w in self.final_words]
+
+    def _take_result(self, raw):
+        try:
+            j = json.loads(raw)
+        except Exception:
+            j = {}
+        words = _words(j.get("text"))
+        self.final_words.extend(words)
+        return words
+
+    def feed(self, pcm):
+        """Feed one PCM chunk; returns (new final words, current partial text)."""
+        with self.lock:
+            self.last_seen = time.time()
+            self.bytes_in += len(pcm)
+            new_words, partial = [], ""
+            step = 4000
+            for i in range(0, len(pcm), step):
+                if self.rec.AcceptWaveform(bytes(pcm[i:i + step])):
+                    new_words.extend(self._take_result(self.rec.Result()))
+            try:
+                partial = json.loads(self.rec.PartialResult()).get("partial", "")
+            except Exception:
+                partial = ""
+            return new_words, partial
+
+    def finish(self):
+        with self.lock:
+            self.last_seen = time.time()
+            return self._take_result(self.rec.FinalResult())
+
+
+class StreamRegistry:
+    """In-process table of live recognizers, swept after `ttl` seconds idle."""
+
+    def __init__(self, ttl=120, max_sessions=64):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def sweep(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for sid in [k for k, v in self._sessions.items() if v.last_seen < cutoff]:
+                self._sessions.pop(sid, None)
+
+    def start(self, grammar_words=None, sr=16000, owner=None, grammar=None):
+        """Open a session. Returns its id, or None if Vosk is unavailable or we're full."""
+        try:
+            import vosk  # noqa: F401
+        except Exception:
+            return None
+        model = _load_model()
+        if model is None:
+            return None
+        self.sweep()
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                return None
+        sess = StreamSession(new_recognizer(model, sr, grammar_words, grammar=grammar), sr, owner)
+        sid = uuid.uuid4().hex
+        with self._lock:
+            # recheck: other starts may have filled the table while the recognizer was built
+            if len(self._sessions) >= self.max_sessions:
+                return None
+            self._sessions[sid] = sess
+        return sid
+
+    def get(self, sid, owner=None):
+        with self._lock:
+            sess = self._sessions.get(sid)
+        if sess is None or (owner is not None and sess.owner != owner):
+            return None
+        return sess
+
+    def close(self, sid):
+        with self._lock:
+            return self._sessions.pop(sid, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+def _int_env(name, default):
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+registry = StreamRegistry(
+    ttl=_int_env("ASR_STREAM_TTL", 120),
+    max_sessions=_int_env("ASR_STREAM_MAX", 64),
+)
@@ -0,0 +1,139 @@
+# services/asr_vad.py
+"""
+Energy-based voice activity detection on 16-bit mono PCM (NumPy only).
+
+Young readers pause a lot; dropping the pauses before decoding saves most
+of the engine time on long recordings. speech_chunks() returns the speech
+packed into chunks of at most `max_chunk_sec`, each remembering where its
+pieces came from so token times can be mapped back to the recording.
+"""
+import os
+import numpy as np
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def vad_enabled():
+    return (os.getenv("ASR_VAD", "true") or "").strip().lower() in {"1", "true", "yes", "y"}
+
+
+def speech_segments(pcm, sr=16000, frame_ms=30, margin_db=None, min_speech_ms=200,
+                    min_gap_ms=300, pad_ms=150, floor_dbfs=-55.0):
+    """
+    Return [(start_sample, end_sample), ...] of speech in `pcm`.
+
+    A frame is speech when its RMS level is `margin_db` above the recording's
+    noise floor (10th percentile of frame levels) and above `floor_dbfs`.
+    Gaps shorter than min_gap_ms are bridged, runs shorter than
+    min_speech_ms dropped, and each segment padded by pad_ms.
+    """
+    margin_db = _env_float("ASR_VAD_MARGIN_DB", 10.0) if margin_db is None else margin_db
+    x = np.frombuffer(pcm, dtype=np.int16)
+    flen = max(1, int(sr * frame_ms / 1000))
+    n = len(x) // flen
+    if n == 0:
+        return []
+    frames = x[:n * flen].reshape(n, flen).astype(np.float32) / 32768.0
+    db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    thresh = max(float(np.percentile(db, 10)) + margin_db, floor_dbfs)
+    speech = (db > thresh).astype(np.int8)
+
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech, [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+    if not len(starts):
+        return []
+
+    # bridge short pauses
+    keep = (starts[1:] - ends[:-1]) * frame_ms >= min_gap_ms
+    starts = starts[np.concatenate(([True], keep))]
+    ends = ends[np.concatenate((keep, [True]))]
+
+    # drop blips
+    long_enough = (ends - starts) * frame_ms >= min_speech_ms
+    starts, ends = starts[long_enough], ends[long_enough]
+
+    pad = int(pad_ms / frame_ms)
+    starts = np.maximum(starts - pad, 0) * flen
+    ends = np.minimum(ends + pad, n) * flen
+    if n * flen < len(x) and len(ends) and ends[-1] == n * flen:
+        ends[-1] = len(x)
+
+    segs = []
+    for s, e in zip(starts.tolist(), ends.tolist()):
+        if segs and s <= segs[-1][1]:
+            segs[-1] = (segs[-1][0], max(segs[-1][1], e))
+        else:
+            segs.append((s, e))
+    return segs
+
+
+class SpeechChunk:
+    """Speech pieces joined into one buffer, with a map back to original times."""
+
+    def __init__(self, sr):
+        self.sr = sr
+        self.parts = []
+        self.pieces = []   # (chunk_start_sample, orig_start_sample, n_samples)
+        self.samples = 0
+
+    def add(self, pcm_view, start, end, gap_samples):
+        if self.parts and gap_samples:
+            self.parts.append(bytes(gap_samples * 2))  # short silence so words don't run together
+            self.samples += gap_samples
+        self.parts.append(pcm_view[start * 2:end * 2])
+        self.pieces.append((self.samples, start, end - start))
+        self.samples += end - start
+
+    @property
+    def pcm(self):
+        return b"".join(self.parts)
+
+    @property
+    def duration_sec(self):
+        return self.samples / float(self.sr)
+
+    def to_original_ms(self, t_ms):
+        """Map a time inside this chunk to the original recording."""
+        t = t_ms * self.sr / 1000.0
+        for c0, o0, length in reversed(self.pieces):
+            if t >= c0:
+                return round((o0 + min(t - c0, length)) * 1000.0 / self.sr, 1)
+        c0, o0, _ = self.pieces[0]
+        return round(o0 * 1000.0 / self.sr, 1)
+
+
+def speech_chunks(pcm, sr=16000, max_chunk_sec=None, gap_ms=100):
+    """
+    Speech segments of `pcm` packed into SpeechChunks of at most max_chunk_sec.
+    Returns None when VAD finds nothing worth trimming (decode the whole buffer).
+    """
+    max_chunk_sec = _env_float("ASR_VAD_MAX_CHUNK_SEC", 20.0) if max_chunk_sec is None else max_chunk_sec
+    segs = speech_segments(pcm, sr)
+    total = len(pcm) // 2
+    if not segs:
+        return None
+    if len(segs) == 1 and (segs[0][1] - segs[0][0]) >= 0.95 * total and total <= max_chunk_sec * sr:
+        return None
+
+    view = memoryview(pcm)
+    max_samples = int(max_chunk_sec * sr)
+    gap = int(gap_ms * sr / 1000)
+    chunks, cur = [], SpeechChunk(sr)
+    for s, e in segs:
+        while e - s > max_samples:  # one very long utterance: cut it
+            if cur.samples:
+                chunks.append(cur); cur = SpeechChunk(sr)
+            cur.add(view, s, s + max_samples, gap)
+            chunks.append(cur); cur = SpeechChunk(sr)
+            s += max_samples
+        if cur.samples and cur.samples + gap + (e - s) > max_samples:
+            chunks.append(cur); cur = SpeechChunk(sr)
+        cur.add(view, s, e, gap)
+    if cur.samples:
+        chunks.append(cur)
+    return chunks
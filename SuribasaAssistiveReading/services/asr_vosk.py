@@ -1,5 +1,7 @@
 # services/asr_vosk.py
-import os, tempfile, json
+import os, json
+
+from services.audio_decode import decode_pcm16, iter_frames
 
 _model = None
 
@@ -18,16 +20,64 @@ def _load_model():
     _model = Model(path)
     return _model
 
-def transcribe_blob_vosk_or_none(file_storage, grammar_words=None, sr=16000):
+def grammar_json(grammar_words):
+    """Deduplicated, lower-cased grammar as the JSON string Vosk expects (or None)."""
+    if not grammar_words:
+        return None
+    uniq, seen = [], set()
+    for w in grammar_words:
+        w = (w or "").strip().lower()
+        if w and w not in seen:
+            uniq.append(w); seen.add(w)
+    return json.dumps(uniq) if uniq else None
+
+def new_recognizer(model, sr=16000, grammar_words=None, grammar=None):
+    """Build a KaldiRecognizer, restricted to grammar_words (or a prebuilt grammar JSON) when given."""
+    from vosk import KaldiRecognizer
+    grammar = grammar or grammar_json(grammar_words)
+    return KaldiRecognizer(model, sr, grammar) if grammar else KaldiRecognizer(model, sr)
+
+def _result_tokens(raw):
+    """Vosk result JSON -> tokens (with start_ms/end_ms when word times are on)."""
+    try:
+        j = json.loads(raw)
+    except Exception:
+        j = {"text": ""}
+    words = j.get("result")
+    if words:
+        return [{"text": w.get("word", ""), "confidence": 0.9, "final": True,
+                 "start_ms": round(float(w.get("start", 0)) * 1000.0, 1),
+                 "end_ms": round(float(w.get("end", 0)) * 1000.0, 1)}
+                for w in words if w.get("word")]
+    return [{"text": t, "confidence": 0.9, "final": True}
+            for t in (j.get("text","").strip().split())]
+
+def _recognize(rec, pcm):
+    if hasattr(rec, "SetWords"):
+        rec.SetWords(True)
+
+    # Feed PCM to recognizer (vosk's C binding wants bytes; each slice is a small copy).
+    # Collect intermediate results too, otherwise only the last utterance would carry word times.
+    tokens = []
+    for frame in iter_frames(pcm, 4000):
+        if rec.AcceptWaveform(bytes(frame)):
+            tokens.extend(_result_tokens(rec.Result()))
+
+    # Final result -> tokens
+    tokens.extend(_result_tokens(rec.FinalResult()))
+    return tokens
+
+def transcribe_pcm_vosk_or_none(pcm, grammar_words=None, sr=16000, grammar_entry=None):
     """
-    Transcribe an uploaded audio file using Vosk.
+    Transcribe 16-bit mono PCM (bytes or memoryview) using Vosk.
+    grammar_entry (services.asr_grammar.GrammarEntry) supplies a cached grammar
+    and pooled recognizers; otherwise a recognizer is built from grammar_words.
     If model unavailable, returns None so caller can fall back.
     Returns: {"ok": True, "engine": "vosk", "tokens": [{text, confidence, final}, ...]}
     """
     # Import here so missing deps don't break module import
     try:
-        from vosk import KaldiRecognizer
-        from pydub import AudioSegment
+        import vosk  # noqa: F401
     except Exception:
         return None
 
@@ -35,45 +85,21 @@ def transcribe_blob_vosk_or_none(file_storage, grammar_words=None, sr=16000):
     if model is None:
         return None
 
-    # Save upload to a temp file
-    fd, tmp = tempfile.mkstemp(suffix='.webm')
-    os.close(fd)
-    file_storage.save(tmp)
+    if grammar_entry is not None:
+        with grammar_entry.recognizer(model) as rec:
+            tokens = _recognize(rec, pcm)
+    else:
+        tokens = _recognize(new_recognizer(model, sr, grammar_words), pcm)
+    return {"ok": True, "engine": "vosk", "tokens": tokens}
 
-    try:
-        # Decode to PCM 16k mono
-        audio = AudioSegment.from_file(tmp)
-        audio = audio.set_channels(1).set_frame_rate(sr).set_sample_width(2)
-        pcm = audio.raw_data
-
-        # Build grammar JSON (list of allowed words) if provided
-        grammar = None
-        if grammar_words:
-            uniq, seen = [], set()
-            for w in grammar_words:
-                w = (w or "").strip().lower()
-                if w and w not in seen:
-                    uniq.append(w); seen.add(w)
-            grammar = json.dumps(uniq)
-
-        rec = KaldiRecognizer(model, sr, grammar) if grammar else KaldiRecognizer(model, sr)
-
-        # Feed PCM to recognizer
-        step = 4000
-        for i in range(0, len(pcm), step):
-            rec.AcceptWaveform(pcm[i:i+step])
-
-        # Final result -> tokens
-        out = rec.FinalResult()
-        try:
-            j = json.loads(out)
-        except Exception:
-            j = {"text": ""}
-
-        tokens = [{"text": t, "confidence": 0.9, "final": True}
-                  for t in (j.get("text","").strip().split())]
-        return {"ok": True, "engine": "vosk", "tokens": tokens}
-
-    finally:
-        try: os.remove(tmp)
-        except Exception: pass
+def transcribe_blob_vosk_or_none(file_storage, grammar_words=None, sr=16000, grammar_entry=None):
+    """
+    Transcribe an uploaded audio file using Vosk (decoded in memory).
+    If model or decoder unavailable, returns None so caller can fall back.
+    """
+    if _load_model() is None:
+        return None
+    pcm = decode_pcm16(file_storage, sr)
+    if pcm is None:
+        return None
+    return transcribe_pcm_vosk_or_none(pcm, grammar_words=grammar_words, sr=sr, grammar_entry=grammar_entry)
@@ -1,5 +1,175 @@
-import os, tempfile, json
-from io import BytesIO
+import os, threading, queue, traceback
+from contextlib import contextmanager
+
+from services.audio_decode import decode_pcm16, pcm16_to_float32
+
+
+def _env_bool(name, default):
+    return (os.getenv(name, default) or "").strip().lower() in {"1", "true", "yes", "y"}
+
+
+def whisper_config():
+    """Read the Whisper pool settings from the environment."""
+    try:
+        threads = int(os.getenv("ASR_WHISPER_THREADS") or 0)
+    except ValueError:
+        threads = 0
+    try:
+        size = max(1, int(os.getenv("ASR_WHISPER_POOL") or 1))
+    except ValueError:
+        size = 1
+    compute = (os.getenv("ASR_WHISPER_COMPUTE") or "int8").strip().lower()
+    if compute not in {"int8", "float32"}:
+        compute = "int8"
+    fast = _env_bool("ASR_WHISPER_FAST", "true")
+    return {
+        "model": (os.getenv("ASR_WHISPER_MODEL") or "base").strip(),
+        "device": os.environ.get("ASR_DEVICE", "cpu"),
+        "compute_type": compute,
+        "cpu_threads": threads,        # 0 = let CTranslate2 decide
+        "pool_size": size,
+        "fast": fast,                  # greedy decode instead of beam search
+        "beam_size": 1 if fast else 5,
+    }
+
+
+class WhisperUnavailable(RuntimeError):
+    """The pool's models failed to load; the only Whisper error reported as 503."""
+
+
+class WhisperPool:
+    """
+    A fixed set of WhisperModel instances handed out one per request.
+    Models are built by load() (at boot or in a background thread);
+    acquire() blocks until an instance is free.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or whisper_config()
+        self._free = queue.Queue()
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._loading = False
+        self.error = None
+
+    @property
+    def loaded(self):
+        return self._loaded.is_set() and self.error is None
+
+    def load(self):
+        """Build all model instances. Safe to call more than once."""
+        with self._lock:
+            if self._loaded.is_set() or self._loading:
+                return
+            self._loading = True
+        try:
+            from faster_whisper import WhisperModel
+            cfg = self.config
+            for _ in range(cfg["pool_size"]):
+                self._free.put(WhisperModel(
+                    cfg["model"],
+                    device=cfg["device"],
+                    compute_type=cfg["compute_type"],
+                    cpu_threads=cfg["cpu_threads"],
+                ))
+            print(f"[ASR] Whisper pool ready: {cfg['pool_size']} x {cfg['model']} ({cfg['compute_type']})")
+        except Exception as e:
+            self.error = e
+            print(f"[ASR] Whisper pool load failed: {e}")
+        finally:
+            self._loading = False
+            self._loaded.set()
+
+    def load_async(self):
+        t = threading.Thread(target=self.load, name="whisper-preload", daemon=True)
+        t.start()
+        return t
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        if not self._loaded.is_set():
+            self.load()  # no-op if another thread is already loading
+            self._loaded.wait()
+        if self.error is not None:
+            raise WhisperUnavailable(f"Whisper pool unavailable: {self.error}")
+        model = self._free.get(timeout=timeout)
+        try:
+            yield model
+        finally:
+            self._free.put(model)
+
+    def status(self):
+        return {
+            "loaded": self.loaded,
+            "error": str(self.error) if self.error else None,
+            "free": self._free.qsize(),
+            **self.config,
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_whisper_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WhisperPool()
+        return _pool
+
+
+def preload_whisper(background=True):
+    """Start loading the Whisper pool if faster-whisper is installed."""
+    try:
+        import faster_whisper  # noqa: F401
+    except Exception:
+        return None
+    pool = get_whisper_pool()
+    if background:
+        return pool.load_async()
+    pool.load()
+    return None
+
+
+def transcribe_pcm_or_501(pcm, lang='en', sr=16000, vad_filter=True):
+    """
+    Transcribe 16 kHz mono int16 PCM with the Whisper pool. If unavailable, return 501.
+    Pass vad_filter=False when the audio has already been trimmed to speech.
+    """
+    try:
+        from faster_whisper import WhisperModel
+    except Exception as e:
+        return {'ok': False, 'status': 501, 'error': 'Server ASR not available (faster-whisper not installed).'}
+
+    audio = pcm16_to_float32(pcm)
+    pool = get_whisper_pool()
+    try:
+        with pool.acquire() as model:
+            segments, info = model.transcribe(
+                audio, language=lang, vad_filter=vad_filter,
+                beam_size=pool.config["beam_size"],
+            )
+            tokens = []
+            for seg in segments:
+                words = seg.text.strip().split()
+                # spread the segment's time span over its words (no per-word timestamps needed)
+                step = (seg.end - seg.start) / max(1, len(words))
+                for k, w in enumerate(words):
+                    # Build simple tokens with dummy confidences (whisper python api doesn't expose token conf directly)
+                    tokens.append({'text': w, 'confidence': 0.8,
+                                   'start_ms': round((seg.start + k * step) * 1000.0, 1),
+                                   'end_ms': round((seg.start + (k + 1) * step) * 1000.0, 1)})
+    except WhisperUnavailable as e:
+        return {'ok': False, 'status': 503, 'error': str(e)}
+    except Exception as e:
+        # a real decode failure (e.g. a CTranslate2 shape/dtype error): keep the traceback in the log
+        print(f"[ASR] Whisper decode failed: {type(e).__name__}: {e}")
+        traceback.print_exc()
+        return {'ok': False, 'status': 500, 'error': f"Whisper decode failed: {type(e).__name__}: {e}"}
+
+    return {'ok': True, 'tokens': tokens}
+
 
 def transcribe_blob_or_501(file_storage, lang='en'):
     """ Try to use faster-whisper for server-side ASR. If unavailable, return 501. """
@@ -8,27 +178,7 @@ def transcribe_blob_or_501(file_storage, lang='en'):
     except Exception as e:
         return {'ok': False, 'status': 501, 'error': 'Server ASR not available (faster-whisper not installed).'}
 
-    # Save to temp file
-    fd, tmp = tempfile.mkstemp(suffix='.webm')
-    os.close(fd)
-    file_storage.save(tmp)
-
-    # Init model once (cache in global)
-    global _whisper_model
-    if '_whisper_model' not in globals():
-        device = os.environ.get('ASR_DEVICE', 'cpu')
-        _whisper_model = WhisperModel('base', device=device)
-
-    # Transcribe
-    segments, info = _whisper_model.transcribe(tmp, language=lang, vad_filter=True)
-    tokens = []
-    for seg in segments:
-        tokens.extend(seg.text.strip().split())
-
-    # Build simple tokens with dummy confidences (whisper python api doesn't expose token conf directly)
-    result = {'ok': True, 'tokens': [{'text': t, 'confidence': 0.8} for t in tokens]}
-    try:
-        os.remove(tmp)
-    except Exception:
-        pass
-    return result
\ No newline at end of file
+    pcm = decode_pcm16(file_storage, 16000)
+    if pcm is None:
+        return {'ok': False, 'status': 415, 'error': 'Could not decode uploaded audio.'}
+    return transcribe_pcm_or_501(pcm, lang=lang)
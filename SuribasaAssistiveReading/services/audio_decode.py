@@ -0,0 +1,133 @@
+# services/audio_decode.py
+"""
+Shared decode stage for the ASR engines: upload stream -> 16 kHz mono
+int16 PCM, entirely in memory (no temp files).
+
+ffmpeg is used through pipes when it is on PATH; otherwise we fall back
+to faster-whisper's in-process (PyAV) decoder if that is installed.
+"""
+import os, shutil, subprocess, threading
+
+_READ_BLOCK = 64 * 1024
+
+
+def _ffmpeg_bin():
+    return os.getenv("FFMPEG_BIN") or shutil.which("ffmpeg")
+
+
+def _source_reader(src):
+    """Return a read(n) callable for a FileStorage, file object or bytes-like."""
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        view = memoryview(src)
+        pos = [0]
+
+        def read(n):
+            chunk = view[pos[0]:pos[0] + n]
+            pos[0] += len(chunk)
+            return chunk
+        return read
+    stream = getattr(src, "stream", src)
+    try:
+        stream.seek(0)  # the same upload may be decoded more than once
+    except Exception:
+        pass
+    return stream.read
+
+
+def _decode_ffmpeg(src, sr):
+    ffmpeg = _ffmpeg_bin()
+    if not ffmpeg:
+        return None
+    try:
+        proc = subprocess.Popen(
+            [ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error",
+             "-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(sr), "pipe:1"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+    except OSError as e:  # FFMPEG_BIN missing or not executable: fall back like "no ffmpeg"
+        print(f"[ASR] ffmpeg not runnable ({ffmpeg}): {e}")
+        return None
+    read = _source_reader(src)
+
+    def feed():
+        try:
+            while True:
+                chunk = read(_READ_BLOCK)
+                if not chunk:
+                    break
+                proc.stdin.write(chunk)
+        except (BrokenPipeError, OSError):
+            pass
+        finally:
+            try: proc.stdin.close()
+            except Exception: pass
+
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+
+    pcm = bytearray()
+    while True:
+        chunk = proc.stdout.read(_READ_BLOCK)
+        if not chunk:
+            break
+        pcm += chunk
+    writer.join()
+    err = proc.stderr.read()
+    if proc.wait() != 0:
+        print(f"[ASR] ffmpeg decode failed: {err.decode('utf-8', 'ignore').strip()[:200]}")
+        return None
+    if len(pcm) % 2:
+        del pcm[-1]
+    return memoryview(pcm)
+
+
+def _decode_inprocess(src, sr):
+    try:
+        import numpy as np
+        from io import BytesIO
+        from faster_whisper.audio import decode_audio
+    except Exception:
+        return None
+    read = _source_reader(src)
+    buf = BytesIO()
+    while True:
+        chunk = read(_READ_BLOCK)
+        if not chunk:
+            break
+        buf.write(chunk)
+    buf.seek(0)
+    try:
+        audio = decode_audio(buf, sampling_rate=sr)
+    except Exception as e:
+        print(f"[ASR] in-process decode failed: {e}")
+        return None
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767.0).astype(np.int16)
+    return memoryview(pcm).cast("B")
+
+
+def decode_pcm16(src, sr=16000):
+    """
+    Decode an upload (FileStorage, file object or bytes) to mono s16le PCM.
+    Returns a memoryview over the samples, or None if no decoder is available.
+    """
+    pcm = _decode_ffmpeg(src, sr)
+    if pcm is None:
+        pcm = _decode_inprocess(src, sr)
+    return pcm
+
+
+def iter_frames(pcm, frame_bytes=4000):
+    """Yield consecutive zero-copy memoryview slices of `pcm`."""
+    view = memoryview(pcm)
+    for i in range(0, len(view), frame_bytes):
+        yield view[i:i + frame_bytes]
+
+
+def pcm16_to_float32(pcm):
+    """int16 PCM -> float32 in [-1, 1), the input format Whisper takes."""
+    import numpy as np
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def pcm_duration_sec(pcm, sr=16000):
+    return len(pcm) / 2.0 / float(sr)
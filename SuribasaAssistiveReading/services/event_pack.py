@@ -0,0 +1,137 @@
+# services/event_pack.py
+"""
+Packed per-session word events (WordEventPack.data).
+
+Instead of one WordEvent row per word, a session's events can be stored as
+one blob of typed arrays:
+
+    header   "WEP1", n events, flags, status table, text table size
+    status   uint8   index into the session's status table ("correct", ...)
+    start_ms float32 (NaN = NULL)      end_ms float32 (NaN = NULL)
+    conf     float16 (NaN = NULL)
+    text     uint16/uint32 index into an interned asr_text table (max = NULL)
+    index    int32 word_index, omitted when it is simply 0..n-1
+
+The arrays (and the text table) are zlib-compressed when that is smaller.
+Decoded timings are rounded to 0.1 ms (what the ASR engines produce) and
+confidences to 3 decimals; float32 keeps timings exact at that resolution
+for the first ~17 minutes of a recording (within 0.2 ms up to an hour).
+
+iter_events(blob) yields (word_index, status, start_ms, end_ms, asr_text,
+confidence) tuples lazily, in the same shape as WordEvent rows, so readers
+don't care which storage a session uses.
+"""
+import zlib
+import struct
+
+import numpy as np
+
+MAGIC = b"WEP1"
+_HEAD = struct.Struct("<4sIBHI")  # magic, n, flags, status table bytes, text table bytes
+SEQ_INDEX, ZLIB, WIDE_TEXT = 1, 2, 4
+_ROWS_PER_STEP = 512
+_INT32_MIN, _INT32_MAX = int(np.iinfo(np.int32).min), int(np.iinfo(np.int32).max)
+
+
+def _table(values):
+    """Interned list and per-value indices."""
+    ids = {}
+    idx = [ids.setdefault(v, len(ids)) for v in values]
+    return list(ids), idx
+
+
+def pack_events(events):
+    """
+    Blob for an iterable of (word_index, status, start_ms, end_ms, asr_text,
+    confidence) tuples, in the order they should be read back. Raises
+    ValueError for events the format can't hold (over 255 distinct statuses,
+    a word_index outside int32).
+    """
+    cols = list(zip(*events)) or [()] * 6
+    word_index, status, start, end, text, conf = cols
+    n = len(word_index)
+    flags = 0
+
+    statuses, status_idx = _table(status)
+    if len(statuses) > 255:
+        raise ValueError("more than 255 distinct statuses")
+    texts, text_idx = _table(text)
+    null_text = texts.index(None) if None in texts else None
+    if null_text is not None:
+        texts[null_text] = ""
+    wide = len(texts) >= 0xFFFF
+    flags |= WIDE_TEXT if wide else 0
+    tdtype = np.uint32 if wide else np.uint16
+    tidx = np.array(text_idx, dtype=tdtype)
+    if null_text is not None:
+        tidx[tidx == null_text] = np.iinfo(tdtype).max
+
+    def floats(values, dtype):
+        return np.array([np.nan if v is None else v for v in values], dtype=dtype)
+
+    if n and not (_INT32_MIN <= min(word_index) and max(word_index) <= _INT32_MAX):
+        raise ValueError("word_index outside the int32 range")
+    windex = np.array(word_index, dtype=np.int32)
+    parts = [np.array(status_idx, dtype=np.uint8).tobytes(), floats(start, np.float32).tobytes(),
+             floats(end, np.float32).tobytes(), floats(conf, np.float16).tobytes(), tidx.tobytes()]
+    if np.array_equal(windex, np.arange(n, dtype=np.int32)):
+        flags |= SEQ_INDEX
+    else:
+        parts.append(windex.tobytes())
+
+    # tables are NUL-separated
+    status_blob = "\0".join(s.replace("\0", "") for s in statuses).encode("utf-8")
+    text_blob = "\0".join(t.replace("\0", "") for t in texts).encode("utf-8")
+    body = status_blob + text_blob + b"".join(parts)
+    packed = zlib.compress(body, 6)
+    if len(packed) < len(body):
+        body, flags = packed, flags | ZLIB
+    return _HEAD.pack(MAGIC, n, flags, len(status_blob), len(text_blob)) + body
+
+
+def unpack_events(blob):
+    """Column arrays of a blob: dict of word_index, status, start_ms, end_ms, asr_text, confidence (+ tables)."""
+    magic, n, flags, sb, tb = _HEAD.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("not a packed word-event blob")
+    body = memoryview(blob)[_HEAD.size:]
+    if flags & ZLIB:
+        body = memoryview(zlib.decompress(body))
+    statuses = bytes(body[:sb]).decode("utf-8").split("\0") if n else []
+    texts = bytes(body[sb:sb + tb]).decode("utf-8").split("\0") if n else []
+    pos = sb + tb
+
+    def take(dtype):
+        nonlocal pos
+        a = np.frombuffer(body, dtype=dtype, count=n, offset=pos)
+        pos += a.nbytes
+        return a
+
+    status = take(np.uint8)
+    start, end, conf = take(np.float32), take(np.float32), take(np.float16)
+    text = take(np.uint32 if flags & WIDE_TEXT else np.uint16)
+    word_index = np.arange(n, dtype=np.int32) if flags & SEQ_INDEX else take(np.int32)
+    return {"n": n, "word_index": word_index, "status": status, "statuses": statuses, "start_ms": start,
+            "end_ms": end, "confidence": conf, "asr_text": text, "texts": texts}
+
+
+def _nullable(a, digits):
+    # rounded back to the stored precision, so 412.3 doesn't come out as 412.29998779296875
+    return [None if v != v else v for v in np.round(a.astype(np.float64), digits).tolist()]  # NaN -> None
+
+
+def iter_events(blob):
+    """(word_index, status, start_ms, end_ms, asr_text, confidence) tuples, decoded a slice at a time."""
+    cols = unpack_events(blob)
+    statuses, texts = cols["statuses"], cols["texts"]
+    null_text = np.iinfo(cols["asr_text"].dtype).max
+    for a in range(0, cols["n"], _ROWS_PER_STEP):
+        b = a + _ROWS_PER_STEP
+        yield from zip(
+            cols["word_index"][a:b].tolist(),
+            (statuses[k] for k in cols["status"][a:b].tolist()),
+            _nullable(cols["start_ms"][a:b], 1),
+            _nullable(cols["end_ms"][a:b], 1),
+            (None if k == null_text else texts[k] for k in cols["asr_text"][a:b].tolist()),
+            _nullable(cols["confidence"][a:b], 3),
+        )
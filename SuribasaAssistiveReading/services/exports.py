@@ -0,0 +1,163 @@
+# services/exports.py
+"""
+Streaming exports of saved sessions and word events (`GET /api/export`,
+`flask export-sessions`, and the per-session CSV).
+
+Rows are read with Core selects and yield_per, so the database driver hands
+them over in batches instead of materializing the result; each batch is
+encoded (CSV or NDJSON) into one chunk and, optionally, pushed through a
+gzip stream (zlib, wbits=31). Memory stays flat however many sessions match.
+
+kind="sessions" gives one row per session (identity, timing, comprehension
+and the stored summary columns); kind="events" one row per WordEvent of the
+matching sessions. NDJSON sessions can carry their events inline
+(with_events), merged from two id-ordered streams rather than a lookup per
+session. Sessions whose events are packed (WordEventPack) are decoded lazily
+and merged into the event stream in session order; their WordEvent rows, if
+any are left, are not read.
+"""
+import io
+import csv
+import json
+import zlib
+import heapq
+from datetime import datetime
+from operator import itemgetter
+
+from sqlalchemy import select
+
+from models import db, Session, WordEvent, WordEventPack, Passage
+from services.event_pack import iter_events
+from services.scoring import SUMMARY_COLUMNS
+from services.session_rows import filter_conditions
+
+KINDS = ("sessions", "events")
+FORMATS = ("csv", "ndjson")
+YIELD_PER = 1000
+
+SESSION_COLUMNS = ("id", "surname", "first_name", "middle_initial", "grade_level", "section",
+                   "passage_id", "passage_title", "started_at", "duration_sec", "wcpm", "accuracy",
+                   "comprehension_correct", "comprehension_total") + SUMMARY_COLUMNS
+EVENT_COLUMNS = ("session_id", "word_index", "status", "start_ms", "end_ms", "asr_text", "confidence")
+
+_SESSION_SELECT = [getattr(Session, c) for c in SESSION_COLUMNS if c != "passage_title"]
+_SESSION_SELECT.insert(SESSION_COLUMNS.index("passage_title"), Passage.title)
+_EVENT_SELECT = [getattr(WordEvent, c) for c in EVENT_COLUMNS]
+
+
+def _stream(q, yield_per=YIELD_PER):
+    return db.session.execute(q.execution_options(yield_per=yield_per, stream_results=True))
+
+
+def session_rows(filters):
+    """(SESSION_COLUMNS tuple, ...) of matching sessions in id order, streamed."""
+    q = (select(*_SESSION_SELECT)
+         .outerjoin(Passage, Passage.id == Session.passage_id)
+         .where(*filter_conditions(filters))
+         .order_by(Session.id))
+    return _stream(q)
+
+
+def _unpacked(packs):
+    for sid, data in packs:
+        for ev in iter_events(data):
+            yield (sid, *ev)
+
+
+def event_rows(filters, session_id=None):
+    """(EVENT_COLUMNS tuple, ...) of matching sessions' word events, by session then word, streamed."""
+    # a session with a pack is read from it alone (rows kept by `pack-word-events --keep-rows` are skipped)
+    q = (select(*_EVENT_SELECT)
+         .where(~select(WordEventPack.session_id).where(WordEventPack.session_id == WordEvent.session_id).exists())
+         .order_by(WordEvent.session_id, WordEvent.word_index))
+    pq = select(WordEventPack.session_id, WordEventPack.data).order_by(WordEventPack.session_id)
+    if session_id is not None:
+        q = q.where(WordEvent.session_id == session_id)
+        pq = pq.where(WordEventPack.session_id == session_id)
+    else:
+        conds = filter_conditions(filters)
+        if conds:
+            q = q.join(Session, Session.id == WordEvent.session_id).where(*conds)
+            pq = pq.join(Session, Session.id == WordEventPack.session_id).where(*conds)
+    # a pack holds a whole session's events, so fetch fewer of them at a time
+    return heapq.merge(_stream(q), _unpacked(_stream(pq, yield_per=64)), key=itemgetter(0))
+
+
+# ----------------- encoders -----------------
+def _plain(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+
+def csv_chunks(header, rows, batch=YIELD_PER):
+    """CSV text in chunks of `batch` rows; None is written as an empty cell."""
+    buf = io.StringIO(newline="")
+    w = csv.writer(buf)
+    w.writerow(header)
+    n = 0
+    for row in rows:
+        w.writerow(["" if v is None else _plain(v) for v in row])
+        n += 1
+        if n % batch == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def ndjson_chunks(header, rows, batch=YIELD_PER, events=None):
+    """One JSON object per row; with `events` (an event_rows stream), sessions get their events inline."""
+    ev_iter = iter(events) if events is not None else None
+    pending = next(ev_iter, None) if ev_iter else None
+    out = []
+    for row in rows:
+        obj = {k: _plain(v) for k, v in zip(header, row)}
+        if ev_iter is not None:
+            # both streams are ordered by session id; skip events of sessions filtered out
+            sid, evs = obj["id"], []
+            while pending is not None and pending[0] <= sid:
+                if pending[0] == sid:
+                    evs.append(dict(zip(EVENT_COLUMNS[1:], pending[1:])))
+                pending = next(ev_iter, None)
+            obj["events"] = evs
+        out.append(json.dumps(obj, ensure_ascii=False))
+        if len(out) == batch:
+            yield "\n".join(out) + "\n"
+            out = []
+    if out:
+        yield "\n".join(out) + "\n"
+
+
+def gzip_chunks(chunks, level=6):
+    """Encode text chunks as UTF-8 and gzip them as a stream."""
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = z.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield z.flush()
+
+
+def encoded(chunks, gzip=False):
+    if gzip:
+        return gzip_chunks(chunks)
+    return (c.encode("utf-8") for c in chunks)
+
+
+def export_chunks(kind="sessions", fmt="csv", filters=None, with_events=False, gzip=False):
+    """Byte chunks of a bulk export (see module docstring)."""
+    filters = filters or {}
+    if kind == "events":
+        header, rows = EVENT_COLUMNS, event_rows(filters)
+    else:
+        header, rows = SESSION_COLUMNS, session_rows(filters)
+    if fmt == "ndjson":
+        # events need their own query running alongside the sessions one
+        events = event_rows(filters) if with_events and kind == "sessions" else None
+        chunks = ndjson_chunks(header, rows, events=events)
+    else:
+        chunks = csv_chunks(header, rows)
+    return encoded(chunks, gzip)
+
+
+def export_filename(kind, fmt, gzip=False):
+    return f"{kind}_{datetime.now().strftime('%Y%m%d')}.{fmt}" + (".gz" if gzip else "")
@@ -0,0 +1,38 @@
+# services/long_poll.py
+"""
+Bounded long-polling for job status endpoints (ASR jobs, report batches).
+
+A long-poll parks a request thread until the job finishes or the wait runs
+out. The web tier has only a few request threads (the Procfile runs one
+gthread worker with 8), so at most LONG_POLL_WAITERS requests may be parked
+at any moment; any other poll answers straight away and the client comes
+back after POLL_INTERVAL_SEC (sent as Retry-After). Keep LONG_POLL_WAITERS
+well below the worker's --threads so logins and page loads always find a
+free thread.
+"""
+import os
+import threading
+
+
+def _int_env(name, default):
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+MAX_WAITERS = max(0, _int_env("LONG_POLL_WAITERS", 2))
+POLL_INTERVAL_SEC = 1
+_waiters = threading.BoundedSemaphore(MAX_WAITERS) if MAX_WAITERS else None
+
+
+def wait(event, seconds):
+    """Wait up to `seconds` for `event` if a waiter slot is free; returns event.is_set()."""
+    if event.is_set() or seconds <= 0 or _waiters is None:
+        return event.is_set()
+    if not _waiters.acquire(blocking=False):
+        return False
+    try:
+        return event.wait(seconds)
+    finally:
+        _waiters.release()
@@ -0,0 +1,146 @@
+# services/phonetics.py
+"""
+Python port of static/js/phonetics.js (Soundex + lite Metaphone + reversal).
+Kept behaviour-identical to the browser so server and client classify
+miscues the same way; change both together.
+
+phonetic_index(words) precomputes norm / Soundex / metaphone-lite codes for
+a passage once (stored on Passage.phonetic_json); the predicates accept a
+word's precomputed codes so per-substitution checks become lookups.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+_APOS = re.compile("[\u2018\u2019\u201b\u201a`\u00b4]")
+_DQUOTE = re.compile("[\u201c\u201d\u201f\u201e]")
+_DASH = re.compile("[\u2010-\u2015]")
+_COMBINING = re.compile("[\u0300-\u036f]")
+_NON_WORD = re.compile(r"[^a-z0-9']")
+_REPEATS = re.compile(r"([a-z0-9'])\1+")
+_SPACES = re.compile(r"\s+")
+_EDGE_APOS = re.compile(r"^'|'+\Z")
+
+
+def ascii_fold(s):
+    s = unicodedata.normalize("NFD", str(s or ""))
+    s = _COMBINING.sub("", s)
+    s = _APOS.sub("'", s)
+    s = _DQUOTE.sub('"', s)
+    return _DASH.sub("-", s)
+
+
+def collapse_repeats(s):
+    return _REPEATS.sub(r"\1", s)
+
+
+def norm(s):
+    """Letters, digits and inner apostrophes; lower-case; no spaces."""
+    return _norm(str(s or ""))
+
+
+@lru_cache(maxsize=65536)
+def _norm(s):
+    t = collapse_repeats(_NON_WORD.sub(" ", ascii_fold(s.lower())))
+    return _EDGE_APOS.sub("", _SPACES.sub("", t))
+
+
+_SOUNDEX = {}
+for _letters, _code in (("bfpv", 1), ("cgjkqsxz", 2), ("dt", 3), ("l", 4), ("mn", 5), ("r", 6)):
+    for _ch in _letters:
+        _SOUNDEX[_ch] = _code
+
+
+def soundex(s):
+    s = norm(s)
+    if not s:
+        return ""
+    code, prev = s[0].upper(), _SOUNDEX.get(s[0], 0)
+    for ch in s[1:]:
+        c = _SOUNDEX.get(ch, 0)
+        if c != 0 and c != prev:
+            code += str(c)
+        prev = c
+    return (code + "000")[:4]
+
+
+_META_RULES = [(re.compile(p), r) for p, r in (
+    (r"^kn", "n"), (r"^gn", "n"), (r"^pn", "n"), (r"^wr", "r"), (r"^ps", "s"),
+    (r"ph", "f"), (r"gh(?![aeiou])", "h"), (r"mb\Z", "m"),
+    (r"cq", "k"), (r"q", "k"), (r"x", "ks"),
+)]
+_VOWELS = re.compile(r"[aeiouy]")
+
+
+def metaphone_lite(s):
+    s = norm(s)
+    if not s:
+        return ""
+    for pat, rep in _META_RULES:
+        s = pat.sub(rep, s)
+    return collapse_repeats(s[0] + _VOWELS.sub("", s[1:]))
+
+
+def levenshtein(a, b):
+    if a == b:
+        return 0
+    if not a:
+        return len(b)
+    if not b:
+        return len(a)
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+def is_phonetic_match(a, b, codes=None):
+    """
+    True if two words are likely the same by sound (mispronunciation bucket).
+    codes: optional precomputed {n, sx, mp} for `a` (see phonetic_index).
+    """
+    A, B = (codes["n"] if codes else norm(a)), norm(b)
+    if not A or not B:
+        return False
+    if A == B:
+        return True
+    sx, mp = (codes["sx"], codes["mp"]) if codes else (soundex(A), metaphone_lite(A))
+    if sx == soundex(B) or mp == metaphone_lite(B):
+        return True
+    d = levenshtein(A, B)
+    if min(len(A), len(B)) <= 4:
+        return d <= 1
+    return d <= 2 and A[0] == B[0]
+
+
+def is_reversal(tgt, hyp, codes=None):
+    """'saw' <-> 'was'."""
+    t, h = (codes["n"] if codes else norm(tgt)), norm(hyp)
+    return len(t) > 2 and h == t[::-1]
+
+
+PHONETIC_INDEX_VERSION = 1
+
+
+def phonetic_index(words):
+    """
+    Parallel per-token code lists for a tokenized passage:
+    {"v", "n": [...], "sx": [...], "mp": [...]}; punctuation gets "".
+    """
+    ns = [norm(w) for w in words]
+    return {"v": PHONETIC_INDEX_VERSION, "n": ns,
+            "sx": [soundex(n) if n else "" for n in ns],
+            "mp": [metaphone_lite(n) if n else "" for n in ns]}
+
+
+def index_codes(index, n_words):
+    """(n, sx, mp) lists from a stored index, or None if it doesn't fit the passage."""
+    if not isinstance(index, dict) or index.get("v") != PHONETIC_INDEX_VERSION:
+        return None
+    cols = [index.get(k) for k in ("n", "sx", "mp")]
+    if not all(isinstance(c, list) and len(c) == n_words for c in cols):
+        return None
+    return cols
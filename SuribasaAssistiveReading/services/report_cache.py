@@ -0,0 +1,123 @@
+# services/report_cache.py
+"""
+On-disk cache of rendered session reports.
+
+Key = report layout version + session id + the session's updated_at stamp,
+which every write that changes what a report shows bumps (saving the
+session, comprehension updates, passage word-count changes, re-scoring).
+The key doubles as the response ETag, so a repeat download with a matching
+If-None-Match is answered 304 from one indexed column read, and any other
+repeat download is a file read; ReportLab only runs for a new version.
+
+Files live in REPORT_CACHE_DIR, one directory per session. Total size is
+kept under REPORT_CACHE_MB by evicting the least recently served files; a
+new version of a session's report replaces the old one.
+"""
+import os
+import tempfile
+import threading
+
+from services.reports import REPORT_LAYOUT
+
+
+def report_etag(session_id, updated_at):
+    stamp = int(updated_at.timestamp() * 1000000) if updated_at else 0
+    return f"r{REPORT_LAYOUT}-{session_id}-{stamp}"
+
+
+class ReportCache:
+    def __init__(self, path, max_bytes=200 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(path, exist_ok=True)
+        self._size = sum(os.path.getsize(f) for f in self._files())
+
+    def _files(self):
+        for d in os.scandir(self.path):
+            if d.is_dir():
+                for e in os.scandir(d.path):
+                    if e.name.endswith(".pdf"):
+                        yield e.path
+
+    def _dir(self, session_id):
+        return os.path.join(self.path, str(int(session_id)))
+
+    def get(self, session_id, etag):
+        """Path of the cached PDF, or None."""
+        f = os.path.join(self._dir(session_id), f"{etag}.pdf")
+        try:
+            os.utime(f)  # mtime = last served, for LRU eviction
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return f
+
+    def put(self, session_id, etag, data):
+        """Store a rendered PDF, replacing older versions of the session's report; returns its path."""
+        d = self._dir(session_id)
+        os.makedirs(d, exist_ok=True)
+        f = os.path.join(d, f"{etag}.pdf")
+        fd, tmp = tempfile.mkstemp(dir=d, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        with self._lock:
+            if os.path.exists(f):
+                self._size -= os.path.getsize(f)
+            os.replace(tmp, f)  # atomic, so readers never see a partial file
+            self._size += len(data)
+            for e in os.scandir(d):
+                if e.path != f and e.name.endswith(".pdf"):
+                    self._remove(e.path)
+            if self._size > self.max_bytes:
+                self._evict(keep=f)
+        return f
+
+    def discard(self, session_id):
+        d = self._dir(session_id)
+        with self._lock:
+            if os.path.isdir(d):
+                for e in os.scandir(d):
+                    self._remove(e.path)
+
+    def _remove(self, f):
+        try:
+            size = os.path.getsize(f)
+            os.remove(f)
+        except OSError:
+            return
+        if f.endswith(".pdf"):
+            self._size -= size
+
+    def _evict(self, keep=None):
+        # down to 90% so eviction (a full scan) doesn't run on every put
+        for _, f in sorted((os.path.getmtime(f), f) for f in self._files()):
+            if self._size <= self.max_bytes * 0.9:
+                break
+            if f != keep:
+                self._remove(f)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {"bytes": self._size, "max_bytes": self.max_bytes, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+
+def _int_env(name, default):
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+reports = ReportCache(
+    (os.getenv("REPORT_CACHE_DIR") or "").strip() or os.path.join(tempfile.gettempdir(), "report_cache"),
+    max_bytes=_int_env("REPORT_CACHE_MB", 200) * 1024 * 1024,
+)
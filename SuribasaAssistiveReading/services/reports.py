@@ -0,0 +1,250 @@
+# services/reports.py
+"""
+Session PDF reports: the single-session download and batch class reports.
+
+render_report(row) draws one report from a session_row() dict (no database
+access, so it runs in worker processes too). Batch reports render every
+session matching the /results filters across a process pool and collect the
+PDFs into a ZIP, or draw them as pages of one merged PDF; the job runs in
+the background and is polled for progress, like the ASR jobs.
+
+A single ReportLab canvas can't be split across processes, so a merged PDF
+is drawn by one worker; the ZIP is what spreads over the pool.
+"""
+import os
+import re
+import time
+import uuid
+import shutil
+import zipfile
+import tempfile
+import threading
+import multiprocessing as mp
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+FORMATS = ("zip", "pdf")
+REPORT_LAYOUT = 1  # bump when the report drawing changes, so cached PDFs are re-rendered
+CHUNK = 16  # reports per pool task
+STATUS_WAIT_SEC = 5.0  # longest one batch status poll waits (how many may: services/long_poll.py)
+
+
+def fmt_mmss(sec: float) -> str:
+    sec = max(0, int(round(sec or 0)))
+    m, s = divmod(sec, 60)
+    return f"{m:d}:{s:02d}"
+
+
+def _draw(c, row):
+    width, height = letter
+
+    y = height - 50
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(50, y, "Reading Session Report"); y -= 28
+
+    c.setFont("Helvetica", 12)
+    c.drawString(50, y, f"Student: {row['student_name']}"); y -= 18
+    c.drawString(50, y, f"Grade Level: {row['grade_level'] or '—'}"); y -= 18
+    c.drawString(50, y, f"Words: {row['words']}"); y -= 18
+    c.drawString(50, y, f"Time: {fmt_mmss(row['duration_sec'])}"); y -= 28
+
+    c.setFont("Helvetica-Bold", 13)
+    c.drawString(50, y, "Miscues (Frequency)"); y -= 20
+
+    c.setFont("Helvetica", 12)
+    line_gap = 16
+    fields = [
+        ("Mispronunciations", row["mispronunciations"]),
+        ("Omissions", row["omissions"]),
+        ("Substitutions", row["substitutions"]),
+        ("Insertions", row["insertions"]),
+        ("Repetitions", row["repetitions"]),
+        ("Transpositions", row["transpositions"]),
+        ("Reversals", row["reversals"]),
+    ]
+    for label, val in fields:
+        c.drawString(60, y, f"{label}: {val}")
+        y -= line_gap
+
+    c.showPage()
+
+
+def render_report(row):
+    """PDF bytes for one session_row() dict."""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    _draw(c, row)
+    c.save()
+    return buffer.getvalue()
+
+
+def render_merged(rows):
+    """One PDF with a page per row."""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    for row in rows:
+        _draw(c, row)
+    c.save()
+    return buffer.getvalue()
+
+
+def _render_chunk(rows):
+    return [(row["id"], report_name(row), render_report(row)) for row in rows]
+
+
+def report_name(row):
+    """File name inside a batch ZIP: grade_surname_first_id.pdf."""
+    parts = [row.get("grade_level"), row.get("surname"), row.get("first_name"), str(row["id"])]
+    name = "_".join(re.sub(r"[^A-Za-z0-9-]+", "-", str(p)).strip("-") for p in parts if p)
+    return f"{name or row['id']}.pdf"
+
+
+# ----------------- batch jobs -----------------
+class BatchBusy(Exception):
+    pass
+
+
+class ReportBatch:
+    def __init__(self, rows, fmt="zip", owner=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.fmt = fmt
+        self.rows = rows
+        self.total = len(rows)
+        self.rendered = 0
+        self.state = "queued"        # queued | running | done | error
+        self.error = None
+        self.path = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    @property
+    def filename(self):
+        return f"reports_{time.strftime('%Y%m%d', time.localtime(self.created))}.{self.fmt}"
+
+    def to_dict(self):
+        d = {"job_id": self.id, "state": self.state, "format": self.fmt,
+             "total": self.total, "rendered": self.rendered}
+        if self.started:
+            d["queued_ms"] = round((self.started - self.created) * 1000.0, 1)
+        if self.finished and self.started:
+            d["run_ms"] = round((self.finished - self.started) * 1000.0, 1)
+        if self.error:
+            d["error"] = self.error
+        return d
+
+
+class ReportBatches:
+    """Background batch jobs sharing one process pool (spawned on first use)."""
+
+    def __init__(self, workers=None, max_jobs=2, max_sessions=2000, ttl=1800):
+        self.workers = max(1, workers or min(4, os.cpu_count() or 1))
+        self.max_jobs = max(1, max_jobs)
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._runner = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="report-batch")
+        self._pool = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._dir = None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: the parent holds DB connections and server threads
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"))
+            return self._pool
+
+    def _workdir(self):
+        with self._lock:
+            if self._dir is None:
+                self._dir = tempfile.mkdtemp(prefix="report_batches_")
+            return self._dir
+
+    def _sweep(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            old = [k for k, j in self._jobs.items() if j.finished and j.finished < cutoff]
+            gone = [self._jobs.pop(k) for k in old]
+        for j in gone:
+            if j.path and os.path.exists(j.path):
+                os.remove(j.path)
+
+    def submit(self, rows, fmt="zip", owner=None):
+        """Queue a batch of session_row() dicts. Raises BatchBusy when max_jobs are unfinished."""
+        self._sweep()
+        with self._lock:
+            if sum(1 for j in self._jobs.values() if not j.finished) >= self.max_jobs:
+                raise BatchBusy("Too many report batches running")
+            job = ReportBatch(rows, fmt, owner)
+            self._jobs[job.id] = job
+        self._runner.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        job.state, job.started = "running", time.time()
+        path = os.path.join(self._workdir(), f"{job.id}.{job.fmt}")
+        try:
+            pool = self._get_pool()
+            if job.fmt == "pdf":
+                data = pool.submit(render_merged, job.rows).result()
+                with open(path, "wb") as fh:
+                    fh.write(data)
+                job.rendered = job.total
+            else:
+                chunks = [job.rows[k:k + CHUNK] for k in range(0, job.total, CHUNK)]
+                # PDFs are already compressed; store them as they are
+                with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as zf:
+                    for f in as_completed([pool.submit(_render_chunk, c) for c in chunks]):
+                        for _, name, data in f.result():
+                            zf.writestr(name, data)
+                            job.rendered += 1
+            job.path, job.state = path, "done"
+        except Exception as e:
+            job.error, job.state = f"{type(e).__name__}: {e}", "error"
+            if os.path.exists(path):
+                os.remove(path)
+        finally:
+            job.rows = None
+            job.finished = time.time()
+            job.done.set()
+
+    def get(self, job_id, owner=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def stats(self):
+        with self._lock:
+            states = [j.state for j in self._jobs.values()]
+        return {"workers": self.workers, "max_jobs": self.max_jobs, "running": states.count("running"),
+                "queued": states.count("queued"), "pool_started": self._pool is not None}
+
+    def shutdown(self):
+        self._runner.shutdown(wait=True)
+        if self._pool is not None:
+            self._pool.shutdown()
+        if self._dir:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def _int_env(name, default):
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+batches = ReportBatches(
+    workers=_int_env("REPORT_WORKERS", 0) or None,
+    max_jobs=_int_env("REPORT_BATCH_JOBS", 2),
+    max_sessions=_int_env("REPORT_BATCH_MAX_SESSIONS", 2000),
+    ttl=_int_env("REPORT_BATCH_TTL", 1800),
+)
@@ -0,0 +1,265 @@
+# services/rescoring.py
+"""
+Bulk re-scoring of saved sessions (`flask rescore-sessions`).
+
+Sessions are walked in id order, batch_size at a time. For each batch the
+WordEvent rows of the whole id range come back in one Core query as
+(session_id, status code) pairs, are counted per session with a single
+np.bincount, and the counts, accuracy, WCPM and levels are recomputed as
+arrays. Only misread/skipped rows are fetched with their text. Results are written back with one bulk
+UPDATE and committed per batch, so an interrupted run keeps what it did.
+
+What the stored events support:
+  * omissions, accuracy and WCPM come from the per-word statuses;
+  * misread words are re-typed (mispronunciation / substitution / reversal /
+    transposition) with the current rules only when every misread word of
+    the session has its asr_text; otherwise the saved split is kept;
+  * insertions and repetitions aren't tied to passage words, so they're kept.
+Sessions whose events are packed (WordEventPack) are read from their blobs
+only; any WordEvent rows they still have are ignored.
+The Session summary columns (services.scoring.SUMMARY_COLUMNS) are refreshed
+in the same UPDATE.
+
+summarize_sessions() only rewrites the summary columns from errors_json and
+the comprehension score, without looking at word events (startup backfill,
+passage edits).
+"""
+import json
+import time
+from datetime import datetime
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import select, update, case
+
+from models import db, Session, WordEvent, WordEventPack, Passage
+from services.event_pack import unpack_events
+from services.alignment import refine_substitutions
+from services.scoring import (MISCUE_KEYS, EVENT_KEYS, WCPM_ERROR_KEYS, STATUS_CODE, SUMMARY_COLUMNS,
+                              miscue_counts, comp_pct, summarize, status_code_counts, word_reading_scores,
+                              word_levels, comp_levels, reading_profiles)
+
+_WCPM_COLS = [MISCUE_KEYS.index(k) for k in WCPM_ERROR_KEYS]
+_STATUS_SQL = case(STATUS_CODE, value=WordEvent.status, else_=0)  # unknown -> pending
+_RETYPED = ("mispronunciations", "substitutions", "reversals", "transpositions")
+
+
+def _retype(tokens, events):
+    """Counts of the re-typed misread buckets, or None if the events can't support it."""
+    typed = []
+    for idx, status, asr in events:
+        if status == "skipped":
+            typed.append({"type": "omission", "i": idx})
+        elif status == "misread":
+            if not asr or idx is None or not 0 <= idx < len(tokens):
+                return None
+            typed.append({"type": "S?", "i": idx, "target": tokens[idx], "hyp": asr})
+    refine_substitutions(typed)
+    out = dict.fromkeys(_RETYPED, 0)
+    for e in typed:
+        key = EVENT_KEYS.get(e["type"])
+        if key in out:
+            out[key] += 1
+    return out
+
+
+def _pack_misreads(cols):
+    """(word_index, status, asr_text) of a packed session's misread/skipped words, in word order."""
+    table = cols["statuses"]
+    wanted = [k for k, st in enumerate(table) if st in ("misread", "skipped")]
+    null_text = np.iinfo(cols["asr_text"].dtype).max
+    out = []
+    for k in np.flatnonzero(np.isin(cols["status"], wanted)).tolist():
+        t = int(cols["asr_text"][k])
+        out.append((int(cols["word_index"][k]), table[cols["status"][k]], None if t == null_text else cols["texts"][t]))
+    return out
+
+
+def _load_errors(raw):
+    try:
+        errs = json.loads(raw or "{}")
+    except ValueError:
+        errs = {}
+    return errs if isinstance(errs, dict) else {}
+
+
+def _summaries(miscues, words_total, comp):
+    """SUMMARY_COLUMNS tuples for (n, len(MISCUE_KEYS)) miscues, word counts and (correct, total) pairs."""
+    totals = miscues.sum(axis=1)
+    scores = word_reading_scores(words_total, totals)
+    pcts = [comp_pct(c, t) for c, t in comp]
+    comp_lv = comp_levels(np.array([np.nan if p is None else p for p in pcts], dtype=np.float64))
+    word_lv = word_levels(scores)
+    profiles = reading_profiles(comp_lv, word_lv)
+    return [(*m, total, words, None if np.isnan(score) else int(score), wl, pct, cl, prof)
+            for m, total, words, score, wl, pct, cl, prof in zip(
+                miscues.tolist(), totals.tolist(), words_total.tolist(), scores.tolist(),
+                word_lv.tolist(), pcts, comp_lv.tolist(), profiles.tolist())]
+
+
+def rescore_batch(rows, passage_words):
+    """
+    Recompute one batch. rows: (id, passage_id, errors_json, duration_sec, accuracy, wcpm,
+    comprehension_correct, comprehension_total, *stored SUMMARY_COLUMNS) sorted by id.
+    Returns (updates, stats) where updates are dicts for a bulk UPDATE.
+    """
+    n = len(rows)
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+    in_batch = WordEvent.session_id.between(int(ids[0]), int(ids[-1]))
+    # Core rows, not ORM ones: at hundreds of thousands of events the wrapping dominates
+    conn = db.session.connection()
+    pairs = conn.execute(select(WordEvent.session_id, _STATUS_SQL).where(in_batch)).all()
+    flat = np.fromiter(chain.from_iterable(pairs), dtype=np.int64, count=2 * len(pairs)).reshape(-1, 2)
+    # sessions stored as packed blobs: map each pack's status table onto STATUS_CODE
+    packs = [(sid, unpack_events(data)) for sid, data in conn.execute(
+        select(WordEventPack.session_id, WordEventPack.data)
+        .where(WordEventPack.session_id.between(int(ids[0]), int(ids[-1]))))]
+    packed = {sid for sid, _ in packs}
+    if packs:
+        # a pack wins over rows left behind by `pack-word-events --keep-rows`
+        flat = flat[~np.isin(flat[:, 0], np.fromiter(packed, dtype=np.int64, count=len(packed)))]
+        flat = np.concatenate([flat] + [
+            np.column_stack((np.full(c["n"], sid, dtype=np.int64),
+                             np.array([STATUS_CODE.get(st, 0) for st in c["statuses"]], dtype=np.int64)[c["status"]]))
+            for sid, c in packs])
+    ev_row = np.minimum(np.searchsorted(ids, flat[:, 0]), n - 1)
+    known = ids[ev_row] == flat[:, 0]  # drop events whose session row is gone
+    counts = status_code_counts(ev_row[known], flat[known, 1], n)
+    has_events = counts.sum(axis=1) > 0
+    correct = counts[:, STATUS_CODE["correct"]]
+    attempted = correct + counts[:, STATUS_CODE["misread"]] + counts[:, STATUS_CODE["skipped"]]
+
+    # stored vs. recomputed miscue matrices, (n, len(MISCUE_KEYS))
+    errs = [_load_errors(r[2]) for r in rows]
+    old = np.array([[c[k] for k in MISCUE_KEYS] for c in map(miscue_counts, errs)], dtype=np.int64).reshape(n, -1)
+    new = old.copy()
+    om = MISCUE_KEYS.index("omissions")
+    new[:, om] = np.where(has_events, counts[:, STATUS_CODE["skipped"]], old[:, om])
+
+    # re-type misreads only where every misread word kept its ASR text (plain Python, few rows)
+    by_session = {}
+    for sid, idx, status, asr in conn.execute(
+            select(WordEvent.session_id, WordEvent.word_index, WordEvent.status, WordEvent.asr_text)
+            .where(in_batch, WordEvent.status.in_(("misread", "skipped")))
+            .order_by(WordEvent.session_id, WordEvent.word_index)):
+        if sid not in packed:
+            by_session.setdefault(sid, []).append((idx, status, asr))
+    for sid, c in packs:
+        by_session.setdefault(sid, []).extend(_pack_misreads(c))
+    retyped = 0
+    for sid, evs in by_session.items():
+        k = int(np.searchsorted(ids, sid))
+        if k >= n or ids[k] != sid or not any(st == "misread" for _, st, _ in evs):
+            continue
+        tokens = (passage_words(rows[k][1]) or ([], 0))[0]
+        split = _retype(tokens, evs)
+        if split is not None:
+            for key, v in split.items():
+                new[k, MISCUE_KEYS.index(key)] = v
+            retyped += 1
+
+    words_total = np.array([(passage_words(r[1]) or ([], 0))[1] for r in rows], dtype=np.int64)
+    old_levels = word_levels(word_reading_scores(words_total, old.sum(axis=1)))
+    new_levels = word_levels(word_reading_scores(words_total, new.sum(axis=1)))
+
+    duration = np.array([float(r[3] or 0) for r in rows])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accuracy = np.where(attempted > 0, correct / attempted * 100.0, 0.0)
+        wcpm = (attempted - new[:, _WCPM_COLS].sum(axis=1)) / (duration / 60.0)
+    stored_acc = np.array([float(r[4] or 0) for r in rows])
+    stored_wcpm = np.array([float(r[5] or 0) for r in rows])
+    accuracy = np.where(has_events, accuracy, stored_acc)
+    wcpm = np.where(has_events & (duration > 0), wcpm, stored_wcpm)
+
+    scored = (has_events & ((new != old).any(axis=1) | ~np.isclose(accuracy, stored_acc)
+                            | ~np.isclose(wcpm, stored_wcpm)))
+    summaries = _summaries(new, words_total, [(r[6], r[7]) for r in rows])
+    stale = np.array([tuple(r[8:]) != sm for r, sm in zip(rows, summaries)], dtype=bool)
+    updates, now = [], datetime.utcnow()
+    for k in np.flatnonzero(scored | stale).tolist():
+        u = {"id": int(ids[k]), "accuracy": float(accuracy[k]), "wcpm": float(wcpm[k]), "errors_json": rows[k][2],
+             "updated_at": now}
+        if has_events[k]:
+            e = dict(errs[k])
+            e.update(zip(MISCUE_KEYS, new[k].tolist()))
+            u["errors_json"] = json.dumps(e)
+        u.update(zip(SUMMARY_COLUMNS, summaries[k]))
+        updates.append(u)
+
+    stats = {"sessions": n, "without_events": int((~has_events).sum()), "retyped": retyped,
+             "changed": int(scored.sum()), "summary_changed": int(stale.sum()),
+             "word_level_changed": int((old_levels != new_levels).sum()), "levels": {}}
+    for lvl in new_levels.tolist():
+        stats["levels"][lvl or "none"] = stats["levels"].get(lvl or "none", 0) + 1
+    return updates, stats
+
+
+def rescore_sessions(passage_words, batch_size=2000, dry_run=False, limit=None, progress=None):
+    """
+    Re-score every saved session. passage_words(passage_id) -> (display tokens,
+    word count) or None. Returns a summary with sessions/sec.
+    """
+    t0 = time.perf_counter()
+    total = {"sessions": 0, "without_events": 0, "retyped": 0, "changed": 0, "summary_changed": 0,
+             "word_level_changed": 0, "levels": {}, "batches": 0}
+    last_id = 0
+    while limit is None or total["sessions"] < limit:
+        size = batch_size if limit is None else min(batch_size, limit - total["sessions"])
+        rows = db.session.execute(
+            select(Session.id, Session.passage_id, Session.errors_json, Session.duration_sec,
+                   Session.accuracy, Session.wcpm, Session.comprehension_correct, Session.comprehension_total,
+                   *(getattr(Session, c) for c in SUMMARY_COLUMNS))
+            .where(Session.id > last_id).order_by(Session.id).limit(size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates, stats = rescore_batch(rows, passage_words)
+        if updates and not dry_run:
+            db.session.execute(update(Session), updates)
+            db.session.commit()
+        else:
+            db.session.rollback()  # end the read transaction between batches
+
+        total["batches"] += 1
+        for key, v in stats.items():
+            if key == "levels":
+                for lvl, c in v.items():
+                    total["levels"][lvl] = total["levels"].get(lvl, 0) + c
+            else:
+                total[key] += v
+        if progress:
+            progress(total, time.perf_counter() - t0)
+
+    elapsed = time.perf_counter() - t0
+    total["dry_run"] = bool(dry_run)
+    total["elapsed_sec"] = round(elapsed, 3)
+    total["sessions_per_sec"] = round(total["sessions"] / elapsed, 1) if elapsed > 0 else None
+    return total
+
+
+def summarize_sessions(where=None, batch_size=2000):
+    """
+    Write the summary columns of the sessions matching `where` (all if None)
+    from their errors_json, passage word count and comprehension score.
+    Commits per batch; returns the number of sessions written.
+    """
+    done, last_id = 0, 0
+    while True:
+        q = (select(Session.id, Session.errors_json, Passage.word_count,
+                    Session.comprehension_correct, Session.comprehension_total)
+             .outerjoin(Passage, Passage.id == Session.passage_id)
+             .where(Session.id > last_id).order_by(Session.id).limit(batch_size))
+        if where is not None:
+            q = q.where(where)
+        rows = db.session.execute(q).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        now = datetime.utcnow()
+        db.session.execute(update(Session), [
+            {"id": sid, **summarize(_load_errors(raw), words, correct, total), "updated_at": now}
+            for sid, raw, words, correct, total in rows])
+        db.session.commit()
+        done += len(rows)
+    return done
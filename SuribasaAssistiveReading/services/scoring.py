@@ -0,0 +1,156 @@
+# services/scoring.py
+"""
+Miscue tallies and reading levels for saved sessions (results page, PDF
+report, `flask rescore-sessions`).
+
+summarize() gives the Session summary columns (SUMMARY_COLUMNS); they are
+written whenever a session or its comprehension score is saved, so listings
+and aggregates read typed columns instead of parsing errors_json.
+
+The level cut-offs live in the tables below only; the scalar functions
+score one session and the array versions score a whole batch with NumPy
+using the same tables, so both always agree.
+"""
+import numpy as np
+
+# errors_json keys, in report order
+MISCUE_KEYS = ("mispronunciations", "omissions", "substitutions", "insertions",
+               "repetitions", "transpositions", "reversals")
+# alignment event type -> errors_json key
+EVENT_KEYS = {"mispronunciation": "mispronunciations", "omission": "omissions",
+              "substitution": "substitutions", "insertion": "insertions", "repetition": "repetitions",
+              "transposition": "transpositions", "reversal": "reversals"}
+# miscues that count against WCPM (computeAndRenderMetrics in ui.js)
+WCPM_ERROR_KEYS = ("omissions", "substitutions", "mispronunciations", "transpositions", "reversals")
+
+# comprehension %: highest level whose upper bound (inclusive) it doesn't exceed
+COMP_LEVELS = ((59, "FRUSTRATION"), (79, "INSTRUCTIONAL"), (None, "INDEPENDENT"))
+# word reading score: first level whose lower bound (inclusive) it reaches
+WORD_LEVELS = ((97, "INDEPENDENT"), (90, "INSTRUCTIONAL"), (None, "FRUSTRATION"))
+
+# materialized on Session by summarize()
+SUMMARY_COLUMNS = MISCUE_KEYS + ("total_miscues", "words_total", "word_score", "word_level",
+                                 "comp_pct", "comp_level", "reading_profile")
+
+# WordEvent.status codes for bincount
+STATUSES = ("pending", "correct", "misread", "skipped")
+STATUS_CODE = {s: k for k, s in enumerate(STATUSES)}
+
+
+# ----------------- one session -----------------
+def miscue_counts(errs):
+    """errors_json dict -> {key: int} for every MISCUE_KEYS entry."""
+    errs = errs or {}
+    out = {}
+    for k in MISCUE_KEYS:
+        try:
+            out[k] = int(errs.get(k, 0) or 0)
+        except (TypeError, ValueError):
+            out[k] = 0
+    return out
+
+
+def comp_pct(correct, total):
+    try:
+        correct, total = int(correct), int(total)
+    except (TypeError, ValueError):
+        return None
+    return round(correct / total * 100.0, 1) if total > 0 else None
+
+
+def comp_level_from_pct(pct):
+    if pct is None:
+        return None
+    for bound, level in COMP_LEVELS:
+        if bound is None or pct <= bound:
+            return level
+
+
+def word_reading_score(words_total, total_miscues):
+    """Score = (correct words / total words)*100 rounded, clamped 0..100."""
+    if not words_total:
+        return None
+    correct_words = max(0, words_total - total_miscues)
+    pct = round((correct_words / float(words_total)) * 100.0)
+    return max(0, min(100, int(pct)))
+
+
+def word_level_from_score(score):
+    if score is None:
+        return None
+    for bound, level in WORD_LEVELS:
+        if bound is None or score >= bound:
+            return level
+
+
+def reading_profile(comp_level, wr_level):
+    if not comp_level and not wr_level:
+        return None
+    if comp_level == "FRUSTRATION" or wr_level == "FRUSTRATION":
+        return "FRUSTRATION"
+    if comp_level == "INDEPENDENT" and wr_level == "INDEPENDENT":
+        return "INDEPENDENT"
+    return "INSTRUCTIONAL"
+
+
+def summarize(miscues, words_total, comp_correct, comp_total):
+    """Summary column values from miscue counts, passage word count and comprehension score."""
+    m = miscue_counts(miscues)
+    total = sum(m.values())
+    pct = comp_pct(comp_correct, comp_total)
+    comp_level = comp_level_from_pct(pct)
+    score = word_reading_score(words_total, total)
+    wr_level = word_level_from_score(score)
+    return {**m, "total_miscues": total, "words_total": int(words_total or 0), "word_score": score,
+            "word_level": wr_level, "comp_pct": pct, "comp_level": comp_level,
+            "reading_profile": reading_profile(comp_level, wr_level)}
+
+
+# ----------------- many sessions (NumPy) -----------------
+def status_code_counts(rows, codes, n):
+    """
+    (n, 4) counts of pending/correct/misread/skipped per session, given each
+    event's session row (0..n-1) and STATUS_CODE.
+    """
+    flat = np.asarray(rows, dtype=np.int64) * len(STATUSES) + np.asarray(codes, dtype=np.int64)
+    return np.bincount(flat, minlength=n * len(STATUSES)).reshape(n, len(STATUSES))
+
+
+def word_reading_scores(words_total, total_miscues):
+    """word_reading_score over arrays; NaN where the passage has no words."""
+    words = np.asarray(words_total, dtype=np.float64)
+    correct = np.maximum(0.0, words - np.asarray(total_miscues, dtype=np.float64))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.clip(np.round(correct / words * 100.0), 0, 100)
+    return np.where(words > 0, pct, np.nan)
+
+
+def _levels(values, table, reaches):
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(values.shape, None, dtype=object)
+    todo = ~np.isnan(values)
+    for bound, level in table:
+        hit = todo if bound is None else todo & reaches(values, bound)
+        out[hit] = level
+        todo &= ~hit
+    return out
+
+
+def word_levels(scores):
+    """word_level_from_score over an array (NaN -> None)."""
+    return _levels(scores, WORD_LEVELS, np.greater_equal)
+
+
+def comp_levels(pcts):
+    """comp_level_from_pct over an array (NaN -> None)."""
+    return _levels(pcts, COMP_LEVELS, np.less_equal)
+
+
+def reading_profiles(comp_lv, word_lv):
+    """reading_profile over two object arrays of levels."""
+    comp_lv, word_lv = np.asarray(comp_lv, dtype=object), np.asarray(word_lv, dtype=object)
+    out = np.full(comp_lv.shape, "INSTRUCTIONAL", dtype=object)
+    out[(comp_lv == "INDEPENDENT") & (word_lv == "INDEPENDENT")] = "INDEPENDENT"
+    out[(comp_lv == "FRUSTRATION") | (word_lv == "FRUSTRATION")] = "FRUSTRATION"
+    out[np.equal(comp_lv, None) & np.equal(word_lv, None)] = None
+    return out
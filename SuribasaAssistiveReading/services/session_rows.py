@@ -0,0 +1,174 @@
+# services/session_rows.py
+"""
+Session listing shared by the results page and the exports.
+
+session_row(s) builds the display dict for one session (identity, timing,
+comprehension, miscue counts, derived levels) from its stored summary
+columns. results_page() returns one
+page of sessions, newest first, using keyset pagination on
+(started_at, id): the next page starts strictly after the last row shown,
+so paging cost doesn't grow with depth and rows can't shift between pages.
+Passages are loaded in the same query (joined, only the columns a row
+needs), and grade / section / passage / date / level filters run in SQL on indexed columns.
+"""
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, and_, or_
+from sqlalchemy.orm import joinedload
+
+from models import db, Session, Passage
+from services.scoring import MISCUE_KEYS, SUMMARY_COLUMNS, summarize
+
+LEVELS = ("INDEPENDENT", "INSTRUCTIONAL", "FRUSTRATION")
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 500
+
+
+def display_name(s):
+    """'Surname, First M.' from the learner fields, else the legacy student_name."""
+    if s.surname or s.first_name:
+        return s.student_display_name
+    return s.student_name or "—"
+
+
+def _summary(s):
+    if s.total_miscues is not None:
+        return {c: getattr(s, c) for c in SUMMARY_COLUMNS}
+    # not summarized yet (written outside the app since startup)
+    p = s.passage
+    try:
+        errs = json.loads(s.errors_json or '{}')
+    except ValueError:
+        errs = {}
+    return summarize(errs if isinstance(errs, dict) else {}, (p.word_count or 0) if p else 0,
+                     s.comprehension_correct, s.comprehension_total)
+
+
+def session_row(s):
+    """Display dict for a session; s.passage should already be loaded."""
+    p = s.passage
+    sm = _summary(s)
+
+    return {
+        "id": s.id,
+        "student_name": display_name(s),
+        "surname": s.surname,
+        "first_name": s.first_name,
+        "middle_initial": s.middle_initial,
+        "grade_level": s.grade_level,
+        "section": s.section,
+        "passage_id": s.passage_id,
+        "passage_title": p.title if p else None,
+        "started_at": s.started_at,
+
+        "words": sm["words_total"],
+        "duration_sec": s.duration_sec,
+        "time_sec": round(float(s.duration_sec or 0), 1),
+        "wpm": round(float(s.wcpm or 0), 1),
+        "accuracy": round(float(s.accuracy or 0), 1),
+
+        "comp_pct": sm["comp_pct"],
+        "comp_correct": s.comprehension_correct,
+        "comp_total": s.comprehension_total,
+        "comp_level": sm["comp_level"],
+
+        **{k: sm[k] for k in MISCUE_KEYS},
+
+        "word_score": sm["word_score"],
+        "word_level": sm["word_level"],
+        "reading_profile": sm["reading_profile"],
+    }
+
+
+# ----------------- filters -----------------
+def _date(v, end=False):
+    try:
+        d = datetime.strptime((v or "").strip(), "%Y-%m-%d")
+    except ValueError:
+        return None
+    return d + timedelta(days=1) if end else d
+
+
+def parse_filters(args):
+    """Filters from query args: grade, section, passage_id, date_from / date_to (YYYY-MM-DD, inclusive), level."""
+    f = {}
+    grade = (args.get("grade") or "").strip()
+    if grade:
+        f["grade"] = grade
+    section = (args.get("section") or "").strip()
+    if section:
+        f["section"] = section
+    try:
+        pid = int(args.get("passage_id") or 0)
+    except ValueError:
+        pid = 0
+    if pid:
+        f["passage_id"] = pid
+    if _date(args.get("date_from")):
+        f["date_from"] = args.get("date_from").strip()
+    if _date(args.get("date_to")):
+        f["date_to"] = args.get("date_to").strip()
+    level = (args.get("level") or "").strip().upper()
+    if level in LEVELS:
+        f["level"] = level
+    return f
+
+
+def filter_conditions(filters):
+    """WHERE clauses on Session for parse_filters() output."""
+    conds = []
+    if filters.get("grade"):
+        conds.append(Session.grade_level == filters["grade"])
+    if filters.get("section"):
+        conds.append(Session.section == filters["section"])
+    if filters.get("passage_id"):
+        conds.append(Session.passage_id == filters["passage_id"])
+    if filters.get("date_from"):
+        conds.append(Session.started_at >= _date(filters["date_from"]))
+    if filters.get("date_to"):
+        conds.append(Session.started_at < _date(filters["date_to"], end=True))
+    if filters.get("level"):
+        conds.append(Session.reading_profile == filters["level"])
+    return conds
+
+
+def filtered_query(filters):
+    """SELECT Session (+ its passage) with the SQL-side filters applied, newest first."""
+    return (select(Session)
+            .options(joinedload(Session.passage).load_only(Passage.id, Passage.title, Passage.word_count))
+            .where(*filter_conditions(filters))
+            .order_by(Session.started_at.desc(), Session.id.desc()))
+
+
+# ----------------- keyset pages -----------------
+def encode_cursor(s):
+    return f"{s.started_at.isoformat() if s.started_at else ''}_{s.id}"
+
+
+def _after(cursor):
+    """WHERE clause for rows after `cursor` in (started_at desc, id desc) order (NULL dates last)."""
+    try:
+        ts, sid = cursor.rsplit("_", 1)
+        sid = int(sid)
+        ts = datetime.fromisoformat(ts) if ts else None
+    except (AttributeError, ValueError):
+        return None
+    if ts is None:
+        return and_(Session.started_at.is_(None), Session.id < sid)
+    return or_(Session.started_at < ts,
+               and_(Session.started_at == ts, Session.id < sid),
+               Session.started_at.is_(None))
+
+
+def results_page(filters, cursor=None, per_page=DEFAULT_PER_PAGE):
+    """([session_row, ...], next_cursor or None) for one page."""
+    per_page = max(1, min(MAX_PER_PAGE, int(per_page or DEFAULT_PER_PAGE)))
+    q = filtered_query(filters)
+    where = _after(cursor) if cursor else None
+    if where is not None:
+        q = q.where(where)
+    chunk = db.session.execute(q.limit(per_page + 1)).scalars().all()
+    page = chunk[:per_page]
+    next_cursor = encode_cursor(page[-1]) if len(chunk) > per_page else None
+    return [session_row(s) for s in page], next_cursor
@@ -0,0 +1,54 @@
+# services/text.py
+"""
+Passage text helpers with precompiled regexes.
+
+derive_passage(text) computes everything the app needs from a passage's
+text (display tokens, scored-word count, content hash, phonetic index). It
+runs when a passage is created or edited; pages, exports and the aligners
+then read the stored columns instead of re-tokenizing.
+"""
+import re
+import json
+import hashlib
+
+from services.phonetics import phonetic_index
+
+TOKEN_RE = re.compile(r"""[A-Za-z']+|[0-9]+|\S""")
+WORD_RE = re.compile(r"[A-Za-z']+|[0-9]+")
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+_COMPACT = (",", ":")
+
+
+def tokenize_for_display(text):
+    """Split words and punctuation; UI ignores punctuation for scoring."""
+    return TOKEN_RE.findall(text or "")
+
+
+def simple_tokens(text):
+    """Words and numbers only."""
+    return WORD_RE.findall(text or "")
+
+
+def count_scored_words(tokens):
+    return sum(1 for t in tokens if WORD_RE.fullmatch(t))
+
+
+def sentences(text):
+    parts = SENTENCE_SPLIT_RE.split((text or "").strip())
+    return [p.strip() for p in parts if p.strip()]
+
+
+def content_hash(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def derive_passage(text):
+    """Stored Passage columns derived from its text."""
+    tokens = tokenize_for_display(text)
+    return {
+        "tokens_json": json.dumps(tokens, ensure_ascii=False, separators=_COMPACT),
+        "word_count": count_scored_words(tokens),
+        "content_hash": content_hash(text),
+        "phonetic_json": json.dumps(phonetic_index(tokens), separators=_COMPACT),
+    }
@@ -2,6 +2,9 @@
 // Returns { status[], insertions[], events[] }
 // status[i] in ["pending","correct","misread","skipped"]
 // events: [{type, i, target, hyp, confidence, j}]
+// incremental(refWords, opts) -> { update(tokens), finalize(tokens) } for live reading
+// opts.phonetic: the passage's precomputed phonetic index (APP.phonetic), if any
+// (mirrored on the server by services/alignment.py)
 window.aligner = (function () {
   const { norm, isPhoneticMatch, isReversal } = window.phonetics;
 
@@ -36,7 +39,8 @@ window.aligner = (function () {
   }
 
   // --- DP alignment on reduced (non-punct) refs and filtered hyp tokens ------
-  function alignTokens(ref, hypObjs) {
+  // openEnd: ref words after the best end point stay unaligned (not read yet)
+  function alignTokens(ref, hypObjs, openEnd = false) {
     const n = ref.length, m = hypObjs.length;
     const dp = Array.from({ length: n + 1 }, () => Array(m + 1).fill(0));
     const bt = Array.from({ length: n + 1 }, () => Array(m + 1).fill(null));
@@ -60,6 +64,9 @@ window.aligner = (function () {
 
     // backtrack
     let i = n, j = m;
+    if (openEnd) {
+      for (let k = n - 1; k >= 0; k--) if (dp[k][m] < dp[i][m]) i = k;
+    }
     const ops = [];
     while (i > 0 || j > 0) {
       const op = bt[i][j];
@@ -71,10 +78,12 @@ window.aligner = (function () {
   }
 
   // --- classify ops into status + events ------------------------------------
-  function classify(ops, ref, hypObjs, minConf = 0.62, maxEd = 0, maxInsertionsShown = 8) {
+  // prevHyp / prevRef: context before ops[0] when ref is a window (incremental mode)
+  function classify(ops, ref, hypObjs, minConf = 0.62, maxEd = 0, maxInsertionsShown = 8, prevHyp = '', prevRef = null) {
     const status = Array(ref.length).fill('pending');
     const events = [];
     const inserted = [];
+    const coded = {};  // oIdx -> ref entry with precomputed phonetic codes
 
     for (let k = 0; k < ops.length; k++) {
       const [op, i, j] = ops[k];
@@ -90,6 +99,7 @@ window.aligner = (function () {
           status[i] = 'correct';
         } else {
           status[i] = 'misread'; // provisional bucket
+          if (r.sx !== undefined) coded[r.oIdx] = r;
           events.push({ type: 'S?', i: r.oIdx, target: r.raw, hyp: h.raw, confidence: conf, j: h.j });
         }
 
@@ -102,11 +112,11 @@ window.aligner = (function () {
         const h = hypObjs[j]; // may be undefined if j<0; guard:
         if (!h) continue;
         inserted.push(h.raw);
-        const prevRefIdx = Math.max(0, i - 1);
+        const anchor = i > 0 ? ref[i - 1] : (prevRef || ref[0]);
         events.push({
           type: 'insertion',
-          i: ref[Math.max(0, i - 1)]?.oIdx ?? 0,
-          target: ref[Math.max(0, i - 1)]?.raw,
+          i: anchor?.oIdx ?? 0,
+          target: anchor?.raw,
           hyp: h.raw,
           confidence: h.conf ?? 0.8,
           j: h.j
@@ -129,8 +139,9 @@ window.aligner = (function () {
     // refine S? to mispronunciation / substitution / reversal
     for (const e of events) {
       if (e.type === 'S?') {
-        if (isReversal(e.target, e.hyp)) e.type = 'reversal';
-        else if (isPhoneticMatch(e.target, e.hyp)) e.type = 'mispronunciation';
+        const codes = coded[e.i];
+        if (isReversal(e.target, e.hyp, codes)) e.type = 'reversal';
+        else if (isPhoneticMatch(e.target, e.hyp, codes)) e.type = 'mispronunciation';
         else e.type = 'substitution';
       }
     }
@@ -139,15 +150,21 @@ window.aligner = (function () {
     for (let idx = 0; idx < events.length; idx++) {
       const e = events[idx];
       if (e.type === 'insertion') {
-        const prevHyp = events[idx - 1]?.hyp || '';
-        const refTok = ref.find(r => r.oIdx === e.i)?.raw || '';
-        if (norm(e.hyp) === norm(prevHyp) || norm(e.hyp) === norm(refTok)) {
+        const before = (idx > 0 ? events[idx - 1].hyp : prevHyp) || '';
+        const refTok = e.target || '';
+        if (norm(e.hyp) === norm(before) || norm(e.hyp) === norm(refTok)) {
           e.type = 'repetition';
         }
       }
     }
 
-    // prepare compact insertion line (last N unique-ish)
+    // inflate status already uses reduced ref; translate to final later
+    if (maxInsertionsShown == null) return { status, insertions: inserted, events };
+    return { status, insertions: insertionLine(inserted, maxInsertionsShown), events };
+  }
+
+  // prepare compact insertion line (last N unique-ish)
+  function insertionLine(inserted, maxInsertionsShown) {
     const line = [];
     for (let i = Math.max(0, inserted.length - 50); i < inserted.length; i++) {
       const w = String(inserted[i] || '').trim();
@@ -155,33 +172,31 @@ window.aligner = (function () {
       if (line.length && line[line.length - 1].toLowerCase() === w.toLowerCase()) continue;
       line.push(w);
     }
-    const insertionsLine = line.slice(-Math.max(1, maxInsertionsShown));
-
-    // inflate status already uses reduced ref; translate to final later
-    return { status, insertions: insertionsLine, events };
+    return line.slice(-Math.max(1, maxInsertionsShown));
   }
 
-  // --- public align ----------------------------------------------------------
-  function align(refWords, hypTokens, opts = {}) {
-    const minConfidence = opts.minConfidence ?? 0.62;
-    const finalOnly = !!opts.finalOnly;
-    const maxEd = opts.maxEd ?? 0;
-    const maxInsertionsShown = opts.maxInsertionsShown ?? 8;
+  // a stored index only applies if it was built from these exact tokens
+  function indexCodes(phonetic, nWords) {
+    if (!phonetic || phonetic.v !== 1) return null;
+    const cols = [phonetic.n, phonetic.sx, phonetic.mp];
+    return cols.every(c => Array.isArray(c) && c.length === nWords) ? cols : null;
+  }
 
-    // 1) Build reduced ref (drop punctuation) but remember original indices
+  function reduceRef(refWords, phonetic) {
+    const cols = indexCodes(phonetic, refWords.length);
     const ref = [];
-    const mapIdx = [];
     for (let i = 0; i < refWords.length; i++) {
       const w = refWords[i];
-      if (!isPunc(w)) {
-        ref.push({ raw: w, n: norm(w), oIdx: i });
-        mapIdx.push(i);
-      }
+      if (isPunc(w)) continue;
+      ref.push(cols ? { raw: w, n: cols[0][i], sx: cols[1][i], mp: cols[2][i], oIdx: i }
+                    : { raw: w, n: norm(w), oIdx: i });
     }
+    return ref;
+  }
 
-    // 2) Filter hyp tokens
+  function filterHyp(hypTokens, finalOnly, start = 0) {
     const hypObjs = [];
-    for (let j = 0; j < hypTokens.length; j++) {
+    for (let j = start; j < hypTokens.length; j++) {
       const t = hypTokens[j];
       if (!t || !t.text) continue;
       if (finalOnly && !t.final) continue;
@@ -190,6 +205,21 @@ window.aligner = (function () {
       if (!n) continue;
       hypObjs.push({ raw, n, conf: (t.confidence ?? t.conf ?? 0.8), j });
     }
+    return hypObjs;
+  }
+
+  // --- public align ----------------------------------------------------------
+  function align(refWords, hypTokens, opts = {}) {
+    const minConfidence = opts.minConfidence ?? 0.62;
+    const finalOnly = !!opts.finalOnly;
+    const maxEd = opts.maxEd ?? 0;
+    const maxInsertionsShown = opts.maxInsertionsShown ?? 8;
+
+    // 1) Build reduced ref (drop punctuation) but remember original indices
+    const ref = reduceRef(refWords, opts.phonetic);
+
+    // 2) Filter hyp tokens
+    const hypObjs = filterHyp(hypTokens, finalOnly);
 
     // 3) DP align on reduced strings
     const ops = alignTokens(ref, hypObjs);
@@ -207,5 +237,93 @@ window.aligner = (function () {
     return { status, insertions, events };
   }
 
-  return { align };
+  // --- incremental (live) alignment -------------------------------------------
+  // Everything before a confirmed anchor (a correctly read word followed by
+  // `lag` more tokens) is frozen; each update re-aligns only a window of the
+  // next passage words against the tokens after the anchor, so its cost does
+  // not grow with the passage. Unread words stay 'pending'. finalize() runs
+  // the full align() once for the saved result.
+  function incremental(refWords, opts = {}) {
+    const minConfidence = opts.minConfidence ?? 0.62;
+    const finalOnly = !!opts.finalOnly;
+    const maxEd = opts.maxEd ?? 0;
+    const maxInsertionsShown = opts.maxInsertionsShown ?? 8;
+    const windowSize = Math.max(8, opts.window ?? 48);
+    const lag = Math.max(1, opts.lag ?? 4);
+
+    const ref = reduceRef(refWords, opts.phonetic);
+    const frozenStatus = Array(refWords.length).fill('pending');
+    let frozenEvents = [], frozenInserted = [];
+    let anchorR = 0, anchorJ = 0, prevHyp = '';
+
+    function classifyWindow(ops, refWin, hyp) {
+      return classify(ops, refWin, hyp, minConfidence, maxEd, null, prevHyp, anchorR ? ref[anchorR - 1] : null);
+    }
+
+    function windowOps(hyp) {
+      const refWin = ref.slice(anchorR, anchorR + Math.max(windowSize, hyp.length + lag));
+      return { refWin, ops: alignTokens(refWin, hyp, true) };
+    }
+
+    // number of leading ops that can be frozen (0 = none)
+    function anchorAt(ops, refWin, hyp, force) {
+      let best = 0, hUsed = 0;
+      for (let k = 0; k < ops.length; k++) {
+        const [op, i, j] = ops[k];
+        if (op === 'D') continue;
+        hUsed++;
+        if (hyp.length - hUsed < lag) break;
+        if (force || (op === 'S' && refWin[i].n === hyp[j].n && hyp[j].conf >= minConfidence)) best = k + 1;
+      }
+      return best;
+    }
+
+    function freeze(ops, refWin, hyp, upto) {
+      ops = ops.slice(0, upto);
+      const { status, insertions, events } = classifyWindow(ops, refWin, hyp);
+      let rUsed = 0, hUsed = 0;
+      for (const [op] of ops) { if (op !== 'I') rUsed++; if (op !== 'D') hUsed++; }
+      for (let r = 0; r < rUsed; r++) frozenStatus[refWin[r].oIdx] = status[r];
+      frozenEvents = frozenEvents.concat(events);
+      frozenInserted = frozenInserted.concat(insertions).slice(-50);
+      if (events.length) prevHyp = events[events.length - 1].hyp || '';
+      anchorR += rUsed;
+      if (hUsed) anchorJ = hyp[hUsed - 1].j + 1;
+    }
+
+    function update(hypTokens) {
+      hypTokens = hypTokens || [];
+      let hyp, win, upto;
+      for (;;) {
+        hyp = filterHyp(hypTokens, finalOnly, anchorJ);
+        win = windowOps(hyp);
+        upto = anchorAt(win.ops, win.refWin, hyp, false);
+        if (!upto && hyp.length > windowSize) {
+          // a long stretch with no confirmed word (or one big batch): freeze the oldest part anyway
+          hyp = hyp.slice(0, windowSize);
+          win = windowOps(hyp);
+          upto = anchorAt(win.ops, win.refWin, hyp, true);
+        }
+        if (!upto) break;
+        freeze(win.ops, win.refWin, hyp, upto);
+      }
+
+      const status = frozenStatus.slice();
+      const w = classifyWindow(win.ops, win.refWin, hyp);
+      for (let r = 0; r < win.refWin.length; r++) status[win.refWin[r].oIdx] = w.status[r];
+      return {
+        status,
+        insertions: insertionLine(frozenInserted.concat(w.insertions), maxInsertionsShown),
+        events: frozenEvents.concat(w.events)
+      };
+    }
+
+    function finalize(hypTokens) {
+      return align(refWords, hypTokens || [], opts);
+    }
+
+    return { update, finalize };
+  }
+
+  return { align, incremental };
 })();
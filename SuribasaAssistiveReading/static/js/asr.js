@@ -40,6 +40,14 @@ window.asr = (function () {
     }
   }
 
+  function pushFinalTokens(tokens){
+    // server streams send only new final words: append as-is (repeated words are real repetitions)
+    tokens.forEach(t => {
+      finalSoFar.push(t.text);
+      asrTokens.push({ text: t.text, confidence: t.confidence ?? 0.85, final: true });
+    });
+  }
+
   function start(onTokens){
     if (useBrowser){
       recognizer = new webkitSpeechRecognition();
@@ -81,9 +89,29 @@ window.asr = (function () {
     const fd = new FormData();
     fd.append('audio', blob, 'rec.webm');
     fd.append('lang', lang.split('-')[0]);
+    if (window.APP && window.APP.passageId) fd.append('passage_id', window.APP.passageId);
     try {
-      const res = await fetch('/api/asr', { method: 'POST', body: fd });
-      const j = await res.json();
+      // submit as a job (retrying while the server says it's busy), then long-poll for the result
+      let res, sub;
+      for (let attempt = 0; attempt < 6; attempt++){
+        res = await fetch('/api/asr/jobs', { method: 'POST', body: fd });
+        if (res.status !== 429) break;
+        const wait = Number(res.headers.get('Retry-After')) || 2;
+        await new Promise(r => setTimeout(r, wait * 1000));
+      }
+      sub = await res.json();
+      if (!sub.ok) return sub;
+      let j = sub, pause = Number(res.headers.get('Retry-After')) || 1;
+      while (j.ok && (j.state === 'queued' || j.state === 'running')){
+        // short long-polls; when the server had no thread to park us on it answers at once, so back off
+        const t0 = Date.now();
+        const r = await fetch(`${sub.status_url}?wait=5`);
+        j = await r.json();
+        if (r.status === 202 && Date.now() - t0 < 1000){
+          pause = Number(r.headers.get('Retry-After')) || pause;
+          await new Promise(ok => setTimeout(ok, pause * 1000));
+        }
+      }
       if (j.ok && Array.isArray(j.tokens)){
         // append once; prevent dup by checking tail
         j.tokens.forEach(t => pushFinalDelta([t.text], t.confidence));
@@ -93,5 +121,66 @@ window.asr = (function () {
     } catch(e){ return { ok:false, error:String(e) }; }
   }
 
-  return { init, start, stop, stopFallbackUpload, isUsingFallback, getAllTokens };
+  // --- Live server streaming (Vosk): PCM chunks go up while the student reads ---
+  let streamId = null, pcmQueue = [], pcmQueued = 0, sending = Promise.resolve(), streamCb = null;
+  const CHUNK_SAMPLES = 8000; // ~0.5 s at 16 kHz
+
+  function applyStreamTokens(j){
+    if (j && j.ok && Array.isArray(j.tokens) && j.tokens.length){
+      pushFinalTokens(j.tokens);
+      streamCb && streamCb([]);
+    }
+  }
+
+  function takePCM(){
+    const out = new Int16Array(pcmQueued);
+    let off = 0;
+    pcmQueue.forEach(a => { out.set(a, off); off += a.length; });
+    pcmQueue = []; pcmQueued = 0;
+    return out;
+  }
+
+  function postChunk(url, pcm){
+    // chain requests so chunks reach the recognizer in order
+    sending = sending.then(() => fetch(url, {
+      method: 'POST', headers: { 'Content-Type': 'application/octet-stream' }, body: pcm.buffer
+    }).then(r => r.json()).catch(e => ({ ok:false, error:String(e) })));
+    return sending;
+  }
+
+  async function startStream(onTokens, opts = {}){
+    streamCb = onTokens; streamId = null; pcmQueue = []; pcmQueued = 0;
+    try {
+      const res = await fetch('/api/asr/stream', {
+        method: 'POST', headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ sr: 16000, grammar: opts.grammar || null, accent: opts.accent || '',
+                               passage_id: (window.APP && window.APP.passageId) || null })
+      });
+      const j = await res.json();
+      if (j.ok) streamId = j.stream_id;
+    } catch(_){}
+    return !!streamId;
+  }
+
+  function pushPCM(int16){
+    if (!streamId || !int16 || !int16.length) return;
+    pcmQueue.push(int16); pcmQueued += int16.length;
+    if (pcmQueued >= CHUNK_SAMPLES){
+      postChunk(`/api/asr/stream/${streamId}`, takePCM()).then(applyStreamTokens);
+    }
+  }
+
+  async function finishStream(onTokens){
+    if (!streamId) return { ok:false, error:'no stream' };
+    const id = streamId; streamId = null;
+    if (onTokens) streamCb = onTokens;
+    const j = await postChunk(`/api/asr/stream/${id}/finish`, takePCM());
+    applyStreamTokens(j);
+    return j;
+  }
+
+  function isStreaming(){ return !!streamId; }
+
+  return { init, start, stop, stopFallbackUpload, isUsingFallback, getAllTokens,
+           startStream, pushPCM, finishStream, isStreaming };
 })();
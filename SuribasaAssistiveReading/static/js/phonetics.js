@@ -1,5 +1,7 @@
 // Robust, dependency-free phonetic helpers (Soundex + lite Metaphone + reversal)
-// Exposed API: { norm, soundex, isPhoneticMatch, isReversal }
+// Exposed API: { norm, soundex, metaphoneLite, isPhoneticMatch, isReversal }
+// Predicates take optional precomputed codes {n, sx, mp} for the passage word
+// (from the passage's phonetic index, see services/phonetics.py).
 window.phonetics = (function () {
   // --- Normalization helpers -------------------------------------------------
 
@@ -107,14 +109,14 @@ window.phonetics = (function () {
   // --- Public predicates ------------------------------------------------------
 
   // True if two words are likely the same by sound (for mispronunciation bucket)
-  function isPhoneticMatch(a, b) {
-    const A = norm(a), B = norm(b);
+  function isPhoneticMatch(a, b, codes) {
+    const A = codes ? codes.n : norm(a), B = norm(b);
     if (!A || !B) return false;
     if (A === B) return true;
 
     // quick phonetic equivalence
-    if (soundex(A) === soundex(B)) return true;
-    if (metaphoneLite(A) === metaphoneLite(B)) return true;
+    if ((codes ? codes.sx : soundex(A)) === soundex(B)) return true;
+    if ((codes ? codes.mp : metaphoneLite(A)) === metaphoneLite(B)) return true;
 
     // small wiggle for short words (e.g., "brwn" vs "brown", "kat" vs "cat")
     const d = levenshtein(A, B);
@@ -124,10 +126,10 @@ window.phonetics = (function () {
   }
 
   // reversal like "saw" <-> "was" (used for the reversal miscue)
-  function isReversal(tgt, hyp) {
-    const t = norm(tgt), h = norm(hyp);
+  function isReversal(tgt, hyp, codes) {
+    const t = codes ? codes.n : norm(tgt), h = norm(hyp);
     return t.length > 2 && h === t.split("").reverse().join("");
   }
 
-  return { norm, soundex, isPhoneticMatch, isReversal };
+  return { norm, soundex, metaphoneLite, isPhoneticMatch, isReversal };
 })();
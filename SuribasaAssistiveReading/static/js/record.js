@@ -4,7 +4,19 @@ window.recorder = (function(){
     canvas = document.getElementById(canvasId);
     ctx = canvas.getContext('2d');
   }
-  async function start(){
+  // Downsample float32 mic frames to 16-bit mono PCM at `outRate`
+  function toPCM16(input, inRate, outRate){
+    const ratio = inRate / outRate;
+    const n = Math.floor(input.length / ratio);
+    const out = new Int16Array(n);
+    for(let i=0;i<n;i++){
+      const s = Math.max(-1, Math.min(1, input[Math.floor(i*ratio)]));
+      out[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+    }
+    return out;
+  }
+  // opts.onPCM(Int16Array) receives 16 kHz mono PCM while recording (optional)
+  async function start(opts={}){
     const stream = await navigator.mediaDevices.getUserMedia({audio:true});
     audioCtx = new (window.AudioContext||window.webkitAudioContext)();
     const src = audioCtx.createMediaStreamSource(stream);
@@ -13,6 +25,12 @@ window.recorder = (function(){
     const bufferLength = analyser.frequencyBinCount;
     dataArray = new Uint8Array(bufferLength);
     src.connect(analyser);
+    if (typeof opts.onPCM === 'function' && audioCtx.createScriptProcessor){
+      const tap = audioCtx.createScriptProcessor(4096, 1, 1);
+      tap.onaudioprocess = (e) => opts.onPCM(toPCM16(e.inputBuffer.getChannelData(0), audioCtx.sampleRate, 16000));
+      src.connect(tap);
+      tap.connect(audioCtx.destination);
+    }
     draw();
     return { stream };
   }
@@ -193,6 +193,8 @@
     const surnameInput = makeInput('surname', 'Surname (e.g., Dela Cruz, O’Connor, Smith-Jones)', '220px', 64);
     const firstInput   = makeInput('firstName', 'First name(s) (e.g., Anne Marie)', '200px', 64);
     const miInput      = makeInput('middleInitial', 'Middle initial(s) (e.g., A., A B, A-B)', '180px', 24);
+    const sectionInput = makeInput('section', 'Section (optional)', '150px', 64);
+    sectionInput.required = false;
 
     surnameInput.addEventListener('input', () => { surnameInput.value = sanitizeName(surnameInput.value, {max:64}); });
     firstInput  .addEventListener('input', () => { firstInput.value   = sanitizeName(firstInput.value,   {max:64}); });
@@ -237,6 +239,7 @@
     const gradeLabel = document.createElement('span'); gradeLabel.className='muted'; gradeLabel.style.fontWeight='600'; gradeLabel.textContent='Grade';
     gradeWrap.appendChild(gradeLabel); gradeWrap.appendChild(gradeSel);
     panel.appendChild(gradeWrap);
+    panel.appendChild(iconWrap(sectionInput, icBadge, 'Class section (optional)'));
     panel.appendChild(saveBtn);
 
     const btnWrongParent = btnWrong && btnWrong.parentElement;
@@ -265,6 +268,7 @@
     let currentIndex = 0, startedAt = 0, pausedAccum = 0, pauseStart = 0, recording = false;
     let mediaRecorder, chunks = [];
     let lastStatus = [], lastEvents = [];
+    let liveAligner = null, liveAlignerKey = '';
     let origWSR = null, wrongSpeaking = false;
 
     // ---------- LIVE TIMER ----------
@@ -491,12 +495,27 @@
       const all = asr.getAllTokens();
       const sens = mapSensitivity(sensSlider.value);
 
-      const { status, events } = aligner.align(tokens, all, {
+      const opts = {
         minConfidence: sens.minConfidence,
         finalOnly: true,
         maxEd: sens.maxEd,
-        maxInsertionsShown: 8
-      });
+        maxInsertionsShown: 8,
+        phonetic: window.APP.phonetic   // precomputed per passage; ignored if stale
+      };
+
+      // While reading, only the words after the last confirmed one are re-aligned
+      // (cost per update stays flat); after Stop the whole reading is aligned once.
+      let result;
+      if (recording) {
+        if (!liveAligner || liveAlignerKey !== sensSlider.value) {
+          liveAligner = aligner.incremental(tokens, opts);
+          liveAlignerKey = sensSlider.value;
+        }
+        result = liveAligner.update(all);
+      } else {
+        result = aligner.align(tokens, all, opts);
+      }
+      const { status, events } = result;
 
       lastStatus = status;
       lastEvents = events;
@@ -526,7 +545,7 @@
       }
 
       try {
-        const { stream } = await recorder.start();
+        const { stream } = await recorder.start({ onPCM: pcm => asr.pushPCM(pcm) });
         mediaRecorder = new MediaRecorder(stream, { mimeType: 'audio/webm' });
         mediaRecorder.ondataavailable = e => { if (e.data && e.data.size > 0) chunks.push(e.data); };
         mediaRecorder.start();
@@ -540,6 +559,7 @@
       stopWrongQueue();
 
       resetTypewriter();
+      liveAligner = null;
 
       startedAt = performance.now();
       pausedAccum = 0; pauseStart = 0; finalDurationSec = null;
@@ -552,6 +572,10 @@
 
       await asr.start(() => handleTokens());
       summary.hidden = false;
+      if (asr.isUsingFallback()) {
+        // stream PCM to the server while reading; falls back to one upload on Stop
+        await asr.startStream(() => handleTokens());
+      }
 
       if (asr.isUsingFallback()) { asrBanner && (asrBanner.style.display = 'inline'); }
       else { asrBanner && (asrBanner.style.display = 'none'); }
@@ -567,7 +591,7 @@
     }
 
     function resume() {
-      recorder.start(); asr.start(() => handleTokens());
+      recorder.start({ onPCM: pcm => asr.pushPCM(pcm) }); asr.start(() => handleTokens());
       if (pauseStart) { pausedAccum += performance.now() - pauseStart; pauseStart = 0; }
       btnStart.disabled = true; btnPause.disabled = false;
       setStatus('Listening...'); dot.classList.add('active');
@@ -592,7 +616,12 @@
       if (origWSR) { try { window.webkitSpeechRecognition = origWSR; } catch(e){}; origWSR = null; }
 
       btnWrong && (btnWrong.disabled = false);
+      handleTokens();  // final full alignment of what was read
 
+      if (asr.isStreaming()) {
+        const j = await asr.finishStream(() => handleTokens());
+        if (j && j.ok) { mediaRecorder.ondataavailable = null; try { mediaRecorder.stop(); } catch(_){} chunks = []; return; }
+      }
       if (asr.isUsingFallback()) {
         mediaRecorder.stop();
         await new Promise(r => mediaRecorder.onstop = r);
@@ -658,6 +687,7 @@
         passage_id: window.APP.passageId,
         surname, first_name: first, middle_initial: middle,
         grade_level: gradeSel.value.trim(),
+        section: sectionInput.value.trim(),
         student_name: combinedName,
 
         started_at: Date.now() / 1000,